@@ -2,6 +2,7 @@ from typing import Dict, Union
 
 from content_core.common import ProcessSourceInput, ProcessSourceOutput
 from content_core.content.extraction.graph import graph
+from content_core.logging import logger
 
 # todo: input/output schema do langgraph
 
@@ -9,6 +10,6 @@ from content_core.content.extraction.graph import graph
 async def extract_content(data: Union[ProcessSourceInput, Dict]) -> ProcessSourceOutput:
     if isinstance(data, dict):
         data = ProcessSourceInput(**data)
-    print(f"开始提取内容: {data}")
+    logger.debug("开始提取内容: {}", data)
     result = await graph.ainvoke(data)
     return ProcessSourceOutput(**result)
@@ -39,7 +39,6 @@ async def source_identification(state: ProcessSourceState) -> Dict[str, str]:
     """
     Identify the content source based on parameters
     """
-    print(f"source_identification - state: {state}")
     if state.content:
         doc_type = "text"
     elif state.file_path:
@@ -49,7 +48,7 @@ async def source_identification(state: ProcessSourceState) -> Dict[str, str]:
     else:
         raise ValueError("No source provided.")
 
-    print(f"source_identification- source_type: {doc_type}")    
+    logger.debug(f"Identified source type: {doc_type}")
     return {"source_type": doc_type}
 
 
@@ -108,7 +107,6 @@ async def url_type_router(x: ProcessSourceState) -> Optional[str]:
 
 async def source_type_router(x: ProcessSourceState) -> Optional[str]:
     assert x.source_type, "Source type not identified"
-    print(f"source_type_router - source_type: {x.source_type}")
     return x.source_type
 
 
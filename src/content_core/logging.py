@@ -7,9 +7,12 @@ def configure_logging(debug=False):
     
     Args:
         debug (bool): If True, set logging level to DEBUG; otherwise, set to INFO.
+
+    Records are queued and written to stderr by a background worker
+    (``enqueue=True``) so logging calls never block the event loop on I/O.
     """
     logger.remove()  # Remove any existing handlers
-    logger.add(sys.stderr, level="DEBUG" if debug else "INFO")
+    logger.add(sys.stderr, level="DEBUG" if debug else "INFO", enqueue=True)
 
 # Initial configuration with default level (INFO)
 configure_logging(debug=False)
@@ -1,8 +1,34 @@
+import asyncio
+import atexit
+import codecs
+import functools
 import os
+import re
+import time
+from collections import OrderedDict
+from email.message import Message
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
 
 import aiohttp
-from bs4 import BeautifulSoup
-from readability import Document
+from lxml import etree
+from lxml import html as lxml_html
+
+try:
+    from firecrawl import AsyncFirecrawlApp
+
+    FIRECRAWL_AVAILABLE = True
+except ImportError:
+    AsyncFirecrawlApp = None
+    FIRECRAWL_AVAILABLE = False
+
+try:
+    from charset_normalizer import from_bytes as detect_charset
+
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    detect_charset = None
+    CHARSET_NORMALIZER_AVAILABLE = False
 
 from content_core.common import ProcessSourceState
 from content_core.config import get_url_engine
@@ -11,6 +37,290 @@ from content_core.processors.docling import DOCLING_SUPPORTED
 from content_core.processors.office import SUPPORTED_OFFICE_TYPES
 from content_core.processors.pdf import SUPPORTED_FITZ_TYPES
 
+# Shared HTTP session so repeated URL fetches reuse pooled keep-alive connections
+# instead of paying DNS/TCP/TLS setup per request.
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Upper bound on in-flight HEAD/GET requests issued by this module.
+MAX_CONCURRENCY = int(os.getenv("CC_MAX_CONCURRENCY", "16"))
+_fetch_semaphore: Optional[asyncio.BoundedSemaphore] = None
+
+# Per-request timeouts: connect stalls fail fast, while a slow-but-streaming
+# body gets its own read budget instead of sharing a single total deadline.
+_HEAD_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=3, sock_connect=3, sock_read=7)
+_GET_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5, sock_read=20)
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    Return the module-wide aiohttp session, creating it on first use.
+
+    The session is bound to the event loop that created it, so a new session
+    is created whenever the running loop changes. Connection reuse therefore
+    only helps long-lived loops; callers that run each extraction under a
+    fresh ``asyncio.run`` (such as the Streamlit helpers) must await
+    ``close_session()`` before that loop exits.
+    """
+    global _session, _session_loop, _fetch_semaphore
+    loop = asyncio.get_running_loop()
+    # No await between the check and the assignment, so this is atomic per loop.
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=8,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+            enable_cleanup_closed=True,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=60),
+        )
+        _session_loop = loop
+        _fetch_semaphore = asyncio.BoundedSemaphore(MAX_CONCURRENCY)
+    return _session
+
+
+def _get_fetch_semaphore() -> asyncio.BoundedSemaphore:
+    """Semaphore limiting concurrent fetches; created together with the session."""
+    assert _fetch_semaphore is not None, "get_session() must be awaited first"
+    return _fetch_semaphore
+
+
+async def close_session() -> None:
+    """Close the shared session. Call on application shutdown."""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+def _close_session_at_exit() -> None:
+    if _session is None or _session.closed or _session_loop is None:
+        return
+    if _session_loop.is_closed() or _session_loop.is_running():
+        return
+    try:
+        _session_loop.run_until_complete(close_session())
+    except Exception as e:
+        logger.debug(f"Failed to close shared HTTP session at exit: {e}")
+
+
+atexit.register(_close_session_at_exit)
+
+
+# Firecrawl client, reused across calls while the API key is unchanged
+_firecrawl_app = None
+_firecrawl_api_key: Optional[str] = None
+
+
+def _get_firecrawl_app():
+    global _firecrawl_app, _firecrawl_api_key
+    if not FIRECRAWL_AVAILABLE:
+        raise ImportError("firecrawl is not installed. Install it with: pip install firecrawl-py")
+    api_key = os.environ.get("FIRECRAWL_API_KEY")
+    if _firecrawl_app is None or api_key != _firecrawl_api_key:
+        _firecrawl_app = AsyncFirecrawlApp(api_key=api_key)
+        _firecrawl_api_key = api_key
+    return _firecrawl_app
+
+
+_YOUTUBE_HOSTS = frozenset(
+    {
+        "youtube.com",
+        "www.youtube.com",
+        "m.youtube.com",
+        "music.youtube.com",
+        "youtu.be",
+        "www.youtu.be",
+    }
+)
+
+# Path suffixes whose type is unambiguous, so url_provider can skip the HEAD request.
+# Extension-less paths are not listed: download endpoints often serve PDFs without one.
+_SUFFIX_TYPES = {
+    ".pdf": "application/pdf",
+    ".epub": "application/epub+zip",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".html": "article",
+    ".htm": "article",
+}
+
+# url -> identified_type, for URLs whose type was confirmed by a HEAD request
+URL_TYPE_CACHE_TTL = 3600
+URL_TYPE_CACHE_SIZE = 1024
+_url_type_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+
+def _get_cached_url_type(url: str) -> Optional[str]:
+    entry = _url_type_cache.get(url)
+    if entry is None:
+        return None
+    expires_at, identified_type = entry
+    if expires_at < time.monotonic():
+        del _url_type_cache[url]
+        return None
+    _url_type_cache.move_to_end(url)
+    return identified_type
+
+
+def _cache_url_type(url: str, identified_type: str) -> None:
+    _url_type_cache[url] = (time.monotonic() + URL_TYPE_CACHE_TTL, identified_type)
+    _url_type_cache.move_to_end(url)
+    while len(_url_type_cache) > URL_TYPE_CACHE_SIZE:
+        _url_type_cache.popitem(last=False)
+
+
+# XPath equivalent of the CSS selector
+# 'article, .content, .post, main, [role="main"], div[class*="content"], div[class*="article"]'
+# compiled once so the fallback path does not re-parse selectors per page
+_CONTENT_XPATH = etree.XPath(
+    "//article"
+    " | //*[contains(concat(' ', normalize-space(@class), ' '), ' content ')]"
+    " | //*[contains(concat(' ', normalize-space(@class), ' '), ' post ')]"
+    " | //main"
+    " | //*[@role='main']"
+    " | //div[contains(@class, 'content')]"
+    " | //div[contains(@class, 'article')]"
+)
+_H1_TEXT_XPATH = etree.XPath("string(//h1)")
+_OG_TITLE_XPATH = etree.XPath("string(//meta[@property='og:title']/@content)")
+
+
+def _parse_html(html: str) -> etree._Element:
+    """Parse an HTML string with lxml, tolerating XML encoding declarations."""
+    try:
+        return lxml_html.fromstring(html)
+    except ValueError:
+        # lxml rejects str input that carries an <?xml encoding=...?> declaration
+        parser = lxml_html.HTMLParser(encoding="utf-8")
+        return lxml_html.fromstring(html.encode("utf-8"), parser=parser)
+
+
+_STREAM_CHUNK_SIZE = 32768
+
+# <meta charset="..."> / <meta http-equiv content="...; charset=..."> near the top of a page
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+_META_SNIFF_BYTES = 2048
+# Labels that browsers decode with a superset codec (WHATWG encoding spec)
+_CHARSET_SUPERSETS = {"gb2312": "gbk", "ascii": "cp1252", "iso8859-1": "cp1252"}
+
+
+def _lookup_codec(label: str) -> Optional[str]:
+    try:
+        name = codecs.lookup(label).name
+    except LookupError:
+        return None
+    return _CHARSET_SUPERSETS.get(name, name)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_content_type(content_type: str) -> Tuple[str, Optional[str]]:
+    """Split a Content-Type header into (mime type, charset), both lowercased."""
+    if not content_type.strip():
+        return "", None
+    msg = Message()
+    msg["content-type"] = content_type
+    return msg.get_content_type(), msg.get_content_charset()
+
+
+@functools.lru_cache(maxsize=64)
+def _resolve_charset(content_type: str) -> Optional[str]:
+    """Return the codec name declared in a Content-Type header, or None if absent/unknown."""
+    charset = _parse_content_type(content_type)[1]
+    if not charset:
+        return None
+    encoding = _lookup_codec(charset)
+    if encoding is None:
+        logger.warning(f"Unknown charset in Content-Type: {charset}")
+    return encoding
+
+
+def _sniff_meta_charset(html_bytes: bytes) -> Optional[str]:
+    """Return the codec declared by a <meta> charset in the first bytes of the page."""
+    match = _META_CHARSET_RE.search(html_bytes, 0, _META_SNIFF_BYTES)
+    if not match:
+        return None
+    return _lookup_codec(match.group(1).decode("ascii", errors="ignore"))
+
+
+def _decode_html(html_bytes: bytes) -> str:
+    """
+    Decode an HTML body whose charset was not declared in the headers.
+
+    Order: UTF-8 BOM, <meta> charset, strict UTF-8, then a single
+    charset-normalizer detection. The body is decoded once by the winner.
+    """
+    if html_bytes.startswith(codecs.BOM_UTF8):
+        return html_bytes[len(codecs.BOM_UTF8) :].decode("utf-8", errors="replace")
+    encoding = _sniff_meta_charset(html_bytes)
+    if encoding:
+        logger.debug(f"Using <meta> declared HTML encoding: {encoding}")
+        return html_bytes.decode(encoding, errors="replace")
+    try:
+        return html_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+    if CHARSET_NORMALIZER_AVAILABLE:
+        best = detect_charset(html_bytes).best()
+        if best is not None:
+            logger.debug(f"Detected HTML encoding: {best.encoding}")
+            return html_bytes.decode(best.encoding, errors="replace")
+    # Not UTF-8 and no detector: assume a Chinese site (gb18030 is a superset of gbk/gb2312)
+    logger.warning("Failed to detect HTML encoding, using gb18030 with error replacement")
+    return html_bytes.decode("gb18030", errors="replace")
+
+
+async def _stream_parse_html(
+    response: aiohttp.ClientResponse, encoding: str
+) -> etree._Element:
+    """Decode and parse the response body incrementally as chunks arrive."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parser = etree.HTMLPullParser()
+    parser.set_element_class_lookup(lxml_html.HtmlElementClassLookup())
+    async for chunk in response.content.iter_chunked(_STREAM_CHUNK_SIZE):
+        parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b"", final=True))
+    return parser.close()
+
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _element_text(element: etree._Element) -> str:
+    """Text of an element with whitespace runs collapsed to single spaces."""
+    return _WS_RE.sub(" ", " ".join(element.itertext())).strip()
+
+
+async def _probe_content_type(session: aiohttp.ClientSession, url: str) -> str:
+    """
+    Return the MIME type of a URL without downloading its body.
+
+    Tries HEAD first; servers/CDNs that reject HEAD (error status or a
+    failed request) are retried with a one-byte range GET.
+    """
+    try:
+        async with session.head(
+            url, timeout=_HEAD_TIMEOUT, allow_redirects=True
+        ) as resp:
+            if resp.status < 400:
+                return _parse_content_type(resp.headers.get("content-type", ""))[0]
+            logger.debug(f"HEAD returned {resp.status} for {url}, retrying with range GET")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"HEAD failed for {url} ({e}), retrying with range GET")
+    async with session.get(
+        url,
+        headers={"Range": "bytes=0-0"},
+        timeout=_HEAD_TIMEOUT,
+        allow_redirects=True,
+    ) as resp:
+        resp.raise_for_status()
+        return _parse_content_type(resp.headers.get("content-type", ""))[0]
+
 
 async def url_provider(state: ProcessSourceState):
     """
@@ -19,19 +329,33 @@ async def url_provider(state: ProcessSourceState):
     return_dict = {}
     url = state.url
     if url:
-        if "youtube.com" in url or "youtu.be" in url:
+        parts = urlsplit(url)
+        # Scheme-less input ("youtube.com/watch?v=...") parses as a bare path
+        host = parts.hostname or urlsplit(f"//{url}").hostname or ""
+        if host in _YOUTUBE_HOSTS:
             return_dict["identified_type"] = "youtube"
         else:
+            suffix = os.path.splitext(parts.path)[1].lower()
+            if suffix in _SUFFIX_TYPES:
+                identified_type = _SUFFIX_TYPES[suffix]
+                logger.debug(f"Identified type for {url} from suffix: {identified_type}")
+                return_dict["identified_type"] = identified_type
+                return return_dict
+            cached_type = _get_cached_url_type(url)
+            if cached_type is not None:
+                logger.debug(f"Identified type for {url} (cached): {cached_type}")
+                return_dict["identified_type"] = cached_type
+                return return_dict
             # remote URL: check content-type to catch PDFs
+            probe_ok = False
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.head(
-                        url, timeout=10, allow_redirects=True
-                    ) as resp:
-                        mime = resp.headers.get("content-type", "").split(";", 1)[0]
-                        logger.debug(f"MIME type for {url}: {mime}")
+                session = await get_session()
+                async with _get_fetch_semaphore():
+                    mime = await _probe_content_type(session, url)
+                logger.debug(f"MIME type for {url}: {mime}")
+                probe_ok = True
             except Exception as e:
-                logger.warning(f"HEAD check failed for {url}: {e}")
+                logger.warning(f"Content-type check failed for {url}: {e}")
                 mime = "article"
             if (
                 mime in DOCLING_SUPPORTED
@@ -43,12 +367,14 @@ async def url_provider(state: ProcessSourceState):
             else:
                 logger.debug(f"Identified type for {url}: article")
                 return_dict["identified_type"] = "article"
+            if probe_ok:
+                _cache_url_type(url, return_dict["identified_type"])
     return return_dict
 
 
 async def extract_url_bs4(url: str) -> dict:
     """
-    Get the title and content of a URL using readability with a fallback to BeautifulSoup.
+    Get the title and content of a URL using readability with a fallback to lxml selectors.
     Uses Chrome browser headers to avoid being blocked by websites.
 
     Args:
@@ -57,6 +383,9 @@ async def extract_url_bs4(url: str) -> dict:
     Returns:
         dict: A dictionary containing the 'title' and 'content' of the webpage.
     """
+    # Imported here so deployments using only Jina/Firecrawl never load readability
+    from readability import Document
+
     # 标准 Chrome 浏览器请求头
     headers = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -72,94 +401,68 @@ async def extract_url_bs4(url: str) -> dict:
         "Cache-Control": "max-age=0"
     }
     
-    async with aiohttp.ClientSession() as session:
-        try:
-            # Fetch the webpage content with Chrome browser headers
-            async with session.get(url, headers=headers, timeout=30) as response:
+    session = await get_session()
+    try:
+        # Fetch the webpage content with Chrome browser headers
+        async with _get_fetch_semaphore():
+            async with session.get(url, headers=headers, timeout=_GET_TIMEOUT) as response:
                 if response.status != 200:
                     raise Exception(f"HTTP error: {response.status}")
-                
-                # Handle encoding issues for Chinese websites (GBK/GB2312)
-                try:
-                    # Try to get encoding from Content-Type header
-                    content_type = response.headers.get('Content-Type', '').lower()
-                    encoding = None
-                    if 'charset=' in content_type:
-                        encoding = content_type.split('charset=')[1].split(';')[0].strip()
-                    
-                    if encoding:
-                        # Use detected encoding
-                        html = await response.text(encoding=encoding, errors='replace')
-                    else:
-                        # Read as bytes and try multiple encodings
-                        html_bytes = await response.read()
-                        # Try common encodings for Chinese websites
-                        for enc in ['utf-8', 'gbk', 'gb2312', 'gb18030', 'big5', 'latin1']:
-                            try:
-                                html = html_bytes.decode(enc)
-                                logger.debug(f"Decoded HTML using encoding: {enc}")
-                                break
-                            except (UnicodeDecodeError, LookupError):
-                                continue
-                        else:
-                            # Last resort: use errors='replace' to avoid crash
-                            html = html_bytes.decode('utf-8', errors='replace')
-                            logger.warning(f"Failed to decode with common encodings, using utf-8 with error replacement")
-                except Exception as e:
-                    logger.warning(f"Error handling encoding, using fallback: {e}")
-                    # Fallback: let aiohttp handle it with error replacement
-                    html = await response.text(errors='replace')
-                
-                logger.debug(f"Fetched HTML for {url}, length: {len(html)}")
-
-            # Try extracting with readability
-            try:
-                doc = Document(html)
-                title = doc.title() or "No title found"
-                logger.debug(f"Extracted title for {url}: {title}")
-                # Extract content as plain text by parsing the cleaned HTML
-                soup = BeautifulSoup(doc.summary(), "lxml")
-                content = soup.get_text(separator=" ", strip=True) 
-                logger.debug(f"Extracted content for {url}: {content}")
-                if not content.strip():
-                    raise ValueError("No content extracted by readability")
-            except Exception as e:
-                logger.warning(f"Readability failed: {e}")
-                # Fallback to BeautifulSoup
-                soup = BeautifulSoup(html, "lxml")
-                # Extract title
-                title_tag = (
-                    soup.find("title")
-                    or soup.find("h1")
-                    or soup.find("meta", property="og:title")
-                )
-                title = (
-                    title_tag.get_text(strip=True) if title_tag else "No title found"
-                )
-                # Extract content from common content tags
-                content_tags = soup.select(
-                    'article, .content, .post, main, [role="main"], div[class*="content"], div[class*="article"]'
-                )
-                content = (
-                    " ".join(
-                        tag.get_text(separator=" ", strip=True) for tag in content_tags
-                    )
-                    if content_tags
-                    else soup.get_text(separator=" ", strip=True)
-                )
-                content = content.strip() or "No content found"
+            
+                # Try to get encoding from Content-Type header
+                encoding = _resolve_charset(response.headers.get('Content-Type', ''))
+
+                if encoding:
+                    # Charset known up front: parse while the body is still downloading
+                    root = await _stream_parse_html(response, encoding)
+                else:
+                    # Handle encoding issues for Chinese websites (GBK/GB2312)
+                    html_bytes = await response.read()
+                    root = _parse_html(_decode_html(html_bytes))
 
-            return {
-                "title": title,
-                "content": content,
-            }
+                logger.debug(f"Parsed HTML for {url}")
 
+        # Try extracting with readability
+        try:
+            # readability accepts the parsed tree, so the page is only parsed once
+            doc = Document(root)
+            title = doc.title() or "No title found"
+            logger.debug(f"Extracted title for {url}: {title}")
+            # Extract content as plain text by parsing the cleaned HTML
+            content = _element_text(lxml_html.fromstring(doc.summary()))
+            logger.debug(f"Extracted content for {url}: {content}")
+            if not content.strip():
+                raise ValueError("No content extracted by readability")
         except Exception as e:
-            print(f"Error processing URL {url}: {e}")
-            return {
-                "title": "Error",
-                "content": f"Failed to extract content: {str(e)}",
-            }
+            logger.warning(f"Readability failed: {e}")
+            # Fallback: reuse the lxml tree, no BeautifulSoup tree construction
+            etree.strip_elements(root, "script", "style", "noscript", with_tail=False)
+            title = (
+                root.findtext(".//title")
+                or _H1_TEXT_XPATH(root)
+                or _OG_TITLE_XPATH(root)
+                or ""
+            ).strip() or "No title found"
+            # Extract content from common content tags
+            content_nodes = _CONTENT_XPATH(root)
+            content = (
+                " ".join(_element_text(node) for node in content_nodes)
+                if content_nodes
+                else _element_text(root)
+            )
+            content = content.strip() or "No content found"
+
+        return {
+            "title": title,
+            "content": content,
+        }
+
+    except Exception as e:
+        logger.exception(f"Error processing URL {url}: {e}")
+        return {
+            "title": "Error",
+            "content": f"Failed to extract content: {str(e)}",
+        }
 
 
 async def extract_url_jina(url: str):
@@ -170,8 +473,11 @@ async def extract_url_jina(url: str):
     api_key = os.environ.get("JINA_API_KEY")
     if api_key:
         headers["Authorization"] = f"Bearer {api_key}"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"https://r.jina.ai/{url}", headers=headers) as response:
+    session = await get_session()
+    async with _get_fetch_semaphore():
+        async with session.get(
+            f"https://r.jina.ai/{url}", headers=headers
+        ) as response:
             text = await response.text()
             if text.startswith("Title:") and "\n" in text:
                 title_end = text.index("\n")
@@ -194,9 +500,7 @@ async def extract_url_firecrawl(url: str):
     Returns {"title": ..., "content": ...} or None on failure.
     """
     try:
-        from firecrawl import AsyncFirecrawlApp
-
-        app = AsyncFirecrawlApp(api_key=os.environ.get("FIRECRAWL_API_KEY"))
+        app = _get_firecrawl_app()
         scrape_result = await app.scrape_url(url, formats=["markdown", "html"])
         return {
             "title": scrape_result.metadata["title"] or scrape_result.title,
@@ -1,48 +1,98 @@
 import os
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
 from typing import Dict, Optional
 from pydantic_settings import BaseSettings
-import torch
 
 from logger import logger  # 使用已配置好的 logger
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
+
+def _detect_device() -> str:
+    """探测推理设备，延迟导入 torch，避免仅读取配置时加载整个 torch"""
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+@dataclass(frozen=True, slots=True)
+class DefaultPaths:
+    """模型默认路径，导入时按 current_dir 计算一次；ModelConfig 以此为默认值，仍可被 LLM_* 环境变量覆盖"""
+    ROOT_DIR: str = current_dir
+    CHAT_MODEL_PATH: str = os.path.join(current_dir, "models", "tencent", "Hunyuan-7B-Instruct")
+    EMBEDDING_MODEL_PATH: str = os.path.join(current_dir, "models", "maidalun1020", "bce-embedding-base_v1")
+    TTS_MODEL_PATH: str = os.path.join(current_dir, "models", "microsoft", "speecht5_tts")
+    TTS_VOCODER_PATH: str = os.path.join(current_dir, "models", "microsoft", "speecht5_hifigan")
+    KOKORO_MODEL_PATH: str = os.path.join(current_dir, "models", "hexgrad", "Kokoro-82M-v1.1-zh")
+    INDEX_TTS_MODEL_PATH: str = os.path.join(current_dir, "checkpoints", "IndexTeam", "IndexTTS-2")
+    INDEX_TTS_HF_CACHE_DIR: str = os.path.join(current_dir, "checkpoints", "hf_cache")
+    SOULX_BASE_MODEL_PATH: str = os.path.join(current_dir, "pretrained_models", "SoulX-Podcast-1.7B")
+    SOULX_DIALECTAL_MODEL_PATH: str = os.path.join(current_dir, "pretrained_models", "SoulX-Podcast-1.7B-dialect")
+
+
+DEFAULT_PATHS = DefaultPaths()
+
+
 class ModelConfig(BaseSettings):
     """Model configuration
     https://deepinfra.com/hexgrad/Kokoro-82M
     
     """
-    ROOT_DIR: str = current_dir
+    ROOT_DIR: str = DEFAULT_PATHS.ROOT_DIR
     # Chat model settings
-    CHAT_MODEL_PATH: str = os.path.join(current_dir, "models", "tencent", "Hunyuan-7B-Instruct")
+    CHAT_MODEL_PATH: str = DEFAULT_PATHS.CHAT_MODEL_PATH
+    CHAT_LLM_ENGINE: str = "hf"  # "hf" or "vllm"
+    CHAT_QUANTIZATION: Optional[str] = None  # None or "int8" (torchao weight-only, hf engine)
+    CHAT_PREFIX_CACHING: bool = True  # reuse the KV cache of repeated system prompts
+    CHAT_PREFIX_CACHE_SIZE: int = 8  # system prompt KV caches kept on the hf engine (LRU)
+    CHAT_DRAFT_MODEL_PATH: Optional[str] = None  # small model sharing the tokenizer, enables speculative decoding
+    CHAT_NUM_SPECULATIVE_TOKENS: int = 4  # draft tokens proposed per verification step
+    CHAT_STREAM_TOKEN_TIMEOUT: float = 120.0  # seconds to wait for the next streamed token once generation has started
 
-    DEVICE: str = "cuda" if torch.cuda.is_available() else "cpu"
+    # 设置 LLM_DEVICE 时跳过 CUDA 探测
+    DEVICE: str = os.getenv("LLM_DEVICE") or _detect_device()
 
     TTS_PROVIDER: str = os.getenv("TTS_PROVIDER", "kokoro")  # Options: kokoro, index-tts, soulx
     # Note: index-tts and soulx may require different conda environments due to package conflicts
     # Set TTS_PROVIDER environment variable to switch between them
+    TTS_WARMUP: bool = True  # run one short synthesis after loading so the first request is not slowed by autotuning/compilation
+    TTS_CACHE_SIZE: int = 128  # encoded results kept per TTS backend for repeated requests (0 disables)
+    TTS_ENCODE_WORKERS: int = min(4, os.cpu_count() or 1)  # concurrent ffmpeg encodes for batched speech generation
     
     # Embedding model settings
-    EMBEDDING_MODEL_PATH: str = os.path.join(current_dir, "models", "maidalun1020", "bce-embedding-base_v1")
+    EMBEDDING_MODEL_PATH: str = DEFAULT_PATHS.EMBEDDING_MODEL_PATH
+    EMBEDDING_COMPILE: bool = False  # torch.compile the embedding model
     
     # TTS model settings
-    TTS_MODEL_PATH: str = os.path.join(current_dir, "models", "microsoft", "speecht5_tts")
-    TTS_VOCODER_PATH: str = os.path.join(current_dir, "models", "microsoft", "speecht5_hifigan")
+    TTS_MODEL_PATH: str = DEFAULT_PATHS.TTS_MODEL_PATH
+    TTS_VOCODER_PATH: str = DEFAULT_PATHS.TTS_VOCODER_PATH
 
     # TTS model settings
-    KOKORO_MODEL_PATH: str = os.path.join(current_dir, "models", "hexgrad", "Kokoro-82M-v1.1-zh")
+    KOKORO_MODEL_PATH: str = DEFAULT_PATHS.KOKORO_MODEL_PATH
+    KOKORO_COMPILE: bool = False  # torch.compile the Kokoro decoder
+    KOKORO_PRECISION: str = "fp32"  # "fp32", "fp16" (CUDA) or "bf16" (autocast)
 
     # IndexTTS model settings
-    INDEX_TTS_MODEL_PATH: str = os.path.join(current_dir, "checkpoints", "IndexTeam", "IndexTTS-2")
-    INDEX_TTS_HF_CACHE_DIR: str = os.path.join(current_dir, "checkpoints", "hf_cache")  # Hugging Face cache directory
+    INDEX_TTS_MODEL_PATH: str = DEFAULT_PATHS.INDEX_TTS_MODEL_PATH
+    INDEX_TTS_HF_CACHE_DIR: str = DEFAULT_PATHS.INDEX_TTS_HF_CACHE_DIR  # Hugging Face cache directory
+    INDEX_TTS_PRECISION: str = "fp32"  # "fp32", "fp16", "bf16" or "auto" (pick by GPU compute capability)
+    INDEX_TTS_COMPILE: bool = False  # torch.compile the s2mel stage
+    INDEX_TTS_ACCEL: bool = False  # static KV cache + CUDA graph decoding for the GPT stage (needs flash_attn)
+    INDEX_TTS_PRELOAD_VOICES: bool = True  # precompute conditioning for mapped voices at startup
     
     # SoulX TTS model settings
-    SOULX_MODEL_PATH: str = os.path.join(current_dir, "pretrained_models", "SoulX-Podcast-1.7B-dialect")
+    SOULX_MODEL_PATH: str = DEFAULT_PATHS.SOULX_DIALECTAL_MODEL_PATH
     SOULX_LLM_ENGINE: str = "hf"  # "hf" or "vllm"
     SOULX_FP16_FLOW: bool = False
+    SOULX_COMPILE: bool = False  # torch.compile the SoulX flow model (and the LLM on the hf engine)
+    SOULX_PRELOAD_VOICES: bool = True  # precompute reference features for mapped voices at startup
     SOULX_SPK_TEXT_PROMPT: Optional[str] = None  # Optional reference text
-    SOULX_BASE_MODEL_PATH: str = os.path.join(current_dir, "pretrained_models", "SoulX-Podcast-1.7B")
-    SOULX_DIALECTAL_MODEL_PATH: str = os.path.join(current_dir, "pretrained_models", "SoulX-Podcast-1.7B-dialect")
+    SOULX_BASE_MODEL_PATH: str = DEFAULT_PATHS.SOULX_BASE_MODEL_PATH
+    SOULX_DIALECTAL_MODEL_PATH: str = DEFAULT_PATHS.SOULX_DIALECTAL_MODEL_PATH
     
     # TTS embeddings dataset settings
     EMBEDDINGS_DATASET_NAME: str = "Matthijs/cmu-arctic-xvectors"
@@ -213,10 +263,14 @@ config = ModelConfig()
 if config.TTS_PROVIDER == "kokoro":
     logger.info("Loading Kokoro voices")
     voices_path = os.path.join(config.KOKORO_MODEL_PATH, "voices")
-    # voice_path 目录下以 zf, zm 开头的文件
-    voice_files = [f for f in os.listdir(voices_path) if f.startswith("zf_") or f.startswith("zm_")]
-    # 从文件名中提取 voice_id
-    voice_ids = [f.split(".")[0] for f in voice_files]
+    # voice_path 目录下以 zf, zm 开头的文件；scandir 不需要为每个文件额外 stat
+    with os.scandir(voices_path) as entries:
+        voice_ids = [Path(entry.name).stem for entry in entries if entry.name.startswith(("zf_", "zm_"))]
     # 添加到 VOICE_MAPPINGS["kokoro_zh"]
     for voice_id in voice_ids:
         config.VOICE_MAPPINGS["kokoro_zh"][voice_id] = voice_id
+
+# 启动后音色映射只读，冻结为不可变视图，防止请求路径上被意外修改
+config.VOICE_MAPPINGS = MappingProxyType(
+    {provider: MappingProxyType(voices) for provider, voices in config.VOICE_MAPPINGS.items()}
+)
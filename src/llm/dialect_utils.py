@@ -3,10 +3,10 @@
 用于处理中文方言的标记、提示文本等
 """
 import re
-from typing import Optional, Dict, List
+from functools import lru_cache
+from typing import Optional, Dict, List, Tuple
 from pathlib import Path
 import json
-import os
 
 # 方言标记映射
 DIALECT_TAGS = {
@@ -22,9 +22,40 @@ DIALECT_TAGS = {
     "chinese": "",  # 默认中文为普通话
 }
 
+# 方言标记 -> 方言名称（保留字典中第一个出现的名称）
+_TAG_TO_DIALECT: Dict[str, str] = {
+    tag: dialect for dialect, tag in reversed(list(DIALECT_TAGS.items())) if tag
+}
+
+# 匹配文本开头任意方言标记的预编译正则（长标记优先）
+_DIALECT_TAG_RE = re.compile(
+    "^(" + "|".join(re.escape(t) for t in sorted(_TAG_TO_DIALECT, key=len, reverse=True)) + ")"
+)
+
 # 支持的方言列表
 SUPPORTED_DIALECTS = ["mandarin", "sichuan", "sichuanese", "henan", "henanese", "yue", "cantonese", "shanghainese"]
 
+# 默认方言提示文本（使用 SoulX 格式）
+_DEFAULT_DIALECT_PROMPTS: Dict[str, List[str]] = {
+    "sichuan": [
+        "<|Sichuan|>要得要得！前头几个耍洋盘，我后脚就背起铺盖卷去景德镇耍泥巴，巴适得喊老天爷！",
+        "<|Sichuan|>哎哟喂，这个搞反了噻！黑神话里头唱曲子的王二浪早八百年就在黄土高坡吼秦腔喽，游戏组专门跑切录的原汤原水，听得人汗毛儿都立起来！"
+    ],
+    "henan": [
+        "<|Henan|>俺这不是怕恁路上不得劲儿嘛！那景德镇瓷泥可娇贵着哩，得先拿咱河南人这实诚劲儿给它揉透喽。",
+        "<|Henan|>恁这想法真闹挺！陕北民谣比黑神话早几百年都有了，咱可不兴这弄颠倒啊，中不？恁这想法真闹挺！那陕北民谣在黄土高坡响了几百年，咋能说是跟黑神话学的咧？咱得把这事儿捋直喽，中不中！"
+    ],
+    "yue": [
+        "<|Yue|>真係冇讲错啊！攀山滑雪嘅语言专家几巴闭，都唔及我听日拖成副身家去景德镇玩泥巴，呢铺真系发哂白日梦咯！",
+        "<|Yue|>咪搞错啊！陕北民谣响度唱咗几十年，黑神话边有咁大面啊？你估佢哋抄游戏咩！"
+    ],
+    "shanghai": [
+        "<|Shanghai|>侬讲得对个！阿拉上海人做事体就是噶认真，勿会得马虎个。",
+        "<|Shanghai|>覅瞎讲八讲！这个事体阿拉老早就晓得勒，勿是现在才晓得个。"
+    ]
+}
+
+@lru_cache(maxsize=64)
 def get_dialect_tag(dialect: Optional[str]) -> str:
     """
     获取方言标记
@@ -64,10 +95,7 @@ def add_dialect_tag_to_text(text: str, dialect: Optional[str]) -> str:
         return text
     
     # 移除文本开头的其他方言标记（如果存在）
-    for tag in DIALECT_TAGS.values():
-        if tag and text.startswith(tag):
-            text = text[len(tag):].lstrip()
-            break
+    text = remove_dialect_tag(text)
     
     # 添加新的方言标记
     return f"{dialect_tag}{text}"
@@ -82,9 +110,9 @@ def remove_dialect_tag(text: str) -> str:
     Returns:
         移除方言标记后的文本
     """
-    for tag in DIALECT_TAGS.values():
-        if tag and text.startswith(tag):
-            return text[len(tag):].lstrip()
+    match = _DIALECT_TAG_RE.match(text)
+    if match:
+        return text[match.end():].lstrip()
     return text
 
 def detect_dialect_from_text(text: str) -> Optional[str]:
@@ -97,11 +125,12 @@ def detect_dialect_from_text(text: str) -> Optional[str]:
     Returns:
         方言名称，如果未检测到则返回 None
     """
-    for dialect, tag in DIALECT_TAGS.items():
-        if tag and text.startswith(tag):
-            return dialect
+    match = _DIALECT_TAG_RE.match(text)
+    if match:
+        return _TAG_TO_DIALECT[match.group(1)]
     return None
 
+@lru_cache(maxsize=64)
 def get_default_dialect_prompt(dialect: Optional[str], speaker_index: int = 0) -> str:
     """
     获取默认的方言提示文本
@@ -121,27 +150,7 @@ def get_default_dialect_prompt(dialect: Optional[str], speaker_index: int = 0) -
     # 规范化方言名称（处理别名）
     normalized_dialect = normalize_dialect_name(dialect_lower) or dialect_lower
     
-    # 默认方言提示文本（使用 SoulX 格式）
-    default_prompts = {
-        "sichuan": [
-            "<|Sichuan|>要得要得！前头几个耍洋盘，我后脚就背起铺盖卷去景德镇耍泥巴，巴适得喊老天爷！",
-            "<|Sichuan|>哎哟喂，这个搞反了噻！黑神话里头唱曲子的王二浪早八百年就在黄土高坡吼秦腔喽，游戏组专门跑切录的原汤原水，听得人汗毛儿都立起来！"
-        ],
-        "henan": [
-            "<|Henan|>俺这不是怕恁路上不得劲儿嘛！那景德镇瓷泥可娇贵着哩，得先拿咱河南人这实诚劲儿给它揉透喽。",
-            "<|Henan|>恁这想法真闹挺！陕北民谣比黑神话早几百年都有了，咱可不兴这弄颠倒啊，中不？恁这想法真闹挺！那陕北民谣在黄土高坡响了几百年，咋能说是跟黑神话学的咧？咱得把这事儿捋直喽，中不中！"
-        ],
-        "yue": [
-            "<|Yue|>真係冇讲错啊！攀山滑雪嘅语言专家几巴闭，都唔及我听日拖成副身家去景德镇玩泥巴，呢铺真系发哂白日梦咯！",
-            "<|Yue|>咪搞错啊！陕北民谣响度唱咗几十年，黑神话边有咁大面啊？你估佢哋抄游戏咩！"
-        ],
-        "shanghai": [
-            "<|Shanghai|>侬讲得对个！阿拉上海人做事体就是噶认真，勿会得马虎个。",
-            "<|Shanghai|>覅瞎讲八讲！这个事体阿拉老早就晓得勒，勿是现在才晓得个。"
-        ]
-    }
-    
-    prompts = default_prompts.get(normalized_dialect, [])
+    prompts = _DEFAULT_DIALECT_PROMPTS.get(normalized_dialect, [])
     if prompts and speaker_index < len(prompts):
         return prompts[speaker_index]
     elif prompts:
@@ -162,7 +171,7 @@ def load_dialect_prompts_from_file(dialect: str, file_path: Optional[Path] = Non
     """
     if file_path is None:
         # 默认路径
-        current_dir = os.path.dirname(os.path.abspath(__file__))
+        current_dir = Path(__file__).resolve().parent
         dialect_file_map = {
             "sichuan": "SoulX-Podcast-main/example/dialect_prompt/sichuan.txt",
             "henan": "SoulX-Podcast-main/example/dialect_prompt/henan.txt",
@@ -176,28 +185,35 @@ def load_dialect_prompts_from_file(dialect: str, file_path: Optional[Path] = Non
         else:
             return []
     
-    if not file_path.exists():
+    try:
+        mtime = Path(file_path).stat().st_mtime
+    except OSError:
         return []
     
-    prompts = []
-    dialect_tag = get_dialect_tag(dialect)
-    
+    # 按 (标记, 路径, 修改时间) 缓存，文件未变化时不重复读取磁盘
+    return list(_read_dialect_prompts(get_dialect_tag(dialect), str(file_path), mtime))
+
+@lru_cache(maxsize=32)
+def _read_dialect_prompts(dialect_tag: str, file_path: str, mtime: float) -> Tuple[str, ...]:
+    """读取提示文本文件，一次解码整个文件，并为缺少方言标记的行添加标记"""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    # 如果行不包含方言标记，添加它
-                    if dialect_tag and not line.startswith(dialect_tag):
-                        line = f"{dialect_tag}{line}"
-                    prompts.append(line)
+        data = Path(file_path).read_text(encoding="utf-8")
     except Exception as e:
         import logging
         logger = logging.getLogger("llm-service")
         logger.warning(f"Failed to load dialect prompts from {file_path}: {e}")
+        return ()
     
-    return prompts
+    lines = [line for line in map(str.strip, data.splitlines()) if line]
+    if not dialect_tag:
+        return tuple(lines)
+    # 如果行不包含方言标记，添加它
+    return tuple(
+        line if line.startswith(dialect_tag) else dialect_tag + line
+        for line in lines
+    )
 
+@lru_cache(maxsize=64)
 def is_dialect_supported(dialect: Optional[str]) -> bool:
     """
     检查方言是否受支持
@@ -214,6 +230,7 @@ def is_dialect_supported(dialect: Optional[str]) -> bool:
     dialect_lower = dialect.lower().strip()
     return dialect_lower in SUPPORTED_DIALECTS or dialect_lower in DIALECT_TAGS
 
+@lru_cache(maxsize=64)
 def normalize_dialect_name(dialect: Optional[str]) -> Optional[str]:
     """
     规范化方言名称
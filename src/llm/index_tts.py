@@ -1,12 +1,23 @@
+import importlib.util
 import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 import re
 import numpy as np
 import torch
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, List, Literal, Optional, Tuple
 import soundfile as sf
-import tempfile
+
+# 固定形状的卷积让 cuDNN 自动选择最快算法；Ampere+ 上 float32 矩阵乘使用 TF32
+if torch.cuda.is_available():
+    torch.backends.cudnn.benchmark = True
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
+torch.set_float32_matmul_precision('high')
 
 # Import logger (already configured)
 try:
@@ -64,12 +75,20 @@ class IndexTTSConfig:
     sampling_rate: 输出音频采样率
     language: 语言参数，默认 "auto"
     hf_cache_dir: Hugging Face 缓存目录（可选，默认使用 config.INDEX_TTS_HF_CACHE_DIR）
+    release_cache_between_calls: CUDA 上每次推理后释放 PyTorch 缓存的显存
+    precision: 推理精度，默认 fp32；设为 "auto" 时在 CUDA 上按算力选择（Ampere+ 用 bf16，Volta/Turing 用 fp16），其他设备用 fp32
+    compile: 使用 torch.compile 编译 s2mel 模块（IndexTTS2 内置支持）
+    accel: 自回归 GPT 阶段使用 IndexTTS2 内置的加速引擎（预分配的分块 KV 缓存 + CUDA Graph 解码），需要 CUDA 和 flash_attn
     """
     model_path: str
     device: str = "cpu"
     sampling_rate: int = 24000
     language: str = "auto"
     hf_cache_dir: Optional[str] = None
+    release_cache_between_calls: bool = True
+    precision: Literal["auto", "fp32", "fp16", "bf16"] = "fp32"
+    compile: bool = False
+    accel: bool = False
 
 @dataclass
 class IndexTTSParam:
@@ -90,6 +109,7 @@ class IndexTTS:
         self.device = config.device
         self.sampling_rate = config.sampling_rate
         self.model = None
+        self.precision = self._resolve_precision()
         
         # Setup HF cache directory if specified
         if config.hf_cache_dir:
@@ -97,40 +117,151 @@ class IndexTTS:
         
         self._load_model()
         
+        # 文本归一化/分词在单独线程预先完成，与上一个请求的 GPU 推理重叠
+        # 推理线程当前请求预先分好的 (文本, 分词结果)，随队列项传入，请求结束即清除
+        self._current_tokens: Optional[Tuple[str, List[str]]] = None
+        self._text_lock = threading.Lock()
+        self._text_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="indextts-text")
+        self._tokenize = self.model.tokenizer.tokenize
+        self.model.tokenizer.tokenize = self._tokenize_with_prefetch
+        
+        # 常驻推理线程独占模型，保持 CUDA 上下文和 cudnn 调优结果常热，并串行化并发请求
+        self._queue: "queue.Queue[Optional[Tuple[IndexTTSParam, Future, Optional[List[str]]]]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._worker_loop, name="indextts-worker", daemon=True)
+        self._worker.start()
+        
     def _load_model(self):
         """加载 Index TTS 模型"""
         try:
            logger.info("load indextts model from %s", self.config.model_path)
            logger.info("HF cache directory: %s", os.environ.get('HF_HUB_CACHE', 'default'))
-           self.model  = IndexTTS2(cfg_path=os.path.join(self.config.model_path, "config.yaml"), model_dir=self.config.model_path, device=self.device, use_fp16=False, use_deepspeed=False)
+           logger.info("IndexTTS precision: %s", self.precision)
+           self.model  = IndexTTS2(cfg_path=os.path.join(self.config.model_path, "config.yaml"), model_dir=self.config.model_path, device=self.device, use_fp16=self.precision == "fp16", use_deepspeed=False, use_accel=self._resolve_accel(), use_torch_compile=self.config.compile)
            logger.info("IndexTTS pipeline voices loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load IndexTTS model: {str(e)}")
             raise
+    
+    def _resolve_precision(self) -> str:
+        """根据配置和设备确定推理精度；非 CUDA 设备始终使用 fp32"""
+        precision = self.config.precision
+        if not self.device.startswith("cuda"):
+            if precision not in ("auto", "fp32"):
+                logger.warning("Precision %s is only supported on CUDA, using fp32 on %s", precision, self.device)
+            return "fp32"
+        if precision == "auto":
+            major, _ = torch.cuda.get_device_capability(self.device)
+            if major >= 8:
+                precision = "bf16"
+            elif major >= 7:
+                precision = "fp16"
+            else:
+                precision = "fp32"
+        # 确认设备确实支持 bf16 运算，否则退回 fp16
+        if precision == "bf16" and not torch.cuda.is_bf16_supported():
+            logger.warning("bf16 is not supported on this GPU, falling back to fp16")
+            precision = "fp16"
+        return precision
+    
+    def _resolve_accel(self) -> bool:
+        """加速引擎只支持 CUDA 且依赖 flash_attn，条件不满足时退回 HF generate"""
+        if not self.config.accel:
+            return False
+        if not self.device.startswith("cuda"):
+            logger.warning(f"IndexTTS accel engine is only supported on CUDA, disabled on {self.device}")
+            return False
+        if importlib.util.find_spec("flash_attn") is None:
+            logger.warning("flash_attn is not installed, IndexTTS accel engine disabled")
+            return False
+        return True
+    
+    def _autocast(self):
+        """bf16 通过 autocast 启用（IndexTTS2 自身只支持 fp16 权重）"""
+        if self.precision == "bf16":
+            return torch.autocast(device_type="cuda", dtype=torch.bfloat16)
+        return nullcontext()
         
+    def _worker_loop(self):
+        """推理线程主循环：依次取出请求并把结果写入对应的 Future"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            param, future, tokens = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            if tokens is not None:
+                self._current_tokens = (param.text, tokens)
+            try:
+                future.set_result(self._generate_speech(param))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                # 推理在分词前失败时也不会残留
+                self._current_tokens = None
+    
+    def generate_speech_async(self, param: IndexTTSParam) -> Future:
+        """
+        提交语音生成请求，立即返回 Future，调用方可以在等待期间准备下一个请求
+        :param param: IndexTTSParam 参数对象
+        :return: 结果为语音 numpy 数组的 Future
+        """
+        future: Future = Future()
+        prefetch = self._text_pool.submit(self._prefetch_tokens, param.text)
+        # 单线程文本池按提交顺序完成，推理队列的顺序与调用顺序一致
+        prefetch.add_done_callback(lambda done: self._queue.put((param, future, done.result())))
+        return future
+    
+    def _prefetch_tokens(self, text: str) -> Optional[List[str]]:
+        """在文本线程中提前完成分词，结果随队列项交给推理线程中的 infer 直接取用"""
+        try:
+            with self._text_lock:
+                return self._tokenize(text)
+        except Exception as e:
+            # 预处理失败时由 infer 在推理线程中重新分词并报告错误
+            logger.debug("Text prefetch failed, deferring to infer: %s", e)
+            return None
+    
+    def _tokenize_with_prefetch(self, text: str) -> List[str]:
+        """替换 IndexTTS2 tokenizer.tokenize：优先使用预先分好的结果"""
+        current = self._current_tokens
+        if current is not None and current[0] == text:
+            self._current_tokens = None
+            return current[1]
+        # TextNormalizer 并非线程安全，与预处理线程互斥
+        with self._text_lock:
+            return self._tokenize(text)
+    
     def generate_speech(self, param: IndexTTSParam) -> np.ndarray:
         """
         生成语音
         :param param: IndexTTSParam 参数对象
         :return: 生成的语音 numpy 数组
         """
-        temp_output_path = None
+        return self.generate_speech_async(param).result()
+    
+    def preload_voices(self, audio_prompts: List[str]):
+        """预先提取参考音频的说话人/情感条件并缓存，之后使用这些音色的请求跳过特征提取"""
+        with torch.inference_mode(), self._autocast():
+            for audio_prompt in audio_prompts:
+                try:
+                    self.model.get_spk_conditioning(audio_prompt)
+                    self.model.get_emo_conditioning(audio_prompt)
+                except Exception as e:
+                    logger.warning("Failed to precompute conditioning for %s: %s", audio_prompt, e)
+        logger.info("Precomputed IndexTTS conditioning for %d voices", len(audio_prompts))
+    
+    def close(self):
+        """停止推理线程（已提交的请求会先处理完）"""
+        self._text_pool.shutdown(wait=True)
+        self._queue.put(None)
+        self._worker.join()
+    
+    def _generate_speech(self, param: IndexTTSParam) -> np.ndarray:
+        """在推理线程中执行一次 IndexTTS2 推理"""
         try:
-            # IndexTTS infer 方法需要 output_path，如果没有提供则创建临时文件
-            if param.output_path:
-                output_path = param.output_path
-            else:
-                # 创建临时文件
-                temp_output_path = tempfile.NamedTemporaryFile(
-                    suffix='.wav', 
-                    delete=False,
-                    dir=os.path.dirname(os.path.abspath(__file__))
-                )
-                output_path = temp_output_path.name
-                temp_output_path.close()
-                logger.debug(f"Created temporary output path: {output_path}")
-            
-            # 构建 infer 参数，output_path 是必需的
+            # 未指定 output_path 时直接在内存中取回音频，不经过临时 WAV 文件
+            output_path = param.output_path or None
             infer_params = {
                 'text': param.text,
                 'spk_audio_prompt': param.spk_audio_prompt,
@@ -146,35 +277,69 @@ class IndexTTS:
             if param.emo_audio_prompt is not None:
                 infer_params['emo_audio_prompt'] = param.emo_audio_prompt
             
-            # 调用 infer 方法（它会将音频保存到 output_path）
-            logger.info(f"Calling IndexTTS infer with output_path: {output_path}")
-            result = self.model.infer(**infer_params)
+            logger.info("Calling IndexTTS infer with output_path: %s", output_path)
+            with torch.inference_mode(), self._autocast():
+                result = self.model.infer(**infer_params)
+            
+            if output_path is None:
+                # infer 返回 (sampling_rate, int16 数组[samples, channels])
+                if result is None:
+                    raise RuntimeError("IndexTTS infer returned no audio")
+                sampling_rate, wav_data = result
+                del result
+                audio = _pcm16_to_float(wav_data)
+                logger.info("Generated audio in memory, shape: %s, sampling_rate: %s", audio.shape, sampling_rate)
+                return audio
             
-            # infer 方法可能返回文件路径或 None，我们需要从文件读取音频
+            # 调用方显式要求保存文件时，infer 已将音频写入 output_path
             if not os.path.exists(output_path):
                 raise FileNotFoundError(f"Audio file was not generated at expected path: {output_path}")
             
-            # 从文件读取音频数据
-            audio, sampling_rate = sf.read(output_path)
-            logger.info(f"Loaded audio from {output_path}, shape: {audio.shape}, sampling_rate: {sampling_rate}")
-            
-            # 确保返回的是 numpy 数组
-            if isinstance(audio, np.ndarray):
-                return audio
-            else:
-                return np.array(audio)
+            # 从文件读取音频数据，直接解码为 float32，与内存路径的返回类型一致
+            audio, sampling_rate = sf.read(output_path, dtype='float32', always_2d=False)
+            logger.info("Loaded audio from %s, shape: %s, sampling_rate: %s", output_path, audio.shape, sampling_rate)
+            return audio
                 
         except Exception as e:
             logger.error(f"Failed to generate speech: {str(e)}")
             raise
         finally:
-            # 清理临时文件
-            if temp_output_path and os.path.exists(temp_output_path.name):
-                try:
-                    os.unlink(temp_output_path.name)
-                    logger.debug(f"Cleaned up temporary file: {temp_output_path.name}")
-                except Exception as e:
-                    logger.warning(f"Failed to clean up temporary file {temp_output_path.name}: {e}")
+            self._release_cache()
+    
+    def _release_cache(self):
+        """在 CUDA 上把本次推理的中间显存交还给驱动，避免长期运行时显存持续增长"""
+        if self.config.release_cache_between_calls and self.device.startswith("cuda"):
+            torch.cuda.empty_cache()
+
+    def generate_speech_batch(self, params: List[IndexTTSParam]) -> List[np.ndarray]:
+        """
+        批量生成语音
+        
+        IndexTTS2 只缓存最近一次的说话人/情感参考音频特征，参考音频一变就要重新提取。
+        这里按 (spk_audio_prompt, emo_audio_prompt) 分组连续推理，同组请求共享一次特征提取，
+        结果按输入顺序返回。
+        :param params: IndexTTSParam 参数列表
+        :return: 与 params 一一对应的语音 numpy 数组列表
+        """
+        groups: Dict[Tuple[str, Optional[str]], List[int]] = {}
+        for i, param in enumerate(params):
+            groups.setdefault((param.spk_audio_prompt, param.emo_audio_prompt), []).append(i)
+        
+        # 按分组顺序一次性提交，推理线程连续处理同组请求
+        futures: List[Optional[Future]] = [None] * len(params)
+        for indices in groups.values():
+            for i in indices:
+                futures[i] = self.generate_speech_async(params[i])
+        return [future.result() for future in futures]
+
+
+def _pcm16_to_float(wav_data: np.ndarray) -> np.ndarray:
+    """将 int16 PCM 数组转换为与 sf.read 一致的 [-1, 1) 浮点数组（单声道返回一维）"""
+    audio = wav_data.astype(np.float32)
+    audio *= 1.0 / 32768.0
+    if audio.ndim == 2 and audio.shape[1] == 1:
+        audio = audio[:, 0]
+    return audio
 
 
 if __name__ == "__main__":
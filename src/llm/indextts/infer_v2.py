@@ -1,4 +1,6 @@
 import os
+import hashlib
+from collections import OrderedDict
 from subprocess import CalledProcessError
 
 # Only set HF_HUB_CACHE if not already set (allows override from parent module)
@@ -28,10 +30,10 @@ from indextts.s2mel.modules.commons import load_checkpoint2, MyModel
 from indextts.s2mel.modules.bigvgan import bigvgan
 from indextts.s2mel.modules.campplus.DTDNN import CAMPPlus
 from indextts.s2mel.modules.audio import mel_spectrogram
+from indextts.s2mel.hf_utils import cached_hf_hub_download
 
 from transformers import AutoTokenizer
 from modelscope import AutoModelForCausalLM
-from huggingface_hub import hf_hub_download
 import safetensors
 from transformers import SeamlessM4TFeatureExtractor
 import random
@@ -131,9 +133,9 @@ class IndexTTS2:
         self.semantic_std = self.semantic_std.to(self.device)
 
         semantic_codec = build_semantic_codec(self.cfg.semantic_codec)
-        semantic_code_ckpt = hf_hub_download(
+        semantic_code_ckpt = cached_hf_hub_download(
             "amphion/MaskGCT", 
-            filename="semantic_codec/model.safetensors",
+            "semantic_codec/model.safetensors",
             cache_dir=hf_cache_dir
         )
         safetensors.torch.load_model(semantic_codec, semantic_code_ckpt)
@@ -164,9 +166,9 @@ class IndexTTS2:
         print(">> s2mel weights restored from:", s2mel_path)
 
         # load campplus_model
-        campplus_ckpt_path = hf_hub_download(
+        campplus_ckpt_path = cached_hf_hub_download(
             "funasr/campplus", 
-            filename="campplus_cn_common.bin",
+            "campplus_cn_common.bin",
             cache_dir=hf_cache_dir
         )
         campplus_model = CAMPPlus(feat_dim=80, embedding_size=192)
@@ -217,14 +219,12 @@ class IndexTTS2:
         }
         self.mel_fn = lambda x: mel_spectrogram(x, **mel_fn_args)
 
-        # 缓存参考音频：
-        self.cache_spk_cond = None
-        self.cache_s2mel_style = None
-        self.cache_s2mel_prompt = None
-        self.cache_spk_audio_prompt = None
-        self.cache_emo_cond = None
-        self.cache_emo_audio_prompt = None
-        self.cache_mel = None
+        # 缓存参考音频条件（按音频内容摘要索引，LRU），多个音色交替使用时也无需重新计算：
+        self.cond_cache_size = 32
+        self.spk_cond_cache = OrderedDict()
+        self.emo_cond_cache = OrderedDict()
+        # (路径, 修改时间, 大小) -> 内容摘要；文件未变化时不再读取整个文件计算摘要
+        self.audio_digest_cache = OrderedDict()
 
         # 进度引用显示（可选）
         self.gr_progress = None
@@ -353,6 +353,80 @@ class IndexTTS2:
             audio = audio[:, :max_audio_samples]
         return audio, sr
     
+    def _audio_digest(self, audio_path):
+        stat = os.stat(audio_path)
+        file_key = (os.path.abspath(audio_path), stat.st_mtime_ns, stat.st_size)
+        digest = self.audio_digest_cache.get(file_key)
+        if digest is None:
+            with open(audio_path, "rb") as f:
+                digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+            self.audio_digest_cache[file_key] = digest
+            while len(self.audio_digest_cache) > self.cond_cache_size * 4:
+                self.audio_digest_cache.popitem(last=False)
+        return digest
+
+    def _cache_put(self, cache, key, value):
+        cache[key] = value
+        while len(cache) > self.cond_cache_size:
+            cache.popitem(last=False)
+
+    def get_spk_conditioning(self, spk_audio_prompt, verbose=False):
+        """返回参考音频的 (spk_cond_emb, style, prompt_condition, ref_mel)，按音频内容缓存"""
+        key = self._audio_digest(spk_audio_prompt)
+        cached = self.spk_cond_cache.get(key)
+        if cached is not None:
+            self.spk_cond_cache.move_to_end(key)
+            return cached
+
+        audio,sr = self._load_and_cut_audio(spk_audio_prompt,15,verbose)
+        audio_22k = torchaudio.transforms.Resample(sr, 22050)(audio)
+        audio_16k = torchaudio.transforms.Resample(sr, 16000)(audio)
+
+        inputs = self.extract_features(audio_16k, sampling_rate=16000, return_tensors="pt")
+        input_features = inputs["input_features"]
+        attention_mask = inputs["attention_mask"]
+        input_features = input_features.to(self.device)
+        attention_mask = attention_mask.to(self.device)
+        spk_cond_emb = self.get_emb(input_features, attention_mask)
+
+        _, S_ref = self.semantic_codec.quantize(spk_cond_emb)
+        ref_mel = self.mel_fn(audio_22k.to(spk_cond_emb.device).float())
+        ref_target_lengths = torch.LongTensor([ref_mel.size(2)]).to(ref_mel.device)
+        feat = torchaudio.compliance.kaldi.fbank(audio_16k.to(ref_mel.device),
+                                                 num_mel_bins=80,
+                                                 dither=0,
+                                                 sample_frequency=16000)
+        feat = feat - feat.mean(dim=0, keepdim=True)  # feat2另外一个滤波器能量组特征[922, 80]
+        style = self.campplus_model(feat.unsqueeze(0))  # 参考音频的全局style2[1,192]
+
+        prompt_condition = self.s2mel.models['length_regulator'](S_ref,
+                                                                 ylens=ref_target_lengths,
+                                                                 n_quantizers=3,
+                                                                 f0=None)[0]
+
+        cached = (spk_cond_emb, style, prompt_condition, ref_mel)
+        self._cache_put(self.spk_cond_cache, key, cached)
+        return cached
+
+    def get_emo_conditioning(self, emo_audio_prompt, verbose=False):
+        """返回情感参考音频的 emo_cond_emb，按音频内容缓存"""
+        key = self._audio_digest(emo_audio_prompt)
+        emo_cond_emb = self.emo_cond_cache.get(key)
+        if emo_cond_emb is not None:
+            self.emo_cond_cache.move_to_end(key)
+            return emo_cond_emb
+
+        emo_audio, _ = self._load_and_cut_audio(emo_audio_prompt,15,verbose,sr=16000)
+        emo_inputs = self.extract_features(emo_audio, sampling_rate=16000, return_tensors="pt")
+        emo_input_features = emo_inputs["input_features"]
+        emo_attention_mask = emo_inputs["attention_mask"]
+        emo_input_features = emo_input_features.to(self.device)
+        emo_attention_mask = emo_attention_mask.to(self.device)
+        emo_cond_emb = self.get_emb(emo_input_features, emo_attention_mask)
+
+        self._cache_put(self.emo_cond_cache, key, emo_cond_emb)
+        return emo_cond_emb
+
     def normalize_emo_vec(self, emo_vector, apply_bias=True):
         # apply biased emotion factors for better user experience,
         # by de-emphasizing emotions that can cause strange results
@@ -442,50 +516,8 @@ class IndexTTS2:
             # must always use alpha=1.0 when we don't have an external reference voice
             emo_alpha = 1.0
 
-        # 如果参考音频改变了，才需要重新生成, 提升速度
-        if self.cache_spk_cond is None or self.cache_spk_audio_prompt != spk_audio_prompt:
-            if self.cache_spk_cond is not None:
-                self.cache_spk_cond = None
-                self.cache_s2mel_style = None
-                self.cache_s2mel_prompt = None
-                self.cache_mel = None
-                torch.cuda.empty_cache()
-            audio,sr = self._load_and_cut_audio(spk_audio_prompt,15,verbose)
-            audio_22k = torchaudio.transforms.Resample(sr, 22050)(audio)
-            audio_16k = torchaudio.transforms.Resample(sr, 16000)(audio)
-
-            inputs = self.extract_features(audio_16k, sampling_rate=16000, return_tensors="pt")
-            input_features = inputs["input_features"]
-            attention_mask = inputs["attention_mask"]
-            input_features = input_features.to(self.device)
-            attention_mask = attention_mask.to(self.device)
-            spk_cond_emb = self.get_emb(input_features, attention_mask)
-
-            _, S_ref = self.semantic_codec.quantize(spk_cond_emb)
-            ref_mel = self.mel_fn(audio_22k.to(spk_cond_emb.device).float())
-            ref_target_lengths = torch.LongTensor([ref_mel.size(2)]).to(ref_mel.device)
-            feat = torchaudio.compliance.kaldi.fbank(audio_16k.to(ref_mel.device),
-                                                     num_mel_bins=80,
-                                                     dither=0,
-                                                     sample_frequency=16000)
-            feat = feat - feat.mean(dim=0, keepdim=True)  # feat2另外一个滤波器能量组特征[922, 80]
-            style = self.campplus_model(feat.unsqueeze(0))  # 参考音频的全局style2[1,192]
-
-            prompt_condition = self.s2mel.models['length_regulator'](S_ref,
-                                                                     ylens=ref_target_lengths,
-                                                                     n_quantizers=3,
-                                                                     f0=None)[0]
-
-            self.cache_spk_cond = spk_cond_emb
-            self.cache_s2mel_style = style
-            self.cache_s2mel_prompt = prompt_condition
-            self.cache_spk_audio_prompt = spk_audio_prompt
-            self.cache_mel = ref_mel
-        else:
-            style = self.cache_s2mel_style
-            prompt_condition = self.cache_s2mel_prompt
-            spk_cond_emb = self.cache_spk_cond
-            ref_mel = self.cache_mel
+        # 参考音频未缓存时才需要重新生成, 提升速度
+        spk_cond_emb, style, prompt_condition, ref_mel = self.get_spk_conditioning(spk_audio_prompt, verbose)
 
         if emo_vector is not None:
             weight_vector = torch.tensor(emo_vector, device=self.device)
@@ -500,22 +532,7 @@ class IndexTTS2:
             emovec_mat = torch.sum(emovec_mat, 0)
             emovec_mat = emovec_mat.unsqueeze(0)
 
-        if self.cache_emo_cond is None or self.cache_emo_audio_prompt != emo_audio_prompt:
-            if self.cache_emo_cond is not None:
-                self.cache_emo_cond = None
-                torch.cuda.empty_cache()
-            emo_audio, _ = self._load_and_cut_audio(emo_audio_prompt,15,verbose,sr=16000)
-            emo_inputs = self.extract_features(emo_audio, sampling_rate=16000, return_tensors="pt")
-            emo_input_features = emo_inputs["input_features"]
-            emo_attention_mask = emo_inputs["attention_mask"]
-            emo_input_features = emo_input_features.to(self.device)
-            emo_attention_mask = emo_attention_mask.to(self.device)
-            emo_cond_emb = self.get_emb(emo_input_features, emo_attention_mask)
-
-            self.cache_emo_cond = emo_cond_emb
-            self.cache_emo_audio_prompt = emo_audio_prompt
-        else:
-            emo_cond_emb = self.cache_emo_cond
+        emo_cond_emb = self.get_emo_conditioning(emo_audio_prompt, verbose)
 
         self._set_gr_progress(0.1, "text processing...")
         text_tokens_list = self.tokenizer.tokenize(text)
@@ -1,14 +1,26 @@
 import os
+from functools import lru_cache
 from huggingface_hub import hf_hub_download
+from huggingface_hub.utils import LocalEntryNotFoundError
+
+
+@lru_cache(maxsize=None)
+def cached_hf_hub_download(repo_id, filename, cache_dir=None):
+    # Resolve from the local cache first so a warm cache never needs a Hub round-trip;
+    # only fall back to the network when the file has not been downloaded yet.
+    try:
+        return hf_hub_download(repo_id=repo_id, filename=filename, cache_dir=cache_dir, local_files_only=True)
+    except (LocalEntryNotFoundError, ValueError):
+        return hf_hub_download(repo_id=repo_id, filename=filename, cache_dir=cache_dir)
 
 
 def load_custom_model_from_hf(repo_id, model_filename="pytorch_model.bin", config_filename="config.yml"):
     # Use HF_HUB_CACHE from environment if set, otherwise use default
     cache_dir = os.environ.get('HF_HUB_CACHE', './checkpoints')
     os.makedirs(cache_dir, exist_ok=True)
-    model_path = hf_hub_download(repo_id=repo_id, filename=model_filename, cache_dir=cache_dir)
+    model_path = cached_hf_hub_download(repo_id, model_filename, cache_dir)
     if config_filename is None:
         return model_path
-    config_path = hf_hub_download(repo_id=repo_id, filename=config_filename, cache_dir=cache_dir)
+    config_path = cached_hf_hub_download(repo_id, config_filename, cache_dir)
 
-    return model_path, config_path
\ No newline at end of file
+    return model_path, config_path
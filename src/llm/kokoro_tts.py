@@ -1,14 +1,23 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 import re
 import numpy as np
 import torch
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, Iterator, Literal, Optional
 from kokoro import KModel, KPipeline
 from config import config
 import soundfile as sf
 
+# 启用 cuDNN 算法自动调优和 TF32 矩阵乘
+if torch.cuda.is_available():
+    torch.backends.cudnn.benchmark = True
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
+torch.set_float32_matmul_precision('high')
+
 # Import logger (already configured)
 try:
     from logger import logger
@@ -25,11 +34,19 @@ class TTSConfig:
     device: 计算设备 ("cpu" 或 "cuda")
     sampling_rate: 输出音频采样率
     language: 语言参数，默认 "auto"
+    release_cache_between_calls: CUDA 上每次推理后释放 PyTorch 缓存的显存
+    preload_voices: 启动时加载全部音色；默认在首次使用时按需加载
+    compile: 使用 torch.compile 编译声码器（decoder）模块
+    precision: 推理精度；fp16 仅在 CUDA 上生效，bf16 在 CUDA 和支持 AVX512-BF16/AMX 的 CPU 上通过 autocast 启用
     """
     model_path: str
     device: str = "cpu"
     sampling_rate: int = 24000
     language: str = "auto"
+    release_cache_between_calls: bool = True
+    preload_voices: bool = False
+    compile: bool = False
+    precision: Literal["fp32", "fp16", "bf16"] = "fp32"
 
 class KokoroTTS:
     """
@@ -42,7 +59,11 @@ class KokoroTTS:
         self.model = None
         self.pipeline = None
         self.pipeline_zh = None
+        self._voice_paths: Dict[str, str] = {}
+        # 独立的拷贝流，让音色张量的 H2D 传输与主计算流重叠
+        self._copy_stream = torch.cuda.Stream(device=self.device) if self.device.startswith("cuda") else None
         self.repo_id = "hexgrad/Kokoro-82M-v1.1-zh"
+        self._autocast_dtype = self._resolve_autocast_dtype()
         self._load_model()
         
     def _load_model(self):
@@ -53,51 +74,124 @@ class KokoroTTS:
             logger.info(f"Loading Kokoro TTS model from {model_file} config from {config_file}")
             self.model = KModel(self.repo_id,config_file, model_file)
             self.model.to(self.device)
+            self.model.eval()
+            if self.config.compile:
+                self._compile_model()
             logger.info("Kokoro TTS model loaded successfully")
             self.pipeline = KPipeline(lang_code='a', repo_id=self.repo_id, device=self.device, model=self.model)
             self.pipeline_zh = KPipeline(lang_code='z',repo_id=self.repo_id, device=self.device, model=self.model)
             logger.info("Kokoro TTS pipeline loaded successfully")
             # start to load pipeline vo
-            voices = config.VOICE_MAPPINGS["kokoro"]
-            for voice_id, voice in voices.items():
-                voice_path = os.path.join(self.config.model_path, "voices" , voice + ".pt")
-                logger.info(f"Loading voice {voice_id} from {voice_path}")
-                self.pipeline.voices[voice] = torch.load(voice_path, weights_only=True)
+            voices_dir = os.path.join(self.config.model_path, "voices")
+            jobs = [
+                (voice, target)
+                for voices, target in (
+                    (config.VOICE_MAPPINGS["kokoro"], self.pipeline.voices),
+                    (config.VOICE_MAPPINGS["kokoro_zh"], self.pipeline_zh.voices),
+                )
+                for voice in voices.values()
+            ]
+            self._voice_paths = {voice: os.path.join(voices_dir, f"{voice}.pt") for voice, _ in jobs}
+            logger.debug("Registered %d voices from %s", len(self._voice_paths), voices_dir)
             
-            voices = config.VOICE_MAPPINGS["kokoro_zh"]
-            for voice_id, voice in voices.items():
-                voice_path = os.path.join(self.config.model_path, "voices" , voice + ".pt")
-                logger.info(f"Loading voice {voice_id} from {voice_path}")
-                self.pipeline_zh.voices[voice] = torch.load(voice_path, weights_only=True)
-
-            logger.info("Kokoro TTS pipeline voices loaded successfully")
+            if self.config.preload_voices:
+                # 音色文件读取以 I/O 为主，并行加载
+                with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                    tensors = executor.map(lambda job: self._load_voice(job[0]), jobs)
+                    for (voice, target), tensor in zip(jobs, tensors):
+                        target[voice] = tensor
+                logger.info("Kokoro TTS pipeline voices loaded successfully")
 
 
         except Exception as e:
             logger.error(f"Failed to load Kokoro TTS model: {str(e)}")
             raise
         
-    def generate_speech(self, text: str, speaker: str, language: str = "auto", speed: float = 1.0) -> np.ndarray:
+    def _compile_model(self):
+        """编译计算量最大的 decoder；输入长度随文本变化，使用 dynamic 形状避免反复重新编译"""
+        try:
+            self.model.decoder = torch.compile(self.model.decoder, dynamic=True)
+            logger.info("Kokoro TTS decoder compiled with torch.compile")
+        except RuntimeError as e:
+            logger.warning(f"torch.compile unavailable for Kokoro TTS, running eagerly: {e}")
+    
+    def _resolve_autocast_dtype(self) -> Optional[torch.dtype]:
+        """确定 autocast 精度；fp32 或设备不支持时返回 None"""
+        precision = self.config.precision
+        if precision == "fp16" and not self.device.startswith("cuda"):
+            logger.warning("Kokoro fp16 precision is only supported on CUDA, using fp32 on %s", self.device)
+            return None
+        return {"fp16": torch.float16, "bf16": torch.bfloat16}.get(precision)
+    
+    def _autocast(self):
+        """在声码器等模块上使用半精度计算，权重保持 fp32"""
+        if self._autocast_dtype is None:
+            return nullcontext()
+        device_type = "cuda" if self.device.startswith("cuda") else "cpu"
+        return torch.autocast(device_type=device_type, dtype=self._autocast_dtype)
+    
+    def _load_voice(self, voice: str) -> torch.Tensor:
+        """读取本地音色张量：内存映射文件，CUDA 上经锁页内存异步拷贝到显存"""
+        voice_path = self._voice_paths[voice]
+        logger.debug("Loading voice %s from %s", voice, voice_path)
+        tensor = torch.load(voice_path, weights_only=True, mmap=True, map_location="cpu")
+        if self._copy_stream is not None:
+            tensor = tensor.pin_memory()
+            with torch.cuda.stream(self._copy_stream):
+                tensor = tensor.to(self.device, non_blocking=True)
+        elif self.device != "cpu":
+            tensor = tensor.to(self.device)
+        return tensor
+    
+    def _ensure_voice(self, pipeline: KPipeline, voice: str):
+        """首次使用某个本地音色时才加载；未登记的音色交给 KPipeline 自行处理"""
+        if voice not in pipeline.voices and voice in self._voice_paths:
+            pipeline.voices[voice] = self._load_voice(voice)
+        if self._copy_stream is not None:
+            # 计算流在 GPU 端等待拷贝完成，主机端不阻塞（文本前端处理可继续进行）
+            torch.cuda.current_stream(self.device).wait_stream(self._copy_stream)
+    
+    def generate_speech_stream(self, text: str, speaker: str, language: str = "auto", speed: float = 1.0) -> Iterator[np.ndarray]:
+        """按 KPipeline 切分的段落逐段产出音频（float32 一维数组）"""
         generator = self.pipeline
         if language == "zh":
             generator = self.pipeline_zh
+        self._ensure_voice(generator, speaker)
         
-        all_audio = []
-        for gs, ps, audio in generator(text, voice=speaker, speed=speed, split_pattern=r'\n+'):
-            if audio is not None:
-                if isinstance(audio, np.ndarray):
-                    audio = torch.from_numpy(audio).float()
-                all_audio.append(audio)
-                print(f"\nGenerated segment: {gs}")
-                print(f"Phonemes: {ps}")
+        try:
+            with torch.inference_mode(), self._autocast():
+                for gs, ps, audio in generator(text, voice=speaker, speed=speed, split_pattern=r'\n+'):
+                    if audio is not None:
+                        # 保持 numpy 视图，避免逐段转换为 torch 张量再拼接
+                        if isinstance(audio, torch.Tensor):
+                            audio = audio.detach().float().cpu().numpy()
+                        logger.debug("Generated segment: %s, phonemes: %s", gs, ps)
+                        yield audio.reshape(-1)
+        finally:
+            self._release_cache()
+    
+    def generate_speech(self, text: str, speaker: str, language: str = "auto", speed: float = 1.0) -> np.ndarray:
+        all_audio = list(self.generate_speech_stream(text, speaker, language, speed))
         
         # Save audio
         if all_audio:
-            final_audio = torch.cat(all_audio, dim=0)
-            return final_audio.numpy()
+            # 预先分配结果缓冲区，每段只拷贝一次
+            final_audio = np.empty(sum(chunk.shape[0] for chunk in all_audio), dtype=np.float32)
+            offset = 0
+            for chunk in all_audio:
+                n = chunk.shape[0]
+                np.copyto(final_audio[offset:offset + n], chunk, casting='same_kind')
+                offset += n
+            del all_audio
+            return final_audio
         else:
-            print("Error: Failed to generate audio")
+            logger.error("Failed to generate audio for speaker %s", speaker)
             return np.array([])
+    
+    def _release_cache(self):
+        """在 CUDA 上把本次推理的中间显存交还给驱动，避免长期运行时显存持续增长"""
+        if self.config.release_cache_between_calls and self.device.startswith("cuda"):
+            torch.cuda.empty_cache()
 
 
 if __name__ == "__main__":
@@ -5,12 +5,26 @@ Supports logging to both console and log files in logs/ directory.
 
 import os
 import sys
+import atexit
+import queue
 import logging
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
+# The service never logs thread/process names; skip collecting them per record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+# Compact format for normal operation; source location only when debugging
+DEFAULT_LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+DEBUG_LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+
+# Background listeners that own the console/file handlers, keyed by logger name
+_listeners: Dict[str, QueueListener] = {}
+
 
 def setup_logger(
     name: str = "llm-service",
@@ -29,13 +43,18 @@ def setup_logger(
     """
     Setup logger with console and file handlers.
     
+    The logger itself only gets a QueueHandler; the console and file handlers
+    are driven by a background QueueListener so that logging calls never block
+    the caller on stream writes or file rotation.
+    
     Args:
         name: Logger name (default: "llm-service")
         log_dir: Directory for log files (default: "logs" in current directory)
         level: Default logging level (default: logging.INFO)
         console_level: Console logging level (default: same as level)
         file_level: File logging level (default: same as level)
-        log_format: Custom log format string
+        log_format: Custom log format string (default: DEBUG_LOG_FORMAT when level
+            is DEBUG or lower, otherwise DEFAULT_LOG_FORMAT)
         max_bytes: Maximum size of log file before rotation (for RotatingFileHandler)
         backup_count: Number of backup files to keep
         when: When to rotate (for TimedRotatingFileHandler): 'S', 'M', 'H', 'D', 'W0'-'W6', 'midnight'
@@ -58,7 +77,7 @@ def setup_logger(
     
     # Default log format
     if log_format is None:
-        log_format = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+        log_format = DEBUG_LOG_FORMAT if level <= logging.DEBUG else DEFAULT_LOG_FORMAT
     
     formatter = logging.Formatter(log_format, datefmt='%Y-%m-%d %H:%M:%S')
     
@@ -67,7 +86,6 @@ def setup_logger(
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(console_level)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
     
     # File handler
     file_level = file_level or level
@@ -107,7 +125,13 @@ def setup_logger(
     
     file_handler.setLevel(file_level)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    
+    # Hand records to a background thread that performs the actual I/O
+    log_queue = queue.Queue(-1)
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    _listeners[name] = listener
     
     # Log initialization message
     logger.info(f"Logger '{name}' initialized")
@@ -151,6 +175,16 @@ def get_logger(
     return setup_logger(name=name, log_dir=log_dir, level=level, **kwargs)
 
 
+def shutdown_loggers() -> None:
+    """Flush queued records and stop all background log listeners."""
+    while _listeners:
+        _, listener = _listeners.popitem()
+        listener.stop()
+
+
+atexit.register(shutdown_loggers)
+
+
 # Default logger instance - automatically initialized on import
 _default_logger = None
 
@@ -167,7 +201,7 @@ def get_default_logger() -> logging.Logger:
 _default_logger = setup_logger()
 
 # Export commonly used functions and default logger
-__all__ = ['setup_logger', 'get_logger', 'get_default_logger', 'logger']
+__all__ = ['setup_logger', 'get_logger', 'get_default_logger', 'shutdown_loggers', 'logger']
 
 # Export default logger instance for convenience
 logger = _default_logger
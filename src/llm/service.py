@@ -3,7 +3,7 @@ from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
 import json
 from pydantic import BaseModel
-from typing import List, Optional, Union, Dict, Literal
+from typing import List, Optional, Union, Dict, Literal, Tuple
 from transformers import AutoModelForCausalLM, AutoTokenizer, AutoModel
 import os
 import re
@@ -14,17 +14,51 @@ import io
 import logging
 import sys
 import asyncio
+import concurrent.futures
+import copy
+import functools
+import importlib.util
+import queue
+import threading
+import uuid
 import base64
 import tempfile
+from collections import OrderedDict
 from pathlib import Path
 from config import config
-from transformers import TextStreamer
-
-from tts import TTSFactory
+from transformers import TextIteratorStreamer, DynamicCache
+
+try:
+    from vllm import SamplingParams
+    from vllm.engine.arg_utils import AsyncEngineArgs
+    from vllm.engine.async_llm_engine import AsyncLLMEngine
+    SUPPORT_VLLM = True
+except ImportError:
+    SUPPORT_VLLM = False
+
+try:
+    from torchao.quantization import quantize_, int8_weight_only
+    SUPPORT_TORCHAO = True
+except ImportError:
+    SUPPORT_TORCHAO = False
+
+try:
+    import orjson  # noqa: F401  ORJSONResponse 依赖 orjson
+    from fastapi.responses import ORJSONResponse
+    SUPPORT_ORJSON = True
+except ImportError:
+    SUPPORT_ORJSON = False
+
+from tts import TTSFactory, AudioConverter, FFMPEG_PATH
+from starlette.background import BackgroundTask
 from logger import logger  # 默认已配置好的 logger
 
 app = FastAPI()
 
+# 阻塞的 GPU 推理放到独立线程执行，事件循环可继续接收请求；单卡上推理本身串行，各用一个线程
+TTS_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+MODEL_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+
 # logger 已经在 logger.py 模块导入时自动配置
 # 默认输出到控制台和 logs/llm-service.log
 
@@ -108,9 +142,17 @@ class TTSRequest(BaseModel):
     dialect: Optional[str] = None  # Chinese dialect (e.g., "mandarin", "cantonese", "sichuanese", "henanese")
     dialect_prompt: Optional[str] = None  # Dialect prompt text for TTS model
 
+class TTSBatchRequest(BaseModel):
+    model: str = "tts-1"
+    items: List[TTSRequest]  # 每条与 /v1/audio/speech 的请求体相同（不支持 pcm16）
+
 # 全局变量存储模型和tokenizer
 model = None
 tokenizer = None
+# 投机解码的草稿模型（hf 引擎，可选）
+draft_model = None
+# CHAT_LLM_ENGINE=vllm 时使用的异步推理引擎（替代 model）
+chat_engine = None
 
 # 添加嵌入模型的全局变量
 embedding_model = None
@@ -122,44 +164,159 @@ tts = None
 def load_tts():
     global tts
     if tts is None:
-        tts  = TTSFactory.get_tts(config.TTS_PROVIDER)
-        tts.load_model()
+        TTSFactory.preload([config.TTS_PROVIDER])
+        tts = TTSFactory.get_tts(config.TTS_PROVIDER)
 
 def load_model(model_path: str):
-    global model, tokenizer
+    global model, tokenizer, chat_engine, draft_model
     logger.info(f"Loading chat model from {model_path}")
     if tokenizer is None:
         tokenizer = AutoTokenizer.from_pretrained(
             model_path,
-            trust_remote_code=True
+            trust_remote_code=True,
+            use_fast=True
         )
+        if not tokenizer.is_fast:
+            logger.warning("No fast tokenizer available for %s, falling back to the slow Python tokenizer", model_path)
         logger.info("Chat tokenizer loaded successfully")
 
+    if config.CHAT_LLM_ENGINE == "vllm":
+        if chat_engine is None:
+            if not SUPPORT_VLLM:
+                raise ImportError("CHAT_LLM_ENGINE=vllm requires the vllm package")
+            speculative_config = None
+            if config.CHAT_DRAFT_MODEL_PATH:
+                speculative_config = {
+                    "model": config.CHAT_DRAFT_MODEL_PATH,
+                    "num_speculative_tokens": config.CHAT_NUM_SPECULATIVE_TOKENS,
+                }
+            chat_engine = AsyncLLMEngine.from_engine_args(AsyncEngineArgs(
+                model=model_path,
+                trust_remote_code=True,
+                dtype="float16",
+                enable_prefix_caching=config.CHAT_PREFIX_CACHING,
+                speculative_config=speculative_config
+            ))
+            logger.info("Chat vLLM engine loaded successfully")
+        return
+
     if model is None:
         model = AutoModelForCausalLM.from_pretrained(
             model_path,
             trust_remote_code=True,
+            torch_dtype=torch.float16 if config.DEVICE.startswith("cuda") else "auto",
         )
         model.to(config.DEVICE)
+        if config.CHAT_QUANTIZATION == "int8":
+            quantize_chat_model_int8()
         logger.info("Chat model loaded successfully")
 
+    if config.CHAT_DRAFT_MODEL_PATH and draft_model is None:
+        # 草稿模型一次提出多个 token，主模型一次前向完成校验
+        draft_model = AutoModelForCausalLM.from_pretrained(
+            config.CHAT_DRAFT_MODEL_PATH,
+            trust_remote_code=True,
+            torch_dtype=model.dtype,
+        )
+        draft_model.to(model.device).eval()
+        draft_model.generation_config.num_assistant_tokens = config.CHAT_NUM_SPECULATIVE_TOKENS
+        logger.info("Chat draft model loaded from %s", config.CHAT_DRAFT_MODEL_PATH)
+
+def quantize_chat_model_int8():
+    """INT8 weight-only quantization of the chat model's linear layers (torchao)"""
+    if not SUPPORT_TORCHAO:
+        raise ImportError("CHAT_QUANTIZATION=int8 requires the torchao package")
+    # torch < 2.5 的 Inductor 会生成 int8->fp16 反量化 + matmul 两个内核，反而更慢
+    if tuple(int(v) for v in torch.__version__.split(".")[:2]) < (2, 5):
+        logger.warning("torch>=2.5 is recommended for fused INT8 kernels, got %s", torch.__version__)
+    quantize_(model, int8_weight_only())
+    # 编译后 Inductor 将反量化与 matmul 融合为单个内核
+    model.forward = torch.compile(model.forward, mode="max-autotune", fullgraph=False)
+    logger.info("Chat model quantized to int8 weight-only and compiled")
+
+# 系统提示前缀的 KV 缓存（hf 引擎），键为前缀 token ids，按 LRU 淘汰
+prefix_kv_cache: "OrderedDict[Tuple[int, ...], DynamicCache]" = OrderedDict()
+prefix_kv_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1024)
+def apply_chat_template_cached(messages_key: Tuple[Tuple[str, str], ...], tokenize: bool):
+    """apply_chat_template keyed by ((role, content), ...); repeated conversations skip templating and BPE"""
+    messages = [{"role": role, "content": content} for role, content in messages_key]
+    if tokenize:
+        return tokenizer.apply_chat_template(messages, tokenize=True, add_generation_prompt=True, return_tensors="pt",
+                                             enable_thinking=False)
+    return tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True, enable_thinking=False)
+
+@functools.lru_cache(maxsize=64)
+def system_prefix_ids(system_prompt: str) -> List[int]:
+    """Token ids of a chat that only contains the given system prompt"""
+    return tokenizer.apply_chat_template([{"role": "system", "content": system_prompt}], tokenize=True,
+                                         add_generation_prompt=False, enable_thinking=False)
+
+def get_prefix_kv_cache(input_ids: torch.Tensor, formatted_messages: List[Dict]) -> Optional[DynamicCache]:
+    """Return a private copy of the KV cache for the leading system prompt, prefilling it on first use"""
+    if not config.CHAT_PREFIX_CACHING or not formatted_messages or formatted_messages[0]["role"] != "system":
+        return None
+    prefix_ids = system_prefix_ids(formatted_messages[0]["content"])
+    # 只有完整提示确实以该前缀开头，且前缀之后还有待预填充的 token 时才能复用
+    prefix_len = len(prefix_ids)
+    if prefix_len >= input_ids.shape[1] or input_ids[0, :prefix_len].tolist() != prefix_ids:
+        return None
+    
+    key = tuple(prefix_ids)
+    with prefix_kv_lock:
+        cache = prefix_kv_cache.get(key)
+        if cache is None:
+            cache = DynamicCache()
+            with torch.no_grad():
+                model(input_ids[:, :prefix_len].to(model.device), past_key_values=cache, use_cache=True)
+            prefix_kv_cache[key] = cache
+            while len(prefix_kv_cache) > config.CHAT_PREFIX_CACHE_SIZE:
+                prefix_kv_cache.popitem(last=False)
+            logger.debug("Cached KV for a %d-token system prompt", prefix_len)
+        else:
+            prefix_kv_cache.move_to_end(key)
+        # generate 会在缓存上原地追加，每个请求使用独立副本
+        return copy.deepcopy(cache)
+
+def generate_chat(input_ids: torch.Tensor, formatted_messages: List[Dict], **gen_kwargs) -> torch.Tensor:
+    """model.generate that starts from the cached system prompt KV and drafts with draft_model when available"""
+    past_key_values = get_prefix_kv_cache(input_ids, formatted_messages)
+    if past_key_values is not None:
+        gen_kwargs["past_key_values"] = past_key_values
+    if draft_model is not None:
+        gen_kwargs["assistant_model"] = draft_model
+    return model.generate(input_ids, **gen_kwargs)
+
 def load_embedding_model(model_path: str = "maidalun1020/bce-embedding-base_v1"):
     """Load the embedding model"""
     global embedding_model, embedding_tokenizer
     logger.info(f"Loading embedding model from {model_path}")
     if embedding_model is None:
+        # GPU 上以半精度加载：编码器前向受显存带宽限制，权重减半直接提速
+        dtype = torch.float32
+        if config.DEVICE.startswith("cuda"):
+            dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
         embedding_model = AutoModel.from_pretrained(
             model_path,
-            trust_remote_code=True
+            trust_remote_code=True,
+            torch_dtype=dtype
         )
-        embedding_model.eval()
-        logger.info("Embedding model loaded successfully")
+        embedding_model.eval().to(config.DEVICE)
+        logger.info(f"Embedding model loaded successfully ({dtype})")
     if embedding_tokenizer is None:
         embedding_tokenizer = AutoTokenizer.from_pretrained(
             model_path,
-            trust_remote_code=True
+            trust_remote_code=True,
+            use_fast=True
         )
         logger.info("Embedding tokenizer loaded successfully")
+    if config.EMBEDDING_COMPILE and not hasattr(embedding_model, "_orig_mod"):
+        embedding_model = torch.compile(embedding_model, mode="reduce-overhead", fullgraph=False)
+        # 预先编译最常见的两种输入形状，避免首个请求承担编译延迟
+        for batch_size, seq_len in ((1, 32), (EMBED_MAX_BATCH, 512)):
+            get_embeddings(["warmup " * seq_len] * batch_size)
+        logger.info("Embedding model compiled with torch.compile")
 
 def format_messages(messages: List[Message]) -> List[Dict]:
     """Format messages into Qwen chat format"""
@@ -172,8 +329,8 @@ def format_messages(messages: List[Message]) -> List[Dict]:
         })
     return formatted_messages
 
-def get_embeddings(texts: Union[str, List[str]]) -> List[List[float]]:
-    """Generate embeddings for input texts"""
+def get_embeddings(texts: Union[str, List[str]]) -> Tuple[np.ndarray, List[int]]:
+    """Generate embeddings for input texts, returning them with each text's token count"""
     if isinstance(texts, str):
         texts = [texts]
     
@@ -185,15 +342,89 @@ def get_embeddings(texts: Union[str, List[str]]) -> List[List[float]]:
         max_length=512,
         return_tensors="pt"
     )
+    # 直接从本次编码的 attention_mask 统计 token 数，无需再次分词
+    token_counts = encoded_inputs["attention_mask"].sum(dim=1).tolist()
+    
+    # CUDA 上经锁页内存异步拷贝输入，拷贝与后续内核在同一流上排队，主机端不等待
+    device = embedding_model.device
+    if device.type == "cuda":
+        encoded_inputs = {k: v.pin_memory().to(device, non_blocking=True) for k, v in encoded_inputs.items()}
+    else:
+        encoded_inputs = encoded_inputs.to(device)
     
     # 生成嵌入
-    with torch.no_grad():
+    with torch.inference_mode():
         # 使用 embedding_model 而不是 model
         outputs = embedding_model(**encoded_inputs, return_dict=True)
-        embeddings = outputs.last_hidden_state[:, 0]  # cls pooler
+        embeddings = outputs.last_hidden_state[:, 0].float()  # cls pooler, fp32 for a safe norm
         embeddings = embeddings / embeddings.norm(dim=1, keepdim=True)  # normalize
         
-    return embeddings.tolist()
+    # 保持 float32 ndarray，避免为每个分量创建 Python float
+    return embeddings.cpu().numpy(), token_counts
+
+# 嵌入请求的动态微批处理：并发请求中的文本合并为一次前向计算
+EMBED_MAX_BATCH = 32
+EMBED_MAX_WAIT = 0.005  # 秒
+embed_queue: Optional[asyncio.Queue] = None
+embed_worker_task: Optional[asyncio.Task] = None
+
+async def embed_worker():
+    """Collect queued texts for up to EMBED_MAX_WAIT and embed them in one batch"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await embed_queue.get()]
+        deadline = loop.time() + EMBED_MAX_WAIT
+        while len(batch) < EMBED_MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(embed_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        try:
+            vectors, token_counts = await loop.run_in_executor(
+                MODEL_EXECUTOR, get_embeddings, [text for text, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        for (_, future), vector, token_count in zip(batch, vectors, token_counts):
+            if not future.done():
+                future.set_result((vector, token_count))
+
+def ensure_embed_worker():
+    """Start the embedding worker, or restart it if it has exited; keeps a strong reference to the task"""
+    global embed_queue, embed_worker_task
+    if embed_queue is None:
+        embed_queue = asyncio.Queue()
+    if embed_worker_task is None or embed_worker_task.done():
+        if embed_worker_task is not None and not embed_worker_task.cancelled() and embed_worker_task.exception():
+            logger.error("Embedding worker exited, restarting: %s", embed_worker_task.exception())
+        embed_worker_task = asyncio.create_task(embed_worker())
+
+async def stop_embed_worker():
+    """Cancel the embedding worker on shutdown"""
+    global embed_worker_task
+    if embed_worker_task is not None and not embed_worker_task.done():
+        embed_worker_task.cancel()
+        await asyncio.gather(embed_worker_task, return_exceptions=True)
+    embed_worker_task = None
+
+async def embed_texts(texts: List[str]) -> Tuple[List[np.ndarray], List[int]]:
+    """Submit texts to the micro-batcher and wait for their embeddings and token counts"""
+    ensure_embed_worker()
+    loop = asyncio.get_running_loop()
+    futures = []
+    for text in texts:
+        future = loop.create_future()
+        embed_queue.put_nowait((text, future))
+        futures.append(future)
+    results = await asyncio.gather(*futures)
+    return [vector for vector, _ in results], [count for _, count in results]
 
 
 @app.on_event("startup")
@@ -208,64 +439,91 @@ async def startup_event():
     logger.info("Starting to load TTS model")
     load_tts()
     logger.info("All models loaded successfully")
+    ensure_embed_worker()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_embed_worker()
+    TTS_EXECUTOR.shutdown(wait=False)
+    MODEL_EXECUTOR.shutdown(wait=False)
+
+# 流式生成结束哨兵
+_STREAM_END = object()
+
+def _chat_chunk(chunk_id: str, model_name: str, delta: Dict, finish_reason: Optional[str] = None) -> str:
+    """Format one chat.completion.chunk SSE event"""
+    chunk = {
+        "id": chunk_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model_name,
+        "choices": [{
+            "delta": delta,
+            "index": 0,
+            "finish_reason": finish_reason
+        }]
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
 
 async def stream_generator(
     input_ids: torch.Tensor,
+    formatted_messages: List[Dict],
     model_name: str,
     max_new_tokens: Optional[int] = None,
     temperature: float = 0.7
 ):
     try:
-        # 使用非流式生成，但逐个token返回
-        outputs = model.generate(
-            input_ids,
-            max_new_tokens=max_new_tokens or 512,
-            temperature=temperature,
-            do_sample=True,
-            return_dict_in_generate=True,
-            output_scores=True
+        # 在模型线程池中生成，TextIteratorStreamer 在每个 token 解码后立即产出文本；
+        # timeout 作为兜底，避免生成线程异常退出时读取端永久阻塞
+        streamer = TextIteratorStreamer(
+            tokenizer, skip_prompt=True, skip_special_tokens=True,
+            timeout=config.CHAT_STREAM_TOKEN_TIMEOUT
         )
+        gen_kwargs = {
+            "input_ids": input_ids,
+            "formatted_messages": formatted_messages,
+            "max_new_tokens": max_new_tokens or 512,
+            "temperature": temperature,
+            "do_sample": True,
+            "streamer": streamer,
+        }
+        started = threading.Event()
         
-        generated_tokens = outputs.sequences[0][len(input_ids[0]):]
+        def run_generation():
+            started.set()
+            try:
+                generate_chat(**gen_kwargs)
+            except BaseException:
+                # 生成失败时结束 streamer，让读取端退出循环，异常由 generation 抛出
+                streamer.end()
+                raise
         
-        # 逐个token输出
-        current_text = ""
-        for token in generated_tokens:
-            # 解码单个token
-            new_text = tokenizer.decode([token], skip_special_tokens=True)
-            if not new_text.strip():
+        loop = asyncio.get_running_loop()
+        # 与非流式请求共用 MODEL_EXECUTOR，同一模型上的 generate 不会并发执行
+        generation = loop.run_in_executor(MODEL_EXECUTOR, run_generation)
+        chunk_id = f"chatcmpl-{int(time.time())}"
+        while True:
+            # streamer 的迭代会阻塞等待下一个 token，放到线程池中避免阻塞事件循环
+            try:
+                new_text = await loop.run_in_executor(None, next, streamer, _STREAM_END)
+            except queue.Empty:
+                if not started.is_set():
+                    # 仍在 MODEL_EXECUTOR 中排队，继续等待
+                    continue
+                raise TimeoutError(
+                    f"No token generated within {config.CHAT_STREAM_TOKEN_TIMEOUT} seconds"
+                )
+            if new_text is _STREAM_END:
+                break
+            if not new_text:
                 continue
-                
-            chunk = {
-                "id": f"chatcmpl-{int(time.time())}",
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": model_name,
-                "choices": [{
-                    "delta": {"content": new_text},
-                    "index": 0,
-                    "finish_reason": None
-                }]
-            }
-            yield f"data: {json.dumps(chunk)}\n\n"
-            current_text += new_text
-            
-            # 添加适当的延迟以模拟流式效果
-            await asyncio.sleep(0.02)
+            yield _chat_chunk(chunk_id, model_name, {"content": new_text})
+        
+        # 生成线程中的异常在这里抛出，转为错误块返回
+        await generation
             
         # 发送结束标记
-        final_chunk = {
-            "id": f"chatcmpl-{int(time.time())}",
-            "object": "chat.completion.chunk",
-            "created": int(time.time()),
-            "model": model_name,
-            "choices": [{
-                "delta": {},
-                "index": 0,
-                "finish_reason": "stop"
-            }]
-        }
-        yield f"data: {json.dumps(final_chunk)}\n\n"
+        yield _chat_chunk(chunk_id, model_name, {}, "stop")
         yield "data: [DONE]\n\n"
                 
     except Exception as e:
@@ -274,6 +532,25 @@ async def stream_generator(
         }
         yield f"data: {json.dumps(error_chunk)}\n\n"
 
+async def engine_stream_generator(prompt: str, sampling_params: "SamplingParams", model_name: str):
+    """Stream deltas from the vLLM engine as SSE chunks"""
+    try:
+        chunk_id = f"chatcmpl-{int(time.time())}"
+        sent = 0
+        async for output in chat_engine.generate(prompt, sampling_params, request_id=uuid.uuid4().hex):
+            # vLLM 每次返回截至目前的完整文本，只发送新增部分
+            text = output.outputs[0].text
+            if len(text) > sent:
+                yield _chat_chunk(chunk_id, model_name, {"content": text[sent:]})
+                sent = len(text)
+        yield _chat_chunk(chunk_id, model_name, {}, "stop")
+        yield "data: [DONE]\n\n"
+    except Exception as e:
+        error_chunk = {
+            "error": str(e)
+        }
+        yield f"data: {json.dumps(error_chunk)}\n\n"
+
 # 添加音频处理函数
 def generate_audio_response(text: str, config: AudioConfig) -> StreamingResponse:
     """Generate audio response with the specified configuration"""
@@ -323,19 +600,80 @@ async def chat_completions(request: ChatRequest):
         max_tokens = request.max_completion_tokens or request.max_tokens or 512
         # Format messages into prompt
         formatted_messages = format_messages(request.messages)
+        messages_key = tuple((m["role"], m["content"]) for m in formatted_messages)
+        loop = asyncio.get_running_loop()
+
+        if chat_engine is not None:
+            # vLLM 连续批处理：请求在迭代级别加入正在运行的批次
+            prompt = await loop.run_in_executor(None, apply_chat_template_cached, messages_key, False)
+            sampling_params = SamplingParams(
+                temperature=request.temperature or 0.7,
+                top_p=0.8,
+                top_k=20,
+                max_tokens=max_tokens,
+                repetition_penalty=1.05
+            )
+            if request.stream:
+                return StreamingResponse(
+                    engine_stream_generator(prompt, sampling_params, request.model),
+                    media_type="text/event-stream"
+                )
+            final_output = None
+            async for final_output in chat_engine.generate(prompt, sampling_params, request_id=uuid.uuid4().hex):
+                pass
+            response = final_output.outputs[0].text
+            input_length = len(final_output.prompt_token_ids)
+            output_length = len(final_output.outputs[0].token_ids)
+            chat_response = ChatResponse(
+                id=f"chatcmpl-{int(time.time())}",
+                object="chat.completion",
+                created=int(time.time()),
+                model=request.model,
+                choices=[{
+                    "index": 0,
+                    "message": {
+                        "role": "assistant",
+                        "content": response
+                    },
+                    "finish_reason": "stop"
+                }] * request.n,
+                usage={
+                    "prompt_tokens": input_length,
+                    "completion_tokens": output_length,
+                    "total_tokens": input_length + output_length
+                }
+            )
+            log_time(start_time, "chat_completions")
+            return chat_response
 
-        tokenized_chat = tokenizer.apply_chat_template(formatted_messages, tokenize=True, add_generation_prompt=True,return_tensors="pt",
-                                                enable_thinking=False )
+        tokenized_chat = await loop.run_in_executor(None, apply_chat_template_cached, messages_key, True)
+        
+        if request.stream:
+            return StreamingResponse(
+                stream_generator(
+                    tokenized_chat.to(model.device),
+                    formatted_messages,
+                    request.model,
+                    max_new_tokens=max_tokens,
+                    temperature=request.temperature or 0.7
+                ),
+                media_type="text/event-stream"
+            )
         
         # 设置生成参数
-        outputs = model.generate(
-            tokenized_chat.to(model.device), 
-            max_new_tokens=max_tokens,
-            do_sample=True,
-            top_k=20,
-            top_p=0.8,
-            repetition_penalty=1.05,
-            temperature=request.temperature or 0.7
+        outputs = await loop.run_in_executor(
+            MODEL_EXECUTOR,
+            functools.partial(
+                generate_chat,
+                tokenized_chat.to(model.device),
+                formatted_messages,
+                max_new_tokens=max_tokens,
+                do_sample=True,
+                top_k=20,
+                top_p=0.8,
+                repetition_penalty=1.05,
+                temperature=request.temperature or 0.7
+            )
         )
         
         response = tokenizer.decode(outputs[0])
@@ -378,21 +716,19 @@ async def create_embeddings(request: EmbeddingRequest):
     try:
         logger.info(f"Received embedding request for model: {request.model}")
         # 生成嵌入
-        embeddings = get_embeddings(request.input)
+        texts = [request.input] if isinstance(request.input, str) else request.input
+        embeddings, token_counts = await embed_texts(texts)
         
         # 计算token数量
-        if isinstance(request.input, str):
-            input_tokens = len(embedding_tokenizer.encode(request.input))
-            total_tokens = input_tokens
-            texts = [request.input]
-            logger.info(f"Processing single text with {input_tokens} tokens")
-        else:
-            input_tokens = sum(len(embedding_tokenizer.encode(text)) for text in request.input)
-            total_tokens = input_tokens
-            texts = request.input
-            logger.info(f"Processing {len(texts)} texts with total {input_tokens} tokens")
+        input_tokens = sum(token_counts)
+        total_tokens = input_tokens
+        logger.info(f"Processing {len(texts)} texts with total {input_tokens} tokens")
         
-        # 准备响应
+        # 准备响应：base64 直接编码 float32 字节；float 格式由 orjson 在 C 中序列化 ndarray
+        if request.encoding_format == "base64":
+            embeddings = [base64.b64encode(row.astype("<f4", copy=False).tobytes()).decode() for row in embeddings]
+        elif not SUPPORT_ORJSON:
+            embeddings = [row.tolist() for row in embeddings]
         response_data = [
             {
                 "object": "embedding",
@@ -403,23 +739,28 @@ async def create_embeddings(request: EmbeddingRequest):
         ]
         
         logger.info(f"Generated {len(embeddings)} embeddings")
-        response = EmbeddingResponse(
+        usage = {
+            "prompt_tokens": input_tokens,
+            "total_tokens": total_tokens
+        }
+        log_time(start_time, "create_embeddings")
+        if SUPPORT_ORJSON:
+            return ORJSONResponse({"object": "list", "data": response_data, "model": request.model, "usage": usage})
+        return EmbeddingResponse(
             object="list",
             data=response_data,
             model=request.model,
-            usage={
-                "prompt_tokens": input_tokens,
-                "total_tokens": total_tokens
-            }
+            usage=usage
         )
-        log_time(start_time, "create_embeddings")
-        return response
         
     except Exception as e:
         logger.error(f"Error in embedding generation: {str(e)}", exc_info=True)
         log_time(start_time, "create_embeddings (error)")
         raise HTTPException(status_code=500, detail=str(e))
 
+# 参考音频临时文件放在内存文件系统（tmpfs）中，避免写盘再读盘；不可用时使用系统临时目录
+REFERENCE_AUDIO_TMP_DIR = "/dev/shm" if os.access("/dev/shm", os.W_OK) else None
+
 # 辅助函数：处理 base64 编码的音频
 def save_base64_audio(base64_audio: str, suffix: str = ".wav") -> str:
     """Save base64 encoded audio to temporary file and return path"""
@@ -428,9 +769,8 @@ def save_base64_audio(base64_audio: str, suffix: str = ".wav") -> str:
         audio_bytes = base64.b64decode(base64_audio)
         
         # Create temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-        temp_file.write(audio_bytes)
-        temp_file.close()
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=REFERENCE_AUDIO_TMP_DIR) as temp_file:
+            temp_file.write(audio_bytes)
         
         logger.info(f"Saved base64 audio to temporary file: {temp_file.name}")
         return temp_file.name
@@ -438,11 +778,83 @@ def save_base64_audio(base64_audio: str, suffix: str = ".wav") -> str:
         logger.error(f"Error decoding base64 audio: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Invalid base64 audio: {str(e)}")
 
+def remove_temp_audio(path: str):
+    """Remove a temporary reference audio file, ignoring files that are already gone"""
+    try:
+        os.unlink(path)
+        logger.info(f"Cleaned up temporary audio file: {path}")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Failed to clean up temporary file {path}: {str(e)}")
+
+async def speech_stream_generator(text: str, voice: str, tts_kwargs: Dict, temp_audio_file: Optional[str] = None):
+    """Run streaming synthesis on TTS_EXECUTOR and relay raw PCM chunks as they are produced"""
+    loop = asyncio.get_running_loop()
+    chunks: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+    
+    errors: List[Exception] = []
+    
+    def producer():
+        try:
+            for chunk in tts.generate_speech_stream(text, voice, **tts_kwargs):
+                if cancelled.is_set():
+                    break
+                loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+        except Exception as e:
+            logger.error(f"Error in streaming speech generation: {str(e)}", exc_info=True)
+            errors.append(e)
+        finally:
+            # 参考音频在合成结束后才能删除
+            if temp_audio_file:
+                remove_temp_audio(temp_audio_file)
+            loop.call_soon_threadsafe(chunks.put_nowait, _STREAM_END)
+    
+    loop.run_in_executor(TTS_EXECUTOR, producer)
+    try:
+        while True:
+            chunk = await chunks.get()
+            if chunk is _STREAM_END:
+                break
+            yield chunk
+        # 合成失败时中断响应，不把截断的音频当作完整结果
+        if errors:
+            raise errors[0]
+    finally:
+        # 客户端断开时让合成线程尽快退出
+        cancelled.set()
+
+async def encoded_speech_stream_generator(
+    text: str,
+    voice: str,
+    tts_kwargs: Dict,
+    output_format: str,
+    cache_key: Optional[str] = None,
+    temp_audio_file: Optional[str] = None
+):
+    """Encode streamed PCM with a long-lived ffmpeg process so mp3/opus/aac/flac bytes are sent while synthesis runs"""
+    parts: Optional[List[bytes]] = [] if cache_key is not None else None
+    pcm_chunks = speech_stream_generator(text, voice, tts_kwargs, temp_audio_file)
+    encoded = AudioConverter.encode_pcm_stream(pcm_chunks, output_format, tts.sampling_rate)
+    try:
+        async for data in encoded:
+            if parts is not None:
+                parts.append(data)
+            yield data
+    finally:
+        # 客户端断开时立即结束 ffmpeg 和合成线程，不等垃圾回收
+        await encoded.aclose()
+    # 完整生成后写入结果缓存，与非流式路径共用
+    if parts is not None:
+        tts.speech_cache.put(cache_key, (b"".join(parts), AudioConverter.FORMAT_PARAMS[output_format]["mime"]))
+
 # 添加TTS接口
 @app.post("/v1/audio/speech")
 async def create_speech(request: TTSRequest):
     start_time = time.time()
     temp_audio_file = None
+    loop = asyncio.get_running_loop()
     try:
         dialect = request.dialect if request.dialect else None
         dialect_prompt = request.dialect_prompt if request.dialect_prompt else None
@@ -454,18 +866,16 @@ async def create_speech(request: TTSRequest):
         reference_audio_path = None
         if request.reference_audio:
             try:
-                reference_audio_path = save_base64_audio(request.reference_audio)
+                reference_audio_path = await loop.run_in_executor(
+                    None, save_base64_audio, request.reference_audio
+                )
                 temp_audio_file = reference_audio_path
                 logger.info(f"Using custom reference audio from base64")
             except Exception as e:
                 logger.error(f"Failed to process reference audio: {str(e)}")
                 raise HTTPException(status_code=400, detail=f"Invalid reference_audio: {str(e)}")
         
-        # 生成音频并获取正确的 MIME 类型
-        audio_data, mime_type = tts.generate_speech(
-            request.input, 
-            request.voice,
-            output_format=request.response_format,
+        tts_kwargs = dict(
             instructions=request.instructions,
             reference_audio=reference_audio_path,
             reference_text=request.reference_text,
@@ -474,6 +884,52 @@ async def create_speech(request: TTSRequest):
             dialect_prompt=dialect_prompt
         )
         
+        # ffmpeg 可用时 mp3/opus/aac/flac 也边合成边编码边发送；结果已缓存时直接返回缓存
+        stream_encoded = FFMPEG_PATH is not None and request.response_format in AudioConverter.FORMAT_PARAMS
+        cache_key = None
+        if stream_encoded and tts.speech_cache is not None:
+            cache_key = await loop.run_in_executor(
+                None, functools.partial(
+                    tts.speech_cache_key, request.input, request.voice,
+                    output_format=request.response_format, **tts_kwargs
+                )
+            )
+            stream_encoded = tts.speech_cache.get(cache_key) is None
+        
+        if request.response_format == "pcm16" or stream_encoded:
+            if request.response_format == "pcm16":
+                # 原始 PCM 无需编码，边合成边发送
+                body = speech_stream_generator(request.input, request.voice, tts_kwargs, temp_audio_file)
+                media_type = "audio/pcm"
+                headers = {"X-Sample-Rate": str(tts.sampling_rate)}
+            else:
+                body = encoded_speech_stream_generator(
+                    request.input, request.voice, tts_kwargs, request.response_format, cache_key, temp_audio_file
+                )
+                media_type = AudioConverter.FORMAT_PARAMS[request.response_format]["mime"]
+                headers = {"Content-Disposition": f'attachment; filename="speech.{request.response_format}"'}
+            # 合成结束时生成器会删除临时文件；响应结束后再兜底删除一次，
+            # 覆盖客户端在响应体开始前断开、生成器从未运行的情况
+            response = StreamingResponse(
+                body,
+                media_type=media_type,
+                headers=headers,
+                background=BackgroundTask(remove_temp_audio, temp_audio_file) if temp_audio_file else None
+            )
+            temp_audio_file = None
+            log_time(start_time, "create_speech (stream start)")
+            return response
+        
+        # 生成音频并获取正确的 MIME 类型
+        # 推理在 TTS 线程中进行，编码交给异步 ffmpeg 子进程，推理线程可以立即处理下一个请求
+        audio_data, mime_type = await tts.generate_speech_async(
+            request.input,
+            request.voice,
+            output_format=request.response_format,
+            executor=TTS_EXECUTOR,
+            **tts_kwargs
+        )
+        
         logger.info(f"Speech generated successfully in {request.response_format} format")
         
         response = StreamingResponse(
@@ -494,13 +950,71 @@ async def create_speech(request: TTSRequest):
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         # Clean up temporary audio file
-        if temp_audio_file and os.path.exists(temp_audio_file):
-            try:
-                os.unlink(temp_audio_file)
-                logger.info(f"Cleaned up temporary audio file: {temp_audio_file}")
-            except Exception as e:
-                logger.warning(f"Failed to clean up temporary file {temp_audio_file}: {str(e)}")
+        if temp_audio_file:
+            remove_temp_audio(temp_audio_file)
+
+# 批量 TTS 接口：同一参考音频的条目连续推理，共享一次参考特征提取，编码并发进行
+@app.post("/v1/audio/speech/batch")
+async def create_speech_batch(request: TTSBatchRequest):
+    start_time = time.time()
+    # base64 参考音频 -> 临时文件；相同的参考音频只落盘一次，批量推理才能按路径分组
+    reference_paths: Dict[str, str] = {}
+    loop = asyncio.get_running_loop()
+    try:
+        logger.info(f"Received batch TTS request for model: {request.model}, items: {len(request.items)}")
+        items = []
+        for item in request.items:
+            if item.response_format == "pcm16":
+                raise HTTPException(status_code=400, detail="pcm16 is only supported by /v1/audio/speech")
+            reference_audio_path = None
+            if item.reference_audio:
+                reference_audio_path = reference_paths.get(item.reference_audio)
+                if reference_audio_path is None:
+                    reference_audio_path = await loop.run_in_executor(
+                        None, save_base64_audio, item.reference_audio
+                    )
+                    reference_paths[item.reference_audio] = reference_audio_path
+            items.append(dict(
+                text=item.input,
+                voice=item.voice,
+                output_format=item.response_format,
+                instructions=item.instructions,
+                reference_audio=reference_audio_path,
+                reference_text=item.reference_text,
+                speed=item.speed,
+                dialect=item.dialect or None,
+                dialect_prompt=item.dialect_prompt or None
+            ))
+        
+        results = await loop.run_in_executor(TTS_EXECUTOR, tts.generate_speech_batch, items)
+        data = [
+            {"index": i, "b64_audio": base64.b64encode(audio_data).decode("ascii"), "mime_type": mime_type}
+            for i, (audio_data, mime_type) in enumerate(results)
+        ]
+        log_time(start_time, "create_speech_batch")
+        return {"object": "list", "model": request.model, "data": data}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in batch speech generation: {str(e)}", exc_info=True)
+        log_time(start_time, "create_speech_batch (error)")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for path in reference_paths.values():
+            remove_temp_audio(path)
 
 if __name__ == "__main__":
     logger.info(f"Starting server on http://{config.HOST}:{config.PORT}")
-    uvicorn.run("service:app", host=config.HOST, port=config.PORT)
+    # uvloop 事件循环 + httptools 解析器（未安装时退回 asyncio/h11）；
+    # 模型占用 GPU 且不能 fork，保持单 worker，并发依赖事件循环与推理线程池
+    uvicorn.run(
+        "service:app",
+        host=config.HOST,
+        port=config.PORT,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        workers=1,
+        timeout_keep_alive=30,
+        backlog=2048
+    )
@@ -1,15 +1,26 @@
 import os
 import sys
+import atexit
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from pathlib import Path
 import re
 import numpy as np
 import torch
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Iterator, Optional, List, Tuple
 import logging
 
 import soundfile as sf
 
+# 启用 cuDNN 算法自动调优和 TF32 矩阵乘
+if torch.cuda.is_available():
+    torch.backends.cudnn.benchmark = True
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
+torch.set_float32_matmul_precision('high')
+
 # Import dialect utilities
 try:
     from dialect_utils import (
@@ -27,6 +38,10 @@ except ImportError:
     def is_dialect_supported(dialect): return False
     def normalize_dialect_name(dialect): return dialect
 
+# 匹配 [tag] 格式，其中 tag 不包含 [ ] 字符
+# 使用负向后顾断言 (?<!<) 排除已经是 <|tag|> 格式的情况
+_VOICE_TAG_RE = re.compile(r'(?<!<)\[([^\[\]<>]+)\]')
+
 def convert_voice_tags_to_soulx_format(text: str) -> str:
     """
     将文本中的 voice_tag 格式从 [tag] 转换为 SoulX 格式 <|tag|>
@@ -46,16 +61,8 @@ def convert_voice_tags_to_soulx_format(text: str) -> str:
     if not text:
         return text
     
-    # 匹配 [tag] 格式，其中 tag 不包含 [ ] 字符
-    # 使用正则表达式替换 [tag] 为 <|tag|>
-    # 使用负向后顾断言 (?<!<) 排除已经是 <|tag|> 格式的情况
-    pattern = r'(?<!<)\[([^\[\]<>]+)\]'
-    
-    def replace_tag(match):
-        tag = match.group(1)
-        return f'<|{tag}|>'
-    
-    return re.sub(pattern, replace_tag, text)
+    # 替换模板由 C 层的 _sre 直接展开，不需要逐个匹配回调 Python 函数
+    return _VOICE_TAG_RE.sub(r'<|\1|>', text)
 
 # Add SoulX-Podcast-main to path if needed
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -78,6 +85,17 @@ except ImportError as e:
     from soulxpodcast.models.soulxpodcast import SoulXPodcast
     import s3tokenizer
 
+# 输出文件在后台线程写入，推理线程无需等待落盘
+_IO_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts-io")
+
+
+def _shutdown_io_pool():
+    """等待尚未完成的音频写入"""
+    _IO_POOL.shutdown(wait=True)
+
+
+atexit.register(_shutdown_io_pool)
+
 # Import logger (already configured)
 try:
     from logger import logger
@@ -86,6 +104,57 @@ except ImportError:
     import logging
     logger = logging.getLogger("llm-service")
 
+class CachedPodcastInferHandler(PodcastInferHandler):
+    """
+    缓存参考音频特征（log_mel / 说话人嵌入 / mel）和提示文本分词结果的 PodcastInferHandler。
+    以音频文件内容的 blake2b 摘要为键，同一参考音频（包括重复上传的 base64 音频）
+    不再重复进行重采样、梅尔谱提取和说话人编码，按 LRU 淘汰。
+    """
+    def __init__(self, text_tokenizer, data_list, model_config, cache_size: int = 128):
+        super().__init__(text_tokenizer, data_list, model_config)
+        self.cache_size = cache_size
+        self._ref_cache: "OrderedDict[str, Tuple]" = OrderedDict()
+        # 参考文本和方言提示文本在同一音色/方言下重复出现，缓存其分词结果
+        self._prompt_token_cache: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+        # (路径, 修改时间, 大小) -> 内容摘要；文件未变化时不再读取整个文件计算摘要
+        self._digest_cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+    
+    def encode_prompt(self, prompt_text):
+        tokens = self._prompt_token_cache.get(prompt_text)
+        if tokens is not None:
+            self._prompt_token_cache.move_to_end(prompt_text)
+        else:
+            tokens = tuple(super().encode_prompt(prompt_text))
+            self._prompt_token_cache[prompt_text] = tokens
+            while len(self._prompt_token_cache) > self.cache_size:
+                self._prompt_token_cache.popitem(last=False)
+        # 下游会拼接 token 列表，返回副本
+        return list(tokens)
+    
+    def _audio_digest(self, prompt_wav) -> str:
+        stat = os.stat(prompt_wav)
+        file_key = (os.path.abspath(prompt_wav), stat.st_mtime_ns, stat.st_size)
+        digest = self._digest_cache.get(file_key)
+        if digest is None:
+            with open(prompt_wav, "rb") as f:
+                digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+            self._digest_cache[file_key] = digest
+            while len(self._digest_cache) > self.cache_size * 4:
+                self._digest_cache.popitem(last=False)
+        return digest
+    
+    def extract_prompt_audio_features(self, prompt_wav):
+        key = self._audio_digest(prompt_wav)
+        features = self._ref_cache.get(key)
+        if features is not None:
+            self._ref_cache.move_to_end(key)
+            return features
+        features = super().extract_prompt_audio_features(prompt_wav)
+        self._ref_cache[key] = features
+        while len(self._ref_cache) > self.cache_size:
+            self._ref_cache.popitem(last=False)
+        return features
+
 @dataclass
 class SoulXTTSConfig:
     """
@@ -96,6 +165,8 @@ class SoulXTTSConfig:
     llm_engine: LLM引擎 ("hf" 或 "vllm")
     fp16_flow: 是否使用FP16精度的Flow模型
     seed: 随机种子
+    compile: 使用 torch.compile 编译 Flow 模型（hf 引擎时同时编译 LLM）
+    ref_cache_size: 缓存的参考音频特征数量（LRU）
     """
     model_path: str
     device: str = "cuda"
@@ -103,6 +174,8 @@ class SoulXTTSConfig:
     llm_engine: str = "hf"
     fp16_flow: bool = False
     seed: int = 1988
+    compile: bool = False
+    ref_cache_size: int = 128
 
 @dataclass
 class SoulXTTSParam:
@@ -157,12 +230,15 @@ class SoulXTTS:
             
             # 初始化模型
             self.model = SoulXPodcast(model_config)
+            if self.config.compile:
+                self._compile_model()
             
             # 初始化数据集处理器
-            self.dataset = PodcastInferHandler(
+            self.dataset = CachedPodcastInferHandler(
                 self.model.llm.tokenizer,
                 None,
-                model_config
+                model_config,
+                cache_size=self.config.ref_cache_size
             )
             
             logger.info("SoulX TTS model loaded successfully")
@@ -170,6 +246,157 @@ class SoulXTTS:
             logger.error(f"Failed to load SoulX TTS model: {str(e)}")
             raise
         
+    def _compile_model(self):
+        """编译 Flow 与 hf 引擎的 LLM；序列长度随文本变化，使用 dynamic 形状避免反复重新编译"""
+        try:
+            self.model.flow = torch.compile(self.model.flow, dynamic=True)
+            if self.config.llm_engine == "hf":
+                self.model.llm.model.forward = torch.compile(self.model.llm.model.forward, dynamic=True)
+            logger.info("SoulX TTS models compiled with torch.compile")
+        except RuntimeError as e:
+            logger.warning(f"torch.compile unavailable for SoulX TTS, running eagerly: {e}")
+    
+    def _to_device(self, tensor: torch.Tensor) -> torch.Tensor:
+        """CPU 张量拷贝到推理设备；CUDA 上先锁页再非阻塞拷贝，与后续计算重叠"""
+        if self.device.startswith("cuda"):
+            return tensor.pin_memory().to(self.device, non_blocking=True)
+        return tensor.to(self.device)
+    
+    def _forward(self, param: SoulXTTSParam) -> List[torch.Tensor]:
+        """
+        执行一次长文本推理
+        :param param: SoulXTTSParam 参数对象
+        :return: 按句生成的音频张量列表，每个形状为 [1, samples]
+        """
+        processed_data = self._prepare_inputs(param)
+        with torch.inference_mode():
+            results_dict = self.model.forward_longform(**processed_data)
+        return results_dict["generated_wavs"]
+    
+    def _iter_forward(self, param: SoulXTTSParam) -> Iterator[torch.Tensor]:
+        """
+        执行一次长文本推理，每句在声码器完成后立即产出
+        :param param: SoulXTTSParam 参数对象
+        :return: 每句音频张量（形状 [1, samples]）的迭代器
+        """
+        processed_data = self._prepare_inputs(param)
+        iter_longform = getattr(self.model, "iter_longform", None)
+        if iter_longform is None:
+            # 外部安装的 soulxpodcast 没有逐句接口时，整段生成后再逐句产出
+            with torch.inference_mode():
+                wavs = self.model.forward_longform(**processed_data)["generated_wavs"]
+            yield from wavs
+            return
+        # iter_longform 自带 inference_mode，产出之间不会把推理模式泄漏给调用方
+        yield from iter_longform(**processed_data)
+    
+    def _prepare_inputs(self, param: SoulXTTSParam) -> dict:
+        """
+        构建 forward_longform 的模型输入
+        :param param: SoulXTTSParam 参数对象
+        :return: forward_longform / iter_longform 的关键字参数
+        """
+        # 设置随机种子
+        torch.manual_seed(self.config.seed)
+        np.random.seed(self.config.seed)
+        
+        # 如果没有提供参考文本，使用空字符串
+        spk_text_prompt = param.spk_text_prompt or ""
+        
+        # 处理方言
+        use_dialect_prompt = False
+        dialect_prompt_text = None
+        processed_text = param.text
+        
+        if param.dialect:
+            normalized_dialect = normalize_dialect_name(param.dialect)
+            if normalized_dialect and normalized_dialect != "mandarin":
+                # 使用提供的方言提示文本，或获取默认的
+                if param.dialect_prompt:
+                    dialect_prompt_text = param.dialect_prompt
+                else:
+                    dialect_prompt_text = get_default_dialect_prompt(normalized_dialect, speaker_index=0)
+                
+                if dialect_prompt_text:
+                    use_dialect_prompt = True
+                    logger.info(f"Using dialect: {normalized_dialect}, dialect_prompt: {dialect_prompt_text[:50]}...")
+                
+                # 为文本添加方言标记（如果还没有）
+                processed_text = add_dialect_tag_to_text(processed_text, normalized_dialect)
+        
+        # 转换 voice_tags 格式：将 [tag] 转换为 <|tag|>
+        # 在方言处理之后进行转换，确保方言标记和 voice_tags 都能正确处理
+        processed_text = convert_voice_tags_to_soulx_format(processed_text)
+        if processed_text != param.text:
+            logger.debug(f"Converted voice tags: {param.text[:100]}... -> {processed_text[:100]}...")
+        # 构建数据项（单说话人）
+        dataitem = {
+            "key": "soulx_tts_001",
+            "prompt_text": [spk_text_prompt],
+            "prompt_wav": [param.spk_audio_prompt],
+            "text": [processed_text],
+            "spk": [0],  # 单说话人，使用索引0
+        }
+        
+        # 如果使用方言，添加方言提示文本
+        if use_dialect_prompt and dialect_prompt_text:
+            dataitem["dialect_prompt_text"] = [dialect_prompt_text]
+        
+        # 更新数据源
+        self.dataset.update_datasource([dataitem])
+        
+        # 获取处理后的数据
+        data = self.dataset[0]
+        
+        # 准备模型输入：直接在目标设备上构建，较大的 mel 张量经锁页内存异步拷贝
+        prompt_mels_for_llm, prompt_mels_lens_for_llm = s3tokenizer.padding(data["log_mel"])
+        prompt_mels_for_llm = self._to_device(prompt_mels_for_llm)
+        prompt_mels_lens_for_llm = self._to_device(prompt_mels_lens_for_llm)
+        spk_emb_for_flow = torch.as_tensor(data["spk_emb"], dtype=torch.float32, device=self.device)
+        prompt_mels_for_flow = self._to_device(torch.nn.utils.rnn.pad_sequence(
+            data["mel"], batch_first=True, padding_value=0
+        ))
+        prompt_mels_lens_for_flow = torch.as_tensor(data['mel_len'], device=self.device)
+        text_tokens_for_llm = data["text_tokens"]
+        prompt_text_tokens_for_llm = data["prompt_text_tokens"]
+        spk_ids = data["spks_list"]
+        
+        # 采样参数
+        sampling_params = SamplingParams(
+            temperature=param.temperature,
+            repetition_penalty=param.repetition_penalty,
+            top_k=param.top_k,
+            top_p=param.top_p,
+            use_ras=True,
+            win_size=25,
+            tau_r=0.2
+        )
+        
+        infos = [data["info"]]
+        processed_data = {
+            "prompt_mels_for_llm": prompt_mels_for_llm,
+            "prompt_mels_lens_for_llm": prompt_mels_lens_for_llm,
+            "prompt_text_tokens_for_llm": prompt_text_tokens_for_llm,
+            "text_tokens_for_llm": text_tokens_for_llm,
+            "prompt_mels_for_flow_ori": prompt_mels_for_flow,
+            "prompt_mels_lens_for_flow": prompt_mels_lens_for_flow,
+            "spk_emb_for_flow": spk_emb_for_flow,
+            "sampling_params": sampling_params,
+            "spk_ids": spk_ids,
+            "infos": infos,
+            "use_dialect_prompt": use_dialect_prompt,
+        }
+        
+        # 如果使用方言，添加方言相关的 token 数据
+        if use_dialect_prompt and "dialect_prompt_text_tokens" in data:
+            processed_data["dialect_prompt_text_tokens_for_llm"] = data["dialect_prompt_text_tokens"]
+            processed_data["dialect_prefix"] = data.get("dialect_prefix", [])
+        
+        if param.verbose:
+            logger.info(f"Generating speech for text: {param.text[:50]}...")
+        
+        return processed_data
+    
     def generate_speech(self, param: SoulXTTSParam) -> np.ndarray:
         """
         生成语音
@@ -177,131 +404,59 @@ class SoulXTTS:
         :return: 生成的语音 numpy 数组
         """
         try:
-            # 设置随机种子
-            torch.manual_seed(self.config.seed)
-            np.random.seed(self.config.seed)
+            wavs = self._forward(param)
             
-            # 如果没有提供参考文本，使用空字符串
-            spk_text_prompt = param.spk_text_prompt or ""
-            
-            # 处理方言
-            use_dialect_prompt = False
-            dialect_prompt_text = None
-            processed_text = param.text
-            
-            if param.dialect:
-                normalized_dialect = normalize_dialect_name(param.dialect)
-                if normalized_dialect and normalized_dialect != "mandarin":
-                    # 使用提供的方言提示文本，或获取默认的
-                    if param.dialect_prompt:
-                        dialect_prompt_text = param.dialect_prompt
-                    else:
-                        dialect_prompt_text = get_default_dialect_prompt(normalized_dialect, speaker_index=0)
-                    
-                    if dialect_prompt_text:
-                        use_dialect_prompt = True
-                        logger.info(f"Using dialect: {normalized_dialect}, dialect_prompt: {dialect_prompt_text[:50]}...")
-                    
-                    # 为文本添加方言标记（如果还没有）
-                    processed_text = add_dialect_tag_to_text(processed_text, normalized_dialect)
-            
-            # 转换 voice_tags 格式：将 [tag] 转换为 <|tag|>
-            # 在方言处理之后进行转换，确保方言标记和 voice_tags 都能正确处理
-            processed_text = convert_voice_tags_to_soulx_format(processed_text)
-            if processed_text != param.text:
-                logger.debug(f"Converted voice tags: {param.text[:100]}... -> {processed_text[:100]}...")
-            # 构建数据项（单说话人）
-            dataitem = {
-                "key": "soulx_tts_001",
-                "prompt_text": [spk_text_prompt],
-                "prompt_wav": [param.spk_audio_prompt],
-                "text": [processed_text],
-                "spk": [0],  # 单说话人，使用索引0
-            }
-            
-            # 如果使用方言，添加方言提示文本
-            if use_dialect_prompt and dialect_prompt_text:
-                dataitem["dialect_prompt_text"] = [dialect_prompt_text]
-            
-            # 更新数据源
-            self.dataset.update_datasource([dataitem])
-            
-            # 获取处理后的数据
-            data = self.dataset[0]
-            
-            # 准备模型输入
-            prompt_mels_for_llm, prompt_mels_lens_for_llm = s3tokenizer.padding(data["log_mel"])
-            spk_emb_for_flow = torch.tensor(data["spk_emb"])
-            prompt_mels_for_flow = torch.nn.utils.rnn.pad_sequence(
-                data["mel"], batch_first=True, padding_value=0
-            )
-            prompt_mels_lens_for_flow = torch.tensor(data['mel_len'])
-            text_tokens_for_llm = data["text_tokens"]
-            prompt_text_tokens_for_llm = data["prompt_text_tokens"]
-            spk_ids = data["spks_list"]
-            
-            # 采样参数
-            sampling_params = SamplingParams(
-                temperature=param.temperature,
-                repetition_penalty=param.repetition_penalty,
-                top_k=param.top_k,
-                top_p=param.top_p,
-                use_ras=True,
-                win_size=25,
-                tau_r=0.2
-            )
-            
-            infos = [data["info"]]
-            processed_data = {
-                "prompt_mels_for_llm": prompt_mels_for_llm,
-                "prompt_mels_lens_for_llm": prompt_mels_lens_for_llm,
-                "prompt_text_tokens_for_llm": prompt_text_tokens_for_llm,
-                "text_tokens_for_llm": text_tokens_for_llm,
-                "prompt_mels_for_flow_ori": prompt_mels_for_flow,
-                "prompt_mels_lens_for_flow": prompt_mels_lens_for_flow,
-                "spk_emb_for_flow": spk_emb_for_flow,
-                "sampling_params": sampling_params,
-                "spk_ids": spk_ids,
-                "infos": infos,
-                "use_dialect_prompt": use_dialect_prompt,
-            }
-            
-            # 如果使用方言，添加方言相关的 token 数据
-            if use_dialect_prompt and "dialect_prompt_text_tokens" in data:
-                processed_data["dialect_prompt_text_tokens_for_llm"] = data["dialect_prompt_text_tokens"]
-                processed_data["dialect_prefix"] = data.get("dialect_prefix", [])
-            
-            if param.verbose:
-                logger.info(f"Generating speech for text: {param.text[:50]}...")
-            
-            # 模型推理
-            with torch.no_grad():
-                results_dict = self.model.forward_longform(**processed_data)
-            
-            # 拼接音频（单说话人情况下通常只有一个）
-            target_audio = None
-            for wav in results_dict["generated_wavs"]:
-                if target_audio is None:
-                    target_audio = wav
-                else:
-                    target_audio = torch.cat([target_audio, wav], dim=1)
+            # 拼接音频（单说话人情况下通常只有一个），一次分配、一次拷贝
+            if wavs:
+                target_audio = torch.cat(wavs, dim=1) if len(wavs) > 1 else wavs[0]
+            else:
+                target_audio = torch.empty(1, 0)
             
             # 转换为numpy数组
-            audio_array = target_audio.cpu().squeeze(0).numpy()
+            audio_array = target_audio.squeeze(0).cpu().numpy()
             
             # 保存到文件（如果指定）
             if param.output_path:
                 output_path = Path(param.output_path)
                 output_path.parent.mkdir(parents=True, exist_ok=True)
-                sf.write(str(output_path), audio_array, self.sampling_rate)
-                if param.verbose:
-                    logger.info(f"Audio saved to {output_path}")
+                future = _IO_POOL.submit(sf.write, str(output_path), audio_array, self.sampling_rate)
+                future.add_done_callback(lambda f, path=output_path: self._on_write_done(f, path, param.verbose))
             
             return audio_array
             
         except Exception as e:
             logger.error(f"Failed to generate speech: {str(e)}")
             raise
+    
+    def preload_voices(self, audio_prompts: List[str]):
+        """预先提取参考音频特征并缓存，之后使用这些音色的请求跳过特征提取"""
+        for audio_prompt in audio_prompts:
+            try:
+                self.dataset.extract_prompt_audio_features(audio_prompt)
+            except Exception as e:
+                logger.warning(f"Failed to precompute features for {audio_prompt}: {e}")
+        logger.info(f"Precomputed SoulX reference features for {len(audio_prompts)} voices")
+    
+    def _on_write_done(self, future, output_path: Path, verbose: bool):
+        """后台写入完成后记录结果"""
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Failed to save audio to {output_path}: {error}")
+        elif verbose:
+            logger.info(f"Audio saved to {output_path}")
+    
+    def generate_speech_stream(self, param: SoulXTTSParam) -> Iterator[np.ndarray]:
+        """
+        逐句产出生成的语音：每句在模型生成完成后立即产出，首句的等待时间不再是整段合成时间
+        :param param: SoulXTTSParam 参数对象
+        :return: 每句语音的 numpy 数组迭代器
+        """
+        try:
+            for wav in self._iter_forward(param):
+                yield wav.squeeze(0).cpu().numpy()
+        except Exception as e:
+            logger.error(f"Failed to generate speech: {str(e)}")
+            raise
 
 
 if __name__ == "__main__":
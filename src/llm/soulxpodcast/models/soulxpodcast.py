@@ -47,7 +47,13 @@ class SoulXPodcast(torch.nn.Module):
 
     
     @torch.inference_mode()
-    def forward_longform(
+    def forward_longform(self, *args, **kwargs):
+        results_dict = {}
+        results_dict['generated_wavs'] = list(self.iter_longform(*args, **kwargs))
+        return results_dict
+
+    @torch.inference_mode()
+    def iter_longform(
         self, prompt_mels_for_llm,
         prompt_mels_lens_for_llm: torch.Tensor,
         prompt_text_tokens_for_llm: list[list[int]],
@@ -107,8 +113,6 @@ class SoulXPodcast(torch.nn.Module):
                 prompt_inputs.append(prompt_text_tokens_for_llm[i] + speech_tokens_i )
                 history_inputs.append(prompt_text_tokens_for_llm[i] + speech_tokens_i )
 
-        generated_wavs, results_dict = [], {}
-        
         # LLM generation
         inputs = list(chain.from_iterable(prompt_inputs))
         cache_config = AutoPretrainedConfig().from_dataclass(self.llm.config.hf_config)
@@ -161,8 +165,5 @@ class SoulXPodcast(torch.nn.Module):
             # HiFi-GAN generation
             mel = generated_mels[:, :, prompt_mels_lens[0].item():generated_mels_lens[0].item()]
             wav, _ = self.hift(speech_feat=mel)
-            generated_wavs.append(wav)
-
-        # Save the generated wav;
-        results_dict['generated_wavs'] = generated_wavs
-        return results_dict
\ No newline at end of file
+            # yield each turn as soon as it is vocoded so callers can stream it
+            yield wav
\ No newline at end of file
@@ -79,6 +79,38 @@ class PodcastDataset(Dataset):
     def __len__(self):
         return len(self.datas)
 
+    def encode_prompt(self, prompt_text):
+        """Tokenize a formatted prompt / dialect prompt text."""
+        return self.text_tokenizer.encode(prompt_text)
+
+    def extract_prompt_audio_features(self, prompt_wav):
+        """Return (log_mel, spk_emb, mel, mel_len) for one prompt wav."""
+        # 1. feature for s3tokenizer
+        audio = s3tokenizer.load_audio(prompt_wav, sr=16000)  
+        audio = audio_volume_normalize(audio)
+        # [T]
+        log_mel = s3tokenizer.log_mel_spectrogram(audio)  # [num_mels, T]
+
+        # 2. feature for speaker embedding
+        spk_feat = kaldi.fbank(audio.unsqueeze(0), num_mel_bins=80, dither=0, sample_frequency=16000)
+        spk_feat = spk_feat - spk_feat.mean(dim=0, keepdim=True)
+        spk_emb = self.spk_model.run(
+            None, {self.spk_model.get_inputs()[0].name: spk_feat.unsqueeze(dim=0).cpu().numpy()}
+        )[0].flatten().tolist()
+
+        # 3. feature for flow
+        audio, sample_rate = torchaudio.load(prompt_wav, backend='soundfile')
+        audio = audio[0]
+        audio = audio_volume_normalize(audio).unsqueeze(0)
+        # audio = audio.mean(dim=0, keepdim=True)  # [1, T]
+        if sample_rate != 24000:
+            audio = torchaudio.transforms.Resample(orig_freq=sample_rate, new_freq=24000)(audio)
+        mel = mel_spectrogram(audio).transpose(1, 2).squeeze(0)  # [T, num_mels]
+        if mel.shape[0] %2 !=0:
+            mel = mel[:-1]
+        mel_len = mel.shape[0]
+        return log_mel, spk_emb, mel, mel_len
+
     def __getitem__(self, idx):
         data = self.datas[idx]
         try:
@@ -88,47 +120,25 @@ class PodcastDataset(Dataset):
             # Prepare prompt information
             use_dialect_prompt = "dialect_prompt_text" in data
             dialect_prefix_list = []
-            dialect_prefix_list.append(self.text_tokenizer.encode(f"{TASK_PODCAST}"))
+            dialect_prefix_list.append(self.encode_prompt(f"{TASK_PODCAST}"))
             for spk_idx, (prompt_text, prompt_wav) in enumerate(zip(data["prompt_text"], data["prompt_wav"])):
-                # 1. feature for s3tokenizer
-                audio = s3tokenizer.load_audio(prompt_wav, sr=16000)  
-                audio = audio_volume_normalize(audio)
-                # [T]
-                log_mel = s3tokenizer.log_mel_spectrogram(audio)  # [num_mels, T]
-
-                # 2. feature for speaker embedding
-                spk_feat = kaldi.fbank(audio.unsqueeze(0), num_mel_bins=80, dither=0, sample_frequency=16000)
-                spk_feat = spk_feat - spk_feat.mean(dim=0, keepdim=True)
-                spk_emb = self.spk_model.run(
-                    None, {self.spk_model.get_inputs()[0].name: spk_feat.unsqueeze(dim=0).cpu().numpy()}
-                )[0].flatten().tolist()
-
-                # 3. feature for flow
-                audio, sample_rate = torchaudio.load(prompt_wav, backend='soundfile')
-                audio = audio[0]
-                audio = audio_volume_normalize(audio).unsqueeze(0)
-                # audio = audio.mean(dim=0, keepdim=True)  # [1, T]
-                if sample_rate != 24000:
-                    audio = torchaudio.transforms.Resample(orig_freq=sample_rate, new_freq=24000)(audio)
-                mel = mel_spectrogram(audio).transpose(1, 2).squeeze(0)  # [T, num_mels]
-                if mel.shape[0] %2 !=0:
-                    mel = mel[:-1]
-                mel_len = mel.shape[0]
+                # 1-3. features for s3tokenizer, speaker embedding and flow
+                log_mel, spk_emb, mel, mel_len = self.extract_prompt_audio_features(prompt_wav)
                 
                 # 4. feature for llm
                 prompt_text = normalize_text(prompt_text) # remove some space and strange character
                 prompt_text = f"{SPK_DICT[spk_idx]}{TEXT_START}{prompt_text}{TEXT_END}{AUDIO_START}"
                 if spk_idx == 0:
                     prompt_text = f"{TASK_PODCAST}{prompt_text}"
-                prompt_text_ids = self.text_tokenizer.encode(prompt_text)
+                prompt_text_ids = self.encode_prompt(prompt_text)
                 prompt_text_ids_list.append(prompt_text_ids)
                 if use_dialect_prompt:
                     dialect_prompt_text = normalize_text(data["dialect_prompt_text"][spk_idx])
                     dialect_prompt_text = f"{SPK_DICT[spk_idx]}{TEXT_START}{dialect_prompt_text}{TEXT_END}{AUDIO_START}"
-                    dialect_prompt_text_ids = self.text_tokenizer.encode(dialect_prompt_text)
+                    dialect_prompt_text_ids = self.encode_prompt(dialect_prompt_text)
                     dialect_prompt_text_ids_list.append(dialect_prompt_text_ids)
                     if spk_idx == 0:
-                        dialect_prefix_list.append(self.text_tokenizer.encode(f"{TASK_PODCAST}"))
+                        dialect_prefix_list.append(self.encode_prompt(f"{TASK_PODCAST}"))
                     else:
                         dialect_prefix_list.append([])
                 log_mel_list.append(log_mel)
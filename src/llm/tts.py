@@ -1,18 +1,22 @@
 from abc import ABC, abstractmethod
+import asyncio
+import functools
+import hashlib
+import inspect
 import io
 import numpy as np
-import scipy.io.wavfile
-from typing import Dict, Optional, Tuple, Literal
-import torch
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Literal
 import time
-from transformers import SpeechT5Processor, SpeechT5HifiGan, SpeechT5ForTextToSpeech
-from datasets import load_dataset
 import soundfile as sf
-from pydub import AudioSegment
 from config import config
-from langdetect import detect
 import re
 import os
+from functools import lru_cache
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
 
 # Import logger (already configured)
 try:
@@ -22,6 +26,18 @@ except ImportError:
     import logging
     logger = logging.getLogger("llm-service")
 
+# 方言工具在模块加载时解析一次，不可用时不做处理
+try:
+    from dialect_utils import remove_dialect_tag
+except ImportError:
+    def remove_dialect_tag(text): return text
+
+# 汉字范围，用于语言检测的快速判断
+_HAN_RE = re.compile(r'[\u4e00-\u9fff]')
+
+# langdetect 只看文本开头这么多字符
+_LANG_DETECT_PREFIX = 200
+
 # Dynamic imports for TTS modules that may conflict
 # These will be imported on-demand based on configuration
 _KokoroTTS = None
@@ -78,9 +94,71 @@ def _import_soulx_tts():
     return _SoulXTTS, _SoulXTTSConfig, _SoulXTTSParam
 
 
+# 参考音频等相对路径的基准目录
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _resolve_voice_prompts(provider: str) -> Dict[str, str]:
+    """VOICE_MAPPINGS entries for a provider resolved to absolute paths, keeping only files that exist"""
+    resolved = {}
+    for voice, voice_file in config.VOICE_MAPPINGS.get(provider, {}).items():
+        path = os.path.join(_MODULE_DIR, voice_file)
+        if os.path.isfile(path):
+            resolved[voice] = path
+        else:
+            logger.warning(f"Voice prompt file not found for {provider} voice '{voice}': {path}")
+    return resolved
+
+
+# ffmpeg 可执行文件，启动时检测一次；不存在时回退到 pydub
+FFMPEG_PATH = shutil.which("ffmpeg")
+
+
+# 批量编码时并发运行的 ffmpeg 进程数；线程只等待子进程，不占用 GIL
+_ENCODE_POOL = ThreadPoolExecutor(max_workers=config.TTS_ENCODE_WORKERS, thread_name_prefix="tts-encode")
+
+
 class AudioConverter:
     """Audio format conversion utility"""
     
+    # 各目标格式的编码器、容器格式和 MIME 类型
+    FORMAT_PARAMS = {
+        "mp3": {"format": "mp3", "codec": "libmp3lame", "mime": "audio/mpeg"},
+        "opus": {"format": "opus", "codec": "libopus", "mime": "audio/opus"},
+        "aac": {"format": "adts", "codec": "aac", "mime": "audio/aac"},
+        "flac": {"format": "flac", "codec": "flac", "mime": "audio/flac"}
+    }
+    
+    @staticmethod
+    def _ffmpeg_command(input_args: List[str], params: Dict[str, str], sampling_rate: int) -> List[str]:
+        """ffmpeg arguments reading audio from stdin and writing the encoded stream to stdout"""
+        return [
+            FFMPEG_PATH, "-hide_banner", "-loglevel", "error", "-y",
+            *input_args, "-i", "pipe:0",
+            "-c:a", params["codec"], "-ar", str(sampling_rate), "-f", params["format"], "pipe:1"
+        ]
+    
+    @staticmethod
+    def _pcm_input(audio_array: np.ndarray, sampling_rate: int) -> Tuple[List[str], bytes]:
+        """Raw interleaved float32 samples and the ffmpeg input arguments describing them"""
+        pcm = np.ascontiguousarray(audio_array, dtype='<f4')
+        channels = 1 if pcm.ndim == 1 else pcm.shape[1]
+        return ["-f", "f32le", "-ar", str(sampling_rate), "-ac", str(channels)], pcm.tobytes()
+    
+    @staticmethod
+    def _ffmpeg_encode(input_args: List[str], data: bytes, params: Dict[str, str], sampling_rate: int) -> bytes:
+        """Pipe audio through a single ffmpeg process and return the encoded bytes"""
+        proc = subprocess.run(
+            AudioConverter._ffmpeg_command(input_args, params, sampling_rate),
+            input=data,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=False
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {proc.returncode}: {proc.stderr.decode(errors='replace').strip()}")
+        return proc.stdout
+    
     @staticmethod
     def convert_format(
         wav_data: bytes,
@@ -89,18 +167,17 @@ class AudioConverter:
     ) -> Tuple[bytes, str]:
         """Convert audio data to target format"""
         try:
-            # Load WAV data
-            audio = AudioSegment.from_wav(io.BytesIO(wav_data))
+            params = AudioConverter.FORMAT_PARAMS[target_format]
             
-            # Set format-specific parameters
-            format_params = {
-                "mp3": {"format": "mp3", "codec": "libmp3lame", "mime": "audio/mpeg"},
-                "opus": {"format": "opus", "codec": "libopus", "mime": "audio/opus"},
-                "aac": {"format": "adts", "codec": "aac", "mime": "audio/aac"},
-                "flac": {"format": "flac", "codec": "flac", "mime": "audio/flac"}
-            }
+            if FFMPEG_PATH:
+                # WAV 字节直接送入 ffmpeg，无需在 Python 中解码为采样数组
+                return AudioConverter._ffmpeg_encode(["-f", "wav"], wav_data, params, sampling_rate), params["mime"]
             
-            params = format_params[target_format]
+            # 仅在没有 ffmpeg 可执行文件时才需要 pydub
+            from pydub import AudioSegment
+            
+            # Load WAV data
+            audio = AudioSegment.from_wav(io.BytesIO(wav_data))
             
             # Convert to target format
             output = io.BytesIO()
@@ -117,9 +194,206 @@ class AudioConverter:
             logger.error(f"Error converting audio format: {str(e)}")
             return wav_data, "audio/wav"
 
+    @staticmethod
+    def _to_int16_pcm(audio_array: np.ndarray, inplace: bool = False) -> np.ndarray:
+        """Convert a waveform to C-contiguous 16-bit PCM in a single pass
+        
+        With inplace=True a writeable float32 input is scaled and clipped in its
+        own buffer, so only the int16 result is allocated; use it only when the
+        caller owns the array and no longer needs the float samples.
+        """
+        if audio_array.dtype == np.int16:
+            return np.ascontiguousarray(audio_array)
+        if audio_array.dtype == np.int32:
+            return np.ascontiguousarray(audio_array >> 16, dtype=np.int16)
+        if inplace and audio_array.dtype == np.float32 and audio_array.flags.writeable:
+            pcm = audio_array
+            np.multiply(pcm, 32767.0, out=pcm)
+        else:
+            pcm = np.multiply(audio_array, 32767.0, dtype=np.float32)
+        np.clip(pcm, -32767.0, 32767.0, out=pcm)
+        return np.ascontiguousarray(pcm, dtype=np.int16)
+    
+    @staticmethod
+    def to_wav(audio_array: np.ndarray, sampling_rate: int, inplace: bool = False) -> bytes:
+        """Serialize a waveform to 16-bit PCM WAV bytes (see _to_int16_pcm for inplace)"""
+        buffer = io.BytesIO()
+        # 先自行裁剪转换为 int16：libsndfile 默认不裁剪越界的浮点采样
+        sf.write(buffer, AudioConverter._to_int16_pcm(audio_array, inplace), sampling_rate, format='WAV', subtype='PCM_16')
+        return buffer.getvalue()
+    
+    @staticmethod
+    def convert_from_pcm(
+        audio_array: np.ndarray,
+        target_format: Literal["mp3", "opus", "aac", "flac"],
+        sampling_rate: int
+    ) -> Tuple[bytes, str]:
+        """Encode a float waveform ([samples] or [samples, channels]) without building an intermediate WAV"""
+        params = AudioConverter.FORMAT_PARAMS.get(target_format)
+        if FFMPEG_PATH and params:
+            try:
+                # 采样按原始 float32 交错写入 ffmpeg 标准输入，不做 WAV 封装和再解析
+                input_args, data = AudioConverter._pcm_input(audio_array, sampling_rate)
+                return AudioConverter._ffmpeg_encode(input_args, data, params, sampling_rate), params["mime"]
+            except Exception as e:
+                logger.error(f"Error converting audio format: {str(e)}")
+                return AudioConverter.to_wav(audio_array, sampling_rate), "audio/wav"
+        return AudioConverter.convert_format(AudioConverter.to_wav(audio_array, sampling_rate), target_format, sampling_rate)
+    
+    @staticmethod
+    def convert_from_pcm_many(
+        items: List[Tuple[np.ndarray, str]],
+        sampling_rate: int
+    ) -> List[Tuple[bytes, str]]:
+        """Encode several (waveform, format) pairs concurrently, returning results in input order"""
+        def encode(item: Tuple[np.ndarray, str]) -> Tuple[bytes, str]:
+            audio_array, output_format = item
+            if output_format == "wav":
+                return AudioConverter.to_wav(audio_array, sampling_rate), "audio/wav"
+            return AudioConverter.convert_from_pcm(audio_array, output_format, sampling_rate)
+        
+        if len(items) <= 1:
+            return [encode(item) for item in items]
+        return list(_ENCODE_POOL.map(encode, items))
+    
+    @staticmethod
+    async def convert_from_pcm_async(
+        audio_array: np.ndarray,
+        target_format: Literal["mp3", "opus", "aac", "flac"],
+        sampling_rate: int
+    ) -> Tuple[bytes, str]:
+        """Like convert_from_pcm, but awaits an ffmpeg subprocess instead of blocking the event loop"""
+        params = AudioConverter.FORMAT_PARAMS.get(target_format)
+        if not (FFMPEG_PATH and params):
+            return await asyncio.to_thread(AudioConverter.convert_from_pcm, audio_array, target_format, sampling_rate)
+        try:
+            input_args, data = AudioConverter._pcm_input(audio_array, sampling_rate)
+            proc = await asyncio.create_subprocess_exec(
+                *AudioConverter._ffmpeg_command(input_args, params, sampling_rate),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+            stdout, stderr = await proc.communicate(data)
+            if proc.returncode != 0:
+                raise RuntimeError(f"ffmpeg exited with {proc.returncode}: {stderr.decode(errors='replace').strip()}")
+            return stdout, params["mime"]
+        except Exception as e:
+            logger.error(f"Error converting audio format: {str(e)}")
+            return AudioConverter.to_wav(audio_array, sampling_rate), "audio/wav"
+
+    @staticmethod
+    async def encode_pcm_stream(
+        chunks: AsyncIterator[bytes],
+        target_format: Literal["mp3", "opus", "aac", "flac"],
+        sampling_rate: int
+    ) -> AsyncIterator[bytes]:
+        """Encode 16-bit mono PCM chunks with one long-lived ffmpeg process
+        
+        Encoded bytes are yielded as soon as ffmpeg emits them, so the response
+        can be sent while synthesis is still running. Errors from chunks propagate.
+        """
+        params = AudioConverter.FORMAT_PARAMS[target_format]
+        proc = await asyncio.create_subprocess_exec(
+            *AudioConverter._ffmpeg_command(
+                ["-f", "s16le", "-ar", str(sampling_rate), "-ac", "1"], params, sampling_rate
+            ),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        
+        async def feed():
+            try:
+                async for chunk in chunks:
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                # ffmpeg 提前退出，错误由返回码报告
+                pass
+            finally:
+                proc.stdin.close()
+        
+        feeder = asyncio.create_task(feed())
+        try:
+            while True:
+                data = await proc.stdout.read(65536)
+                if not data:
+                    break
+                yield data
+            await feeder
+            stderr = await proc.stderr.read()
+            if await proc.wait() != 0:
+                raise RuntimeError(f"ffmpeg exited with {proc.returncode}: {stderr.decode(errors='replace').strip()}")
+        finally:
+            if not feeder.done():
+                feeder.cancel()
+                await asyncio.gather(feeder, return_exceptions=True)
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+
+class TTSCache:
+    """Thread-safe LRU of encoded speech keyed by a content hash of the request"""
+    
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(arguments: Dict) -> str:
+        """Hash all request arguments; a reference audio file contributes its content, not its (temporary) path"""
+        digest = hashlib.blake2b(digest_size=16)
+        for name in sorted(arguments):
+            value = arguments[name]
+            if name == "reference_audio" and value and os.path.isfile(value):
+                with open(value, "rb") as f:
+                    value = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+            digest.update(f"{name}={value}\x1f".encode())
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+    
+    def put(self, key: str, value: Tuple[bytes, str]):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+def cache_speech(func):
+    """Serve generate_speech from the instance's speech_cache when the same request was seen before"""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        cache = self.speech_cache
+        if cache is None:
+            return func(self, *args, **kwargs)
+        key = self.speech_cache_key(*args, **kwargs)
+        result = cache.get(key)
+        if result is None:
+            result = func(self, *args, **kwargs)
+            cache.put(key, result)
+        return result
+    
+    return wrapper
+
+
 class BaseTTS(ABC):
     """Base class for TTS implementations"""
     
+    # 流式输出时每个 PCM 分片的时长（毫秒）
+    STREAM_CHUNK_MS = 100
+    
+    # 编码结果缓存，由 TTSFactory 按 TTS_CACHE_SIZE 创建
+    speech_cache: Optional[TTSCache] = None
+    
     @abstractmethod
     def load_model(self):
         """Load the TTS model"""
@@ -151,6 +425,126 @@ class BaseTTS(ABC):
         """
         pass
     
+    def generate_speech_segments(
+        self,
+        text: str,
+        voice: str,
+        instructions: Optional[str] = None,
+        reference_audio: Optional[str] = None,
+        reference_text: Optional[str] = None,
+        speed: Optional[float] = 1.0,
+        dialect: Optional[str] = None,
+        dialect_prompt: Optional[str] = None
+    ) -> Iterator[np.ndarray]:
+        """Yield float32 audio segments as the model produces them"""
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming")
+    
+    def generate_speech_stream(self, text: str, voice: str, **kwargs) -> Iterator[bytes]:
+        """Generate speech as raw 16-bit little-endian PCM chunks of STREAM_CHUNK_MS each
+        
+        Accepts the same keyword arguments as generate_speech_segments.
+        """
+        frame = max(1, self.sampling_rate * self.STREAM_CHUNK_MS // 1000)
+        for segment in self.generate_speech_segments(text, voice, **kwargs):
+            pcm = AudioConverter._to_int16_pcm(segment, inplace=True).astype('<i2', copy=False)
+            for start in range(0, pcm.shape[0], frame):
+                yield pcm[start:start + frame].tobytes()
+    
+    def speech_cache_key(self, *args, **kwargs) -> str:
+        """Cache key for a generate_speech call, with defaults filled in so equivalent calls share an entry"""
+        bound = inspect.signature(self.generate_speech).bind(*args, **kwargs)
+        bound.apply_defaults()
+        return TTSCache.make_key(bound.arguments)
+    
+    def synthesize(self, text: str, voice: str, **kwargs) -> np.ndarray:
+        """Run inference only and return the whole float32 waveform
+        
+        Accepts the same keyword arguments as generate_speech_segments.
+        """
+        segments = list(self.generate_speech_segments(text, voice, **kwargs))
+        if not segments:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(segments) if len(segments) > 1 else segments[0]
+    
+    async def generate_speech_async(
+        self,
+        text: str,
+        voice: str,
+        output_format: Literal["mp3", "opus", "aac", "flac", "wav"] = "mp3",
+        executor: Optional[Executor] = None,
+        **kwargs
+    ) -> Tuple[bytes, str]:
+        """Generate speech without blocking the event loop
+        
+        Inference runs on executor (the loop's default pool when None) and encoding
+        runs in an async ffmpeg subprocess, so the next request's inference can
+        start while this one is still being encoded.
+        """
+        loop = asyncio.get_running_loop()
+        key = None
+        if self.speech_cache is not None:
+            key = await loop.run_in_executor(
+                None, functools.partial(self.speech_cache_key, text, voice, output_format=output_format, **kwargs)
+            )
+            result = self.speech_cache.get(key)
+            if result is not None:
+                return result
+        
+        audio_array = await loop.run_in_executor(executor, functools.partial(self.synthesize, text, voice, **kwargs))
+        if output_format == "wav":
+            result = AudioConverter.to_wav(audio_array, self.sampling_rate, inplace=True), "audio/wav"
+        else:
+            result = await AudioConverter.convert_from_pcm_async(audio_array, output_format, self.sampling_rate)
+        if key is not None:
+            self.speech_cache.put(key, result)
+        return result
+    
+    def generate_speech_batch(self, items: List[Dict]) -> List[Tuple[bytes, str]]:
+        """Generate speech for several requests, returning results in input order
+        
+        Each item holds generate_speech keyword arguments. Items sharing a voice,
+        reference audio and dialect run back to back so the backend reuses its
+        cached reference conditioning across the group.
+        """
+        groups: Dict[Tuple, List[int]] = {}
+        for i, item in enumerate(items):
+            key = (item.get("voice"), item.get("reference_audio"), item.get("dialect"))
+            groups.setdefault(key, []).append(i)
+        
+        results: List[Optional[Tuple[bytes, str]]] = [None] * len(items)
+        keys: Dict[int, str] = {}
+        pending: List[Tuple[int, np.ndarray, str]] = []
+        for indices in groups.values():
+            for i in indices:
+                kwargs = dict(items[i])
+                output_format = kwargs.pop("output_format", "mp3")
+                if self.speech_cache is not None:
+                    keys[i] = self.speech_cache_key(output_format=output_format, **kwargs)
+                    results[i] = self.speech_cache.get(keys[i])
+                    if results[i] is not None:
+                        continue
+                pending.append((i, self.synthesize(**kwargs), output_format))
+        
+        # 推理按组串行，编码在全部推理完成后并发进行
+        encoded = AudioConverter.convert_from_pcm_many(
+            [(audio_array, output_format) for _, audio_array, output_format in pending],
+            self.sampling_rate
+        )
+        for (i, _, _), result in zip(pending, encoded):
+            results[i] = result
+            if i in keys:
+                self.speech_cache.put(keys[i], result)
+        return results
+    
+    def warmup(self):
+        """Run one short synthesis so cuDNN autotuning and torch.compile happen before the first request"""
+        st = time.time()
+        try:
+            self.generate_speech("你好。", "default", output_format="wav")
+            logger.info(f"{type(self).__name__} warmup finished in {time.time() - st:.2f} s")
+        except Exception as e:
+            logger.warning(f"{type(self).__name__} warmup failed: {e}")
+    
     @property
     @abstractmethod
     def sampling_rate(self) -> int:
@@ -164,6 +558,11 @@ class KokoroTTSWrapper(BaseTTS):
     def __init__(self):
         self.model = None
         self._sampling_rate = 24000
+        # 语言 -> (OpenAI 音色 -> Kokoro 音色, 默认音色)，初始化时从 VOICE_MAPPINGS 构建一次
+        self._voice_table: Dict[str, Tuple[Dict[str, str], str]] = {
+            lang: (dict(config.VOICE_MAPPINGS[provider]), config.VOICE_MAPPINGS[provider]["default"])
+            for lang, provider in (("zh", "kokoro_zh"), ("en", "kokoro"))
+        }
         # Import Kokoro TTS modules on initialization
         try:
             KokoroTTS, TTSConfig = _import_kokoro_tts()
@@ -180,13 +579,21 @@ class KokoroTTSWrapper(BaseTTS):
         """
         检测文本语言，返回 'zh' 或 'en'
         """
+        # 包含中文字符或纯 ASCII 文本无需调用 langdetect
+        if _HAN_RE.search(text):
+            return 'zh'
+        if text.isascii():
+            return 'en'
+        return self._detect_language_cached(text[:_LANG_DETECT_PREFIX])
+    
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _detect_language_cached(text_prefix: str) -> str:
+        """使用 langdetect 检测语言，按文本前缀缓存结果"""
         try:
-            # 检查是否包含中文字符
-            if re.search(r'[\u4e00-\u9fff]', text):
-                return 'zh'
-            
-            # 使用 langdetect 进行语言检测
-            lang = detect(text)
+            # 只有非 ASCII 且不含汉字的文本才会用到 langdetect，按需导入
+            from langdetect import detect
+            lang = detect(text_prefix)
             if lang == 'zh-cn' or lang == 'zh-tw':
                 return 'zh'
             return 'en'
@@ -198,11 +605,58 @@ class KokoroTTSWrapper(BaseTTS):
         logger.info("Loading Kokoro TTS model...")
         tts_config = self.TTSConfig(
             model_path=config.KOKORO_MODEL_PATH,
-            device=config.DEVICE  # 或 "cuda" 如果使用 GPU
+            device=config.DEVICE,  # 或 "cuda" 如果使用 GPU
+            compile=config.KOKORO_COMPILE,
+            precision=config.KOKORO_PRECISION
         )
         self.model = self.KokoroTTS(tts_config)
         logger.info("Kokoro TTS model loaded successfully")
     
+    def _prepare(self, text: str, voice: str, instructions: Optional[str], dialect: Optional[str]) -> Tuple[str, str, str]:
+        """去除方言标记、检测语言并选择 Kokoro 音色，返回 (文本, 语言, 音色)"""
+        # 处理方言标记：移除方言标记（Kokoro 不支持方言语音生成）
+        # 但保留文本内容以便后续处理
+        processed_text = remove_dialect_tag(text)
+        if processed_text != text:
+            logger.info(f"Removed dialect tag from text (Kokoro doesn't support dialect)")
+        
+        # 检测语言
+        detected_lang = self._detect_language(processed_text)
+        logger.info(f"Detected language: {detected_lang} for text: {processed_text[:50]}...")
+        
+        # 根据语言选择声音映射
+        voice_map, default_voice = self._voice_table["zh" if detected_lang == "zh" else "en"]
+        kokoro_voice = voice_map.get(voice, default_voice)
+        logger.info(f"Using Kokoro voice: {kokoro_voice} for OpenAI voice: {voice}")
+        
+        if instructions:
+            logger.info(f"Instructions parameter provided: {instructions} (not used by Kokoro)")
+        
+        if dialect:
+            logger.warning(f"Dialect '{dialect}' specified but Kokoro TTS doesn't support dialect generation. Using standard Chinese.")
+        
+        return processed_text, detected_lang, kokoro_voice
+    
+    def generate_speech_segments(
+        self,
+        text: str,
+        voice: str,
+        instructions: Optional[str] = None,
+        reference_audio: Optional[str] = None,
+        reference_text: Optional[str] = None,
+        speed: Optional[float] = 1.0,
+        dialect: Optional[str] = None,
+        dialect_prompt: Optional[str] = None
+    ) -> Iterator[np.ndarray]:
+        processed_text, detected_lang, kokoro_voice = self._prepare(text, voice, instructions, dialect)
+        yield from self.model.generate_speech_stream(
+            processed_text,
+            speaker=kokoro_voice,
+            language=detected_lang,
+            speed=speed
+        )
+    
+    @cache_speech
     def generate_speech(
         self, 
         text: str, 
@@ -216,30 +670,7 @@ class KokoroTTSWrapper(BaseTTS):
         dialect_prompt: Optional[str] = None  # 方言提示文本（Kokoro 不支持）
     ) -> Tuple[bytes, str]:
         try:
-            # 处理方言标记：移除方言标记（Kokoro 不支持方言语音生成）
-            # 但保留文本内容以便后续处理
-            try:
-                from dialect_utils import remove_dialect_tag
-                processed_text = remove_dialect_tag(text)
-                if processed_text != text:
-                    logger.info(f"Removed dialect tag from text (Kokoro doesn't support dialect)")
-            except ImportError:
-                processed_text = text
-            
-            # 检测语言
-            detected_lang = self._detect_language(processed_text)
-            logger.info(f"Detected language: {detected_lang} for text: {processed_text[:50]}...")
-            
-            # 根据语言选择声音映射
-            voice_map = config.VOICE_MAPPINGS["kokoro_zh" if detected_lang == "zh" else "kokoro"]
-            kokoro_voice = voice_map.get(voice, voice_map["default"])
-            logger.info(f"Using Kokoro voice: {kokoro_voice} for OpenAI voice: {voice}")
-            
-            if instructions:
-                logger.info(f"Instructions parameter provided: {instructions} (not used by Kokoro)")
-            
-            if dialect:
-                logger.warning(f"Dialect '{dialect}' specified but Kokoro TTS doesn't support dialect generation. Using standard Chinese.")
+            processed_text, detected_lang, kokoro_voice = self._prepare(text, voice, instructions, dialect)
             
             # 生成音频
             st = time.time()
@@ -252,17 +683,11 @@ class KokoroTTSWrapper(BaseTTS):
             end = time.time()
             logger.info(f"Inference time: {end-st} s")
             
-            # 转换为字节
-            buffer = io.BytesIO()
-            scipy.io.wavfile.write(buffer, rate=self.sampling_rate, data=audio_array)
-            buffer.seek(0)
-            wav_data = buffer.getvalue()
-            
-            # 转换为目标格式
+            # 非 WAV 格式直接由采样数组编码，不经过中间 WAV
             if output_format != "wav":
-                return AudioConverter.convert_format(wav_data, output_format, self.sampling_rate)
+                return AudioConverter.convert_from_pcm(audio_array, output_format, self.sampling_rate)
             
-            return wav_data, "audio/wav"
+            return AudioConverter.to_wav(audio_array, self.sampling_rate, inplace=True), "audio/wav"
             
         except Exception as e:
             logger.error(f"Error generating speech with Kokoro: {str(e)}")
@@ -276,27 +701,44 @@ class TTSFactory:
     """Factory class for creating TTS instances"""
     
     _instances: Dict[str, BaseTTS] = {}
+    # 加载模型耗时数秒且占用大量显存，避免并发请求重复加载
+    _lock = threading.Lock()
     
     @classmethod
     def get_tts(cls, model_name: str = "kokoro") -> BaseTTS:
         """Get TTS instance based on model name"""
-        if model_name not in cls._instances:
-            if model_name == "kokoro":
-                tts = KokoroTTSWrapper()
-            elif model_name == "index-tts":
-                tts = IndexTTSWrapper()
-            elif model_name == "soulx":
-                tts = SoulXTTSWrapper()
-            else:
-                raise ValueError(
-                    f"Unknown TTS model: {model_name}. "
-                    f"Supported models: kokoro, index-tts, soulx"
-                )
-            
-            tts.load_model()
-            cls._instances[model_name] = tts
+        tts = cls._instances.get(model_name)
+        if tts is not None:
+            return tts
+        
+        with cls._lock:
+            if model_name not in cls._instances:
+                if model_name == "kokoro":
+                    tts = KokoroTTSWrapper()
+                elif model_name == "index-tts":
+                    tts = IndexTTSWrapper()
+                elif model_name == "soulx":
+                    tts = SoulXTTSWrapper()
+                else:
+                    raise ValueError(
+                        f"Unknown TTS model: {model_name}. "
+                        f"Supported models: kokoro, index-tts, soulx"
+                    )
+                
+                tts.load_model()
+                if config.TTS_WARMUP:
+                    tts.warmup()
+                if config.TTS_CACHE_SIZE > 0:
+                    tts.speech_cache = TTSCache(config.TTS_CACHE_SIZE)
+                cls._instances[model_name] = tts
         
         return cls._instances[model_name]
+    
+    @classmethod
+    def preload(cls, models: List[str]):
+        """Load (and warm up) the given TTS models ahead of the first request"""
+        for model_name in models:
+            cls.get_tts(model_name)
 
 class IndexTTSWrapper(BaseTTS):
     """IndexTTS implementation wrapper to match BaseTTS interface"""
@@ -304,6 +746,9 @@ class IndexTTSWrapper(BaseTTS):
     def __init__(self):
         self.model = None
         self._sampling_rate = 24000
+        # 音色 -> 参考音频绝对路径，在 load_model 时解析一次
+        self._resolved_prompts: Dict[str, str] = {}
+        self._default_prompt = os.path.join(_MODULE_DIR, "example", "voice_12.wav")
         # Import IndexTTS modules on initialization
         try:
             IndexTTS, IndexTTSParam, IndexTTSConfig = _import_index_tts()
@@ -325,11 +770,77 @@ class IndexTTSWrapper(BaseTTS):
             model_path=config.INDEX_TTS_MODEL_PATH,
             device=config.DEVICE,
             sampling_rate=self._sampling_rate,
-            hf_cache_dir=hf_cache_dir
+            hf_cache_dir=hf_cache_dir,
+            precision=config.INDEX_TTS_PRECISION,
+            compile=config.INDEX_TTS_COMPILE,
+            accel=config.INDEX_TTS_ACCEL
         )
         self.model = self.IndexTTS(cfg)
         logger.info("IndexTTS model loaded successfully")
+        self._resolved_prompts = _resolve_voice_prompts("index-tts")
+        if config.INDEX_TTS_PRELOAD_VOICES:
+            self.model.preload_voices(list(dict.fromkeys(self._resolved_prompts.values())))
+    
+    def _build_param(
+        self,
+        text: str,
+        voice: str,
+        instructions: Optional[str],
+        reference_audio: Optional[str],
+        reference_text: Optional[str],
+        dialect: Optional[str]
+    ):
+        """解析参考音频与情感文本，构建 IndexTTSParam"""
+        # 处理方言标记：移除方言标记（IndexTTS 不支持方言语音生成）
+        # 但保留文本内容以便后续处理
+        processed_text = remove_dialect_tag(text)
+        if processed_text != text:
+            logger.info(f"Removed dialect tag from text (IndexTTS doesn't support dialect)")
+        
+        # For IndexTTS, we need to provide the required parameters
+        # Use reference_audio if provided, otherwise get from config
+        if reference_audio and os.path.exists(reference_audio):
+            spk_audio_prompt = reference_audio
+            logger.info(f"Using custom reference audio: {spk_audio_prompt}")
+        else:
+            # 使用 load_model 时解析好的音色路径，未配置或文件缺失的音色使用默认参考音频
+            spk_audio_prompt = self._resolved_prompts.get(voice, self._default_prompt)
+        
+        # Use instructions parameter as emo_text if provided
+        emo_text = instructions if instructions else None
+        use_emo_text = instructions is not None
+        
+        if reference_text:
+            logger.info(f"Reference text provided: {reference_text[:50]}... (not used by IndexTTS)")
+        
+        if dialect:
+            logger.warning(f"Dialect '{dialect}' specified but IndexTTS doesn't support dialect generation. Using standard Chinese.")
+        
+        return self.IndexTTSParam(
+            text=processed_text,
+            spk_audio_prompt=spk_audio_prompt,
+            emo_text=emo_text,
+            use_emo_text=use_emo_text,
+            emo_audio_prompt=None,
+            output_path=None,
+            verbose=False
+        )
+    
+    def generate_speech_segments(
+        self,
+        text: str,
+        voice: str,
+        instructions: Optional[str] = None,
+        reference_audio: Optional[str] = None,
+        reference_text: Optional[str] = None,
+        speed: Optional[float] = 1.0,
+        dialect: Optional[str] = None,
+        dialect_prompt: Optional[str] = None
+    ) -> Iterator[np.ndarray]:
+        param = self._build_param(text, voice, instructions, reference_audio, reference_text, dialect)
+        yield self.model.generate_speech(param=param)
     
+    @cache_speech
     def generate_speech(
         self,
         text: str,
@@ -343,74 +854,66 @@ class IndexTTSWrapper(BaseTTS):
         dialect_prompt: Optional[str] = None  # 方言提示文本（IndexTTS 不支持）
     ) -> Tuple[bytes, str]:
         try:
-            # 处理方言标记：移除方言标记（IndexTTS 不支持方言语音生成）
-            # 但保留文本内容以便后续处理
-            try:
-                from dialect_utils import remove_dialect_tag
-                processed_text = remove_dialect_tag(text)
-                if processed_text != text:
-                    logger.info(f"Removed dialect tag from text (IndexTTS doesn't support dialect)")
-            except ImportError:
-                processed_text = text
-            
-            # For IndexTTS, we need to provide the required parameters
-            # Use reference_audio if provided, otherwise get from config
-            if reference_audio and os.path.exists(reference_audio):
-                spk_audio_prompt = reference_audio
-                logger.info(f"Using custom reference audio: {spk_audio_prompt}")
-            else:
-                # Get the voice prompt file path from config
-                voice_prompt_file = config.VOICE_MAPPINGS.get("index-tts", {}).get(voice, "example/voice_12.wav")
-                
-                # Resolve the full path relative to the current directory
-                current_dir = os.path.dirname(os.path.abspath(__file__))
-                spk_audio_prompt = os.path.join(current_dir, voice_prompt_file)
-                
-                # Check if the voice prompt file exists
-                if not os.path.exists(spk_audio_prompt):
-                    logger.warning(f"Voice prompt file not found: {spk_audio_prompt}, using default")
-                    spk_audio_prompt = os.path.join(current_dir, "example", "voice_12.wav")
-            
-            # Use instructions parameter as emo_text if provided
-            emo_text = instructions if instructions else None
-            use_emo_text = instructions is not None
-            
-            if reference_text:
-                logger.info(f"Reference text provided: {reference_text[:50]}... (not used by IndexTTS)")
-            
-            if dialect:
-                logger.warning(f"Dialect '{dialect}' specified but IndexTTS doesn't support dialect generation. Using standard Chinese.")
+            param = self._build_param(text, voice, instructions, reference_audio, reference_text, dialect)
             
             st = time.time()
-            audio_array = self.model.generate_speech(
-                param=self.IndexTTSParam(
-                    text=processed_text,
-                    spk_audio_prompt=spk_audio_prompt,
-                    emo_text=emo_text,
-                    use_emo_text=use_emo_text,
-                    emo_audio_prompt=None,
-                    output_path=None,
-                    verbose=False
-                )
-            )
+            audio_array = self.model.generate_speech(param=param)
             end = time.time()
             logger.info(f"Inference time: {end-st} s")
             
-            # 转换为字节
-            buffer = io.BytesIO()
-            scipy.io.wavfile.write(buffer, rate=self.sampling_rate, data=audio_array)
-            buffer.seek(0)
-            wav_data = buffer.getvalue()
-            
-            # 转换为目标格式
+            # 非 WAV 格式直接由采样数组编码，不经过中间 WAV
             if output_format != "wav":
-                return AudioConverter.convert_format(wav_data, output_format, self.sampling_rate)
+                return AudioConverter.convert_from_pcm(audio_array, output_format, self.sampling_rate)
             
-            return wav_data, "audio/wav"
+            return AudioConverter.to_wav(audio_array, self.sampling_rate, inplace=True), "audio/wav"
         except Exception as e:
             logger.error(f"Error generating speech with IndexTTS: {str(e)}")
             raise
     
+    def generate_speech_batch(self, items: List[Dict]) -> List[Tuple[bytes, str]]:
+        """提交到 IndexTTS 的批量接口：按参考音频分组推理，并与下一条的文本预处理重叠；
+        与 BaseTTS 一样先查结果缓存，只把未命中的条目交给模型"""
+        results: List[Optional[Tuple[bytes, str]]] = [None] * len(items)
+        keys: Dict[int, str] = {}
+        misses: List[int] = []
+        for i, item in enumerate(items):
+            if self.speech_cache is not None:
+                kwargs = dict(item)
+                output_format = kwargs.pop("output_format", "mp3")
+                keys[i] = self.speech_cache_key(output_format=output_format, **kwargs)
+                results[i] = self.speech_cache.get(keys[i])
+                if results[i] is not None:
+                    continue
+            misses.append(i)
+        if not misses:
+            return results
+        
+        params = [
+            self._build_param(
+                items[i]["text"],
+                items[i]["voice"],
+                items[i].get("instructions"),
+                items[i].get("reference_audio"),
+                items[i].get("reference_text"),
+                items[i].get("dialect")
+            )
+            for i in misses
+        ]
+        st = time.time()
+        audio_arrays = self.model.generate_speech_batch(params)
+        logger.info(f"Batch inference time for {len(misses)} of {len(items)} items: {time.time()-st} s")
+        
+        # 各条音频的 ffmpeg 编码并发进行
+        encoded = AudioConverter.convert_from_pcm_many(
+            [(audio_array, items[i].get("output_format", "mp3")) for i, audio_array in zip(misses, audio_arrays)],
+            self.sampling_rate
+        )
+        for i, result in zip(misses, encoded):
+            results[i] = result
+            if i in keys:
+                self.speech_cache.put(keys[i], result)
+        return results
+    
     @property
     def sampling_rate(self) -> int:
         return self._sampling_rate
@@ -421,6 +924,9 @@ class SoulXTTSWrapper(BaseTTS):
     def __init__(self):
         self.model = None
         self._sampling_rate = 24000
+        # 音色 -> 参考音频绝对路径，在 load_model 时解析一次
+        self._resolved_prompts: Dict[str, str] = {}
+        self._default_prompt: Optional[str] = None
         # Import SoulX TTS modules on initialization
         try:
             SoulXTTS, SoulXTTSConfig, SoulXTTSParam = _import_soulx_tts()
@@ -454,11 +960,79 @@ class SoulXTTSWrapper(BaseTTS):
             device=device,
             sampling_rate=self._sampling_rate,
             llm_engine=llm_engine,
-            fp16_flow=fp16_flow
+            fp16_flow=fp16_flow,
+            compile=config.SOULX_COMPILE
         )
         self.model = self.SoulXTTS(cfg)
         logger.info("SoulX TTS model loaded successfully")
+        self._resolved_prompts = _resolve_voice_prompts("soulx")
+        fallback_prompt = os.path.join(_MODULE_DIR, "example", "voice_01.wav")
+        self._default_prompt = self._resolved_prompts.get("default") or (
+            fallback_prompt if os.path.isfile(fallback_prompt) else None
+        )
+        if config.SOULX_PRELOAD_VOICES:
+            self.model.preload_voices(list(dict.fromkeys(self._resolved_prompts.values())))
     
+    def _build_param(
+        self,
+        text: str,
+        voice: str,
+        instructions: Optional[str],
+        reference_audio: Optional[str],
+        reference_text: Optional[str],
+        dialect: Optional[str],
+        dialect_prompt: Optional[str]
+    ):
+        """解析参考音频与参考文本，构建 SoulXTTSParam"""
+        # For SoulX TTS, we need to provide the required parameters
+        # Use reference_audio if provided, otherwise get from config
+        if reference_audio and os.path.exists(reference_audio):
+            spk_audio_prompt = reference_audio
+            logger.info(f"Using custom reference audio: {spk_audio_prompt}")
+        else:
+            # 使用 load_model 时解析好的音色路径，未配置或文件缺失的音色使用默认参考音频
+            spk_audio_prompt = self._resolved_prompts.get(voice, self._default_prompt)
+            if spk_audio_prompt is None:
+                raise FileNotFoundError(
+                    f"Reference audio file not found for voice '{voice}'. "
+                    "Please provide a valid reference audio file path or use reference_audio parameter."
+                )
+        
+        # Use reference_text if provided, otherwise get from config
+        spk_text_prompt = reference_text or getattr(config, 'SOULX_SPK_TEXT_PROMPT', None)
+        
+        if instructions:
+            logger.info(f"Instructions parameter provided: {instructions} (not used by SoulX)")
+        
+        # Log dialect usage if provided
+        if dialect:
+            logger.info(f"Using dialect: {dialect}")
+        
+        return self.SoulXTTSParam(
+            text=text,
+            spk_audio_prompt=spk_audio_prompt,
+            spk_text_prompt=spk_text_prompt,
+            output_path=None,
+            verbose=False,
+            dialect=dialect,
+            dialect_prompt=dialect_prompt
+        )
+    
+    def generate_speech_segments(
+        self,
+        text: str,
+        voice: str,
+        instructions: Optional[str] = None,
+        reference_audio: Optional[str] = None,
+        reference_text: Optional[str] = None,
+        speed: Optional[float] = 1.0,
+        dialect: Optional[str] = None,
+        dialect_prompt: Optional[str] = None
+    ) -> Iterator[np.ndarray]:
+        param = self._build_param(text, voice, instructions, reference_audio, reference_text, dialect, dialect_prompt)
+        yield from self.model.generate_speech_stream(param)
+    
+    @cache_speech
     def generate_speech(
         self,
         text: str,
@@ -472,68 +1046,18 @@ class SoulXTTSWrapper(BaseTTS):
         dialect_prompt: Optional[str] = None  # 方言提示文本（可选）
     ) -> Tuple[bytes, str]:
         try:
-            # For SoulX TTS, we need to provide the required parameters
-            # Use reference_audio if provided, otherwise get from config
-            if reference_audio and os.path.exists(reference_audio):
-                spk_audio_prompt = reference_audio
-                logger.info(f"Using custom reference audio: {spk_audio_prompt}")
-            else:
-                # Get the voice prompt file path from config or use default
-                voice_mappings = config.VOICE_MAPPINGS.get("soulx", {})
-                voice_prompt_file = voice_mappings.get(voice, voice_mappings.get("default", "example/voice_01.wav"))
-                
-                # Resolve the full path relative to the current directory
-                current_dir = os.path.dirname(os.path.abspath(__file__))
-                spk_audio_prompt = os.path.join(current_dir, voice_prompt_file)
-                
-                # Check if the voice prompt file exists
-                if not os.path.exists(spk_audio_prompt):
-                    logger.warning(f"Voice prompt file not found: {spk_audio_prompt}, using default")
-                    default_prompt = os.path.join(current_dir, "example", "voice_01.wav")
-                    if os.path.exists(default_prompt):
-                        spk_audio_prompt = default_prompt
-                    else:
-                        raise FileNotFoundError(
-                            f"Reference audio file not found: {spk_audio_prompt}. "
-                            "Please provide a valid reference audio file path or use reference_audio parameter."
-                        )
-            
-            # Use reference_text if provided, otherwise get from config
-            spk_text_prompt = reference_text or getattr(config, 'SOULX_SPK_TEXT_PROMPT', None)
-            
-            if instructions:
-                logger.info(f"Instructions parameter provided: {instructions} (not used by SoulX)")
-            
-            # Log dialect usage if provided
-            if dialect:
-                logger.info(f"Using dialect: {dialect}")
+            param = self._build_param(text, voice, instructions, reference_audio, reference_text, dialect, dialect_prompt)
             
             st = time.time()
-            audio_array = self.model.generate_speech(
-                param=self.SoulXTTSParam(
-                    text=text,
-                    spk_audio_prompt=spk_audio_prompt,
-                    spk_text_prompt=spk_text_prompt,
-                    output_path=None,
-                    verbose=False,
-                    dialect=dialect,
-                    dialect_prompt=dialect_prompt
-                )
-            )
+            audio_array = self.model.generate_speech(param=param)
             end = time.time()
             logger.info(f"Inference time: {end-st} s")
             
-            # 转换为字节
-            buffer = io.BytesIO()
-            scipy.io.wavfile.write(buffer, rate=self.sampling_rate, data=audio_array)
-            buffer.seek(0)
-            wav_data = buffer.getvalue()
-            
-            # 转换为目标格式
+            # 非 WAV 格式直接由采样数组编码，不经过中间 WAV
             if output_format != "wav":
-                return AudioConverter.convert_format(wav_data, output_format, self.sampling_rate)
+                return AudioConverter.convert_from_pcm(audio_array, output_format, self.sampling_rate)
             
-            return wav_data, "audio/wav"
+            return AudioConverter.to_wav(audio_array, self.sampling_rate, inplace=True), "audio/wav"
         except Exception as e:
             logger.error(f"Error generating speech with SoulX: {str(e)}")
             raise
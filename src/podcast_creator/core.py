@@ -1,7 +1,9 @@
+import asyncio
 import re
+import shutil
 import uuid
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Tuple, Union
+from typing import Any, AsyncIterator, Dict, List, Literal, Tuple, Union
 
 from langchain_core.output_parsers.pydantic import PydanticOutputParser
 from loguru import logger
@@ -120,6 +122,11 @@ class Transcript(BaseModel):
         }
 
 
+class QAJudgement(BaseModel):
+    needs: bool = Field(..., description="Whether the content needs question answering or supplementation")
+    answer: str = Field(default="", description="Answer or supplement, empty when not needed")
+
+
 def create_validated_transcript_parser(valid_speaker_names: List[str], valid_emotion_names: List[str], valid_speed_names: List[str]):
     """
     Create a transcript parser that validates speaker names against a list of valid names
@@ -180,6 +187,7 @@ def create_validated_transcript_parser(valid_speaker_names: List[str], valid_emo
 
 outline_parser = PydanticOutputParser(pydantic_object=Outline)
 transcript_parser = PydanticOutputParser(pydantic_object=Transcript)
+qa_judgement_parser = PydanticOutputParser(pydantic_object=QAJudgement)
 
 
 def get_outline_prompter():
@@ -321,3 +329,92 @@ async def combine_audio_files(
                 clip_obj.close()
             except Exception as close_exc:
                 logger.debug(f"Error closing source clip: {close_exc}")
+
+
+def _final_output_path(final_filename: str, final_output_dir: Union[Path, str]) -> Path:
+    """Build the output path for a combined episode, ensuring an .mp3 extension."""
+    output_dir = Path(final_output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_filename = Path(final_filename).name
+    if not output_filename.endswith(".mp3"):
+        output_filename += ".mp3"
+    return output_dir / output_filename
+
+
+# PCM layout shared by the per-clip decoders and the final encoder; matches the
+# 44.1 kHz stereo 16-bit audio that moviepy produces in combine_audio_files.
+_STREAM_SAMPLE_RATE = "44100"
+_STREAM_CHANNELS = "2"
+
+
+async def _decode_to_pcm(ffmpeg: str, file_path: Path) -> bytes:
+    """Decode one clip to raw s16le PCM, letting ffmpeg drop its ID3/Xing headers and encoder padding."""
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, "-loglevel", "error", "-i", str(file_path),
+        "-f", "s16le", "-ac", _STREAM_CHANNELS, "-ar", _STREAM_SAMPLE_RATE, "pipe:1",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    pcm, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"failed to decode {file_path}: {stderr.decode(errors='replace').strip()}")
+    return pcm
+
+
+async def combine_audio_stream(
+    audio_paths: AsyncIterator[Path], final_filename: str, final_output_dir: Union[Path, str]
+):
+    """
+    Combines MP3 clips into a single MP3 file while the clips are still being produced.
+    Each clip is decoded on its own to PCM (so per-file headers and encoder padding never
+    reach the output) and fed to a single ffmpeg encoder as soon as it, and every clip
+    before it, is ready.
+    audio_paths must yield clip paths in playback order.
+    Output: {"combined_audio_path": "output/audio/my_podcast.mp3"}, or an "ERROR: ..." path
+    when ffmpeg is unavailable or fails, in which case combine_audio_files can be used instead.
+    """
+    logger.info("[Core Function] combine_audio_stream called.")
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        logger.warning("combine_audio_stream: ffmpeg not found.")
+        return {"combined_audio_path": "ERROR: ffmpeg not found"}
+
+    output_path = _final_output_path(final_filename, final_output_dir)
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, "-y", "-loglevel", "error",
+        "-f", "s16le", "-ac", _STREAM_CHANNELS, "-ar", _STREAM_SAMPLE_RATE, "-i", "pipe:0",
+        "-c:a", "libmp3lame", str(output_path),
+        stdin=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    segments_count = 0
+    try:
+        async for file_path in audio_paths:
+            try:
+                pcm = await _decode_to_pcm(ffmpeg, file_path)
+            except RuntimeError as e:
+                logger.error(f"combine_audio_stream: {e}")
+                return {"combined_audio_path": f"ERROR: {e}"}
+            process.stdin.write(pcm)
+            await process.stdin.drain()
+            segments_count += 1
+        process.stdin.close()
+        _, stderr = await process.communicate()
+    except (BrokenPipeError, ConnectionResetError):
+        # ffmpeg exited early; its stderr explains why
+        _, stderr = await process.communicate()
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+    if process.returncode != 0:
+        error = stderr.decode(errors="replace").strip()
+        logger.error(f"combine_audio_stream: ffmpeg failed: {error}")
+        return {"combined_audio_path": f"ERROR: ffmpeg failed - {error}"}
+
+    logger.info(f"Successfully combined audio to: {output_path.resolve()}")
+    return {
+        "combined_audio_path": str(output_path.resolve()),
+        "original_segments_count": segments_count,
+    }
@@ -1,33 +1,50 @@
 import json
+from functools import cached_property, lru_cache
 from pathlib import Path
 from typing import Dict, List, Union
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator
 from loguru import logger
 
+try:
+    import orjson
+    SUPPORT_ORJSON = True
+except ImportError:
+    SUPPORT_ORJSON = False
+
 class Emotion(BaseModel):
     """Single emotion configuration for voice generation."""
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
     name: str = Field(..., description="Name of the emotion/speaking style")
     text: List[str] = Field(..., description="Voice characteristics and delivery instructions")
     category: List[str] = Field(default=[], description="Category of the emotion")
     description: str = Field(default="", description="Description of the emotion")
 
+    @cached_property
+    def voice_instructions(self) -> str:
+        """Combined voice instructions, joined once per emotion."""
+        return "\n".join(self.text)
+
     def get_voice_instructions(self) -> str:
         """Get combined voice instructions as a single string."""
-        return "\n".join(self.text)
+        return self.voice_instructions
 
 
 class EmotionConfig(BaseModel):
     """Collection of emotion configurations."""
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
     emotions: Dict[str, Emotion] = Field(..., description="Dictionary of emotion configurations")
     categories: List[str] = Field(..., description="List of available emotion categories")
 
     def get_emotion(self, name: str) -> Emotion:
         """Get emotion configuration by name."""
-        if name not in self.emotions:
+        emotion = self.emotions.get(name)
+        if emotion is None:
             available = self.get_emotions_names()
             raise ValueError(f"Emotion '{name}' not found. Available emotions: {available}")
-        return self.emotions[name]
+        return emotion
 
     def get_emotions_names(self) -> List[str]:
         """Get list of all available emotion names."""
@@ -43,25 +60,14 @@ class EmotionConfig(BaseModel):
 
     def load_from_json(self, json_path: Union[str, Path]) -> "EmotionConfig":
         """Load emotion configuration from JSON file."""
-        import json
-        
-        json_path = Path(json_path)
-        if not json_path.exists():
+        json_path = Path(str(json_path))
+        try:
+            mtime = json_path.stat().st_mtime
+        except FileNotFoundError:
             raise FileNotFoundError(f"Emotions config file not found: {json_path}")
         
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # If categories are not in the file, derive them from emotions
-        if "categories" not in data:
-            categories = set()
-            if "emotions" in data:
-                for emotion_data in data["emotions"].values():
-                    if category := emotion_data.get("category"):
-                        categories.add(category)
-            data["categories"] = sorted(list(categories))
-
-        return EmotionConfig(**data)
+        # Parsed configs are cached per (path, mtime); editing the file invalidates the entry
+        return _load_emotion_config_cached(str(json_path), mtime)
 
     @classmethod
     def from_json_file(cls, json_path: Union[str, Path]) -> "EmotionConfig":
@@ -70,6 +76,29 @@ class EmotionConfig(BaseModel):
         return config.load_from_json(json_path)
 
 
+# Validates the whole emotions mapping in one pass
+_EMOTIONS_ADAPTER = TypeAdapter(Dict[str, Emotion])
+
+
+@lru_cache(maxsize=8)
+def _load_emotion_config_cached(path: str, mtime: float) -> EmotionConfig:
+    """Read, parse and validate an emotions config file."""
+    raw = Path(path).read_bytes()
+    data = orjson.loads(raw) if SUPPORT_ORJSON else json.loads(raw)
+    
+    # If categories are not in the file, derive them from emotions
+    if "categories" not in data:
+        categories = set()
+        if "emotions" in data:
+            for emotion_data in data["emotions"].values():
+                if category := emotion_data.get("category"):
+                    categories.add(category)
+        data["categories"] = sorted(list(categories))
+
+    emotions = _EMOTIONS_ADAPTER.validate_python(data["emotions"])
+    return EmotionConfig.model_construct(emotions=emotions, categories=list(data["categories"]))
+
+
 def load_emotions_config(project_root: Path = None) -> "EmotionConfig":
     """
     Load the emotions configuration from a file.
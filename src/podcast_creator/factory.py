@@ -2,9 +2,13 @@
 自定义 AI 工厂，支持自定义 provider
 """
 import importlib
-from typing import Dict, List, Type
+from importlib.metadata import entry_points
+from typing import Dict, List, Tuple, Type
 from esperanto.factory import AIFactory
 
+# 第三方包通过 entry_points 注册 provider 的分组前缀，如 "podica.text_to_speech"
+ENTRY_POINT_GROUP_PREFIX = "podica."
+
 class CustomAIFactory(AIFactory):
     """扩展的 AI 工厂，支持自定义 provider"""
     _custom_providers = {
@@ -31,9 +35,32 @@ class CustomAIFactory(AIFactory):
         },
         # 可以添加其他服务类型
     }
+    # 已解析的 provider 类，避免每次创建实例都重新导入
+    _class_cache: Dict[Tuple[str, str], Type] = {}
+    _entry_points_loaded = False
+    
+    @classmethod
+    def _load_entry_points(cls):
+        """合并已安装包通过 entry_points 注册的 provider（只执行一次，内置 provider 优先）"""
+        if cls._entry_points_loaded:
+            return
+        cls._entry_points_loaded = True
+        eps = entry_points()
+        for service_type in cls._custom_providers:
+            group = ENTRY_POINT_GROUP_PREFIX + service_type
+            # Python 3.10+ 使用 select，旧版本 entry_points() 返回字典
+            group_eps = eps.select(group=group) if hasattr(eps, "select") else eps.get(group, [])
+            for ep in group_eps:
+                cls._custom_providers[service_type].setdefault(ep.name, ep.value)
     
     @classmethod
     def _import_provider_class(cls, service_type: str, provider: str) -> Type:
+        key = (service_type, provider)
+        provider_class = cls._class_cache.get(key)
+        if provider_class is not None:
+            return provider_class
+        
+        cls._load_entry_points()
         # 首先检查自定义 provider
         if (service_type in cls._custom_providers and 
             provider in cls._custom_providers[service_type]):
@@ -43,17 +70,21 @@ class CustomAIFactory(AIFactory):
             
             try:
                 module = importlib.import_module(module_name)
-                return getattr(module, class_name)
+                provider_class = getattr(module, class_name)
             except ImportError as e:
                 raise ImportError(f"Failed to import custom provider {provider}: {e}")
+        else:
+            # 回退到原始工厂逻辑
+            provider_class = super()._import_provider_class(service_type, provider)
         
-        # 回退到原始工厂逻辑
-        return super()._import_provider_class(service_type, provider)
+        cls._class_cache[key] = provider_class
+        return provider_class
     
     @classmethod
     def get_available_providers(cls) -> Dict[str, List[str]]:
         """获取所有可用的 provider（包括自定义的）"""
         base_providers = super().get_available_providers()
+        cls._load_entry_points()
         
         # 合并自定义 provider
         for service_type, providers in cls._custom_providers.items():
@@ -1,27 +1,141 @@
 import asyncio
+import base64
+import hashlib
 import os
+import random
 import re
+import shutil
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar, Union
 
 # from esperanto import AIFactory
 from .factory import CustomAIFactory as AIFactory
 from langchain_core.runnables import RunnableConfig
 from loguru import logger
 
+try:
+    from aiolimiter import AsyncLimiter
+    SUPPORT_AIOLIMITER = True
+except ImportError:
+    SUPPORT_AIOLIMITER = False
+
 
 from .core import (
     clean_thinking_content,
     combine_audio_files,
+    combine_audio_stream,
     create_validated_transcript_parser,
     get_outline_prompter,
     get_transcript_prompter,
     outline_parser,
+    qa_judgement_parser,
+    QAJudgement,
 )
 from .emotions import EmotionConfig
 from .speed import SpeedConfig
 from .state import PodcastState
 
+T = TypeVar("T")
+
+
+async def _retry(
+    coro_factory: Callable[[], Awaitable[T]],
+    attempts: int,
+    description: str,
+    base: float = 0.5,
+    cap: float = 30.0,
+) -> T:
+    """运行 coro_factory() 直到成功，最多 attempts 次；失败后按指数退避加随机抖动等待再重试，
+    避免并发请求在服务商故障时同步重试。最后一次失败时抛出原异常"""
+    for attempt in range(attempts):
+        try:
+            return await coro_factory()
+        except Exception as e:
+            logger.warning(f"{description} failed (attempt {attempt + 1}/{attempts}): {e}")
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+# 问句特征：问号，或疑问词 / 句末语气词
+_Q_RE = re.compile(r"[？?]|什么|怎么|为什么|如何|吗$|呢$")
+
+
+# 判断并回答的提示词（JSON 输出）
+_JUDGE_QA_PROMPT = """
+请判断以下内容是否需要问答处理或信息补充。如果内容包含以下任一情况，则需要：
+1. 包含明确的问题（如疑问句、问号结尾等）
+2. 要求讨论或解释某个话题
+3. 内容不完整，需要更多背景信息才能理解
+4. 包含需要最新信息更新的内容（如近期事件、人物状态等）
+
+如果需要，请提供详细、准确、全面的回答。如果内容包含多个问题，请逐一回答。
+如果内容是关于某个话题的讨论要求，请提供该话题的背景信息、关键点和讨论方向。
+如果内容涉及近期事件或人物状态，请提供最新相关信息。
+
+内容：
+{content}
+
+只输出 JSON：{{"needs": true 或 false, "answer": "回答内容，不需要时为空字符串"}}
+"""
+
+# 摘要提示词
+_SUMMARY_PROMPT = """
+请根据以下播客简介，对提供的内容进行摘要处理，提取与简介主题最相关的信息。
+
+播客简介：
+{briefing}
+
+内容：
+{content}
+
+请生成一个精炼的摘要，保留与播客主题最相关的关键信息，摘要长度最多不超过2000字。
+摘要应该保持原文的核心观点和关键事实，同时与播客简介中描述的主题高度相关。
+"""
+
+# 问答提示词
+_QA_PROMPT = """
+你是一个专业的问答助手。请对以下内容进行回答和补充：
+
+{content}
+
+请提供详细、准确、全面的回答。如果内容包含多个问题，请逐一回答。
+如果内容是关于某个话题的讨论要求，请提供该话题的背景信息、关键点和讨论方向。
+如果内容涉及近期事件或人物状态，请提供最新相关信息。
+"""
+
+
+def _rule_needs_qa(text: str) -> Optional[bool]:
+    """用规则判断短文本是否需要问答处理：含问号返回 True，无任何问句特征返回 False，
+    只有疑问词而无问号时无法确定，返回 None 交给大模型判断"""
+    stripped = text.strip()
+    if "?" in stripped or "？" in stripped:
+        return True
+    if not _Q_RE.search(stripped):
+        return False
+    return None
+
+
+async def _judge_and_answer(model, prompt_text: str) -> QAJudgement:
+    """一次调用同时完成"是否需要问答"的判断和回答；解析失败时按需要问答处理且不带回答，
+    由调用方再单独发起问答"""
+    response = await model.ainvoke(prompt_text)
+    try:
+        return qa_judgement_parser.invoke(clean_thinking_content(response.content))
+    except Exception as e:
+        logger.warning(f"问答判断结果解析失败，改为单独问答：{e}")
+        return QAJudgement(needs=True)
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    """把 src 硬链接到 dst（已存在则替换），跨文件系统等不支持硬链接时退回复制"""
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
 
 async def content_transform_node(state: PodcastState, config: RunnableConfig) -> Dict:
     """处理内容中的问答，如果内容包含问题则调用大模型进行回答
@@ -44,33 +158,12 @@ async def content_transform_node(state: PodcastState, config: RunnableConfig) ->
         config={"max_tokens": 2000},
     ).to_langchain()
     
-    # 构建判断提示词
-    judge_prompt = """
-    请判断以下内容是否需要问答处理或信息补充。如果内容包含以下任一情况，请回答"需要"，否则回答"不需要"：
-    1. 包含明确的问题（如疑问句、问号结尾等）
-    2. 要求讨论或解释某个话题
-    3. 内容不完整，需要更多背景信息才能理解
-    4. 包含需要最新信息更新的内容（如近期事件、人物状态等）
-    
-    内容：
-    {content}
-    
-    你的判断（只回答"需要"或"不需要"）：
-    """
-    
-    # 构建摘要提示词
-    summary_prompt = """
-    请根据以下播客简介，对提供的内容进行摘要处理，提取与简介主题最相关的信息。
-    
-    播客简介：
-    {briefing}
-    
-    内容：
-    {content}
-    
-    请生成一个精炼的摘要，保留与播客主题最相关的关键信息，摘要长度最多不超过2000字。
-    摘要应该保持原文的核心观点和关键事实，同时与播客简介中描述的主题高度相关。
-    """
+    # 判断并回答使用 JSON 输出，一次调用同时得到判断结果和回答
+    judge_qa_model = AIFactory.create_language(
+        qa_provider,
+        qa_model_name,
+        config={"max_tokens": 2000, "structured": {"type": "json"}},
+    ).to_langchain()
     
     # 处理内容
     if isinstance(content, str):
@@ -79,7 +172,7 @@ async def content_transform_node(state: PodcastState, config: RunnableConfig) ->
             logger.info(f"内容长度为{len(content.strip())}，需要进行摘要处理")
             
             # 构建摘要提示词
-            prompt_text = summary_prompt.format(briefing=briefing, content=content)
+            prompt_text = _SUMMARY_PROMPT.format(briefing=briefing, content=content)
             logger.info("调用大模型进行摘要处理")
             summary_response = await qa_model.ainvoke(prompt_text)
             processed_content = summary_response
@@ -91,78 +184,78 @@ async def content_transform_node(state: PodcastState, config: RunnableConfig) ->
             print(f"内容长度为{len(content.strip())}，不需要问答处理")
             return {"content": processed_content}
         
-        judge_text = judge_prompt.format(content=content)
-        judge_response = await qa_model.ainvoke(judge_text)
+        needs_qa = _rule_needs_qa(content)
+        answer = ""
+        if needs_qa is None:
+            judgement = await _judge_and_answer(judge_qa_model, _JUDGE_QA_PROMPT.format(content=content))
+            needs_qa, answer = judgement.needs, judgement.answer
+        else:
+            logger.info(f"根据问句特征直接判断，跳过大模型判断：{'需要' if needs_qa else '不需要'}")
         
-        if "需要" in judge_response.content:
-            logger.info("大模型判断内容需要问答处理")
-            
-            # 构建问答提示词
-            qa_prompt = """
-            你是一个专业的问答助手。请对以下内容进行回答和补充：
-            
-            {content}
+        if needs_qa and answer:
+            logger.info("大模型判断内容需要问答处理，已随判断一并回答")
+            processed_content = answer
+        elif needs_qa:
+            logger.info("判断内容需要问答处理")
             
-            请提供详细、准确、全面的回答。如果内容包含多个问题，请逐一回答。
-            如果内容是关于某个话题的讨论要求，请提供该话题的背景信息、关键点和讨论方向。
-            如果内容涉及近期事件或人物状态，请提供最新相关信息。
-            """
-            
-            prompt_text = qa_prompt.format(content=content)
+            prompt_text = _QA_PROMPT.format(content=content)
             logger.info(f"调用大模型进行问答处理，提示词：{prompt_text}")
             qa_response = await qa_model.ainvoke(prompt_text)
             processed_content = qa_response
         else:
-            logger.info("大模型判断内容不需要问答处理")
+            logger.info("判断内容不需要问答处理")
     
     elif isinstance(content, list):
-        processed_items = []
-        for item in content:
-            if isinstance(item, str):
-                # 判断是否需要摘要处理
-                if len(item.strip()) > 5000:
-                    logger.info(f"列表项长度为{len(item.strip())}，需要进行摘要处理")
-                    
-                    # 构建摘要提示词
-                    prompt_text = summary_prompt.format(briefing=briefing, content=item)
-                    logger.info("调用大模型进行摘要处理")
-                    summary_response = await qa_model.ainvoke(prompt_text)
-                    processed_items.append(summary_response)
-                    logger.info(f"摘要处理完成，摘要长度：{len(summary_response.content)}")
-                    continue
-                
-                # 判断是否需要问答处理
-                if len(item.strip()) >= 500:
-                    print(f"内容长度为{len(item.strip())}，不需要问答处理")
-                    processed_items.append(item)
-                    continue
-
-                judge_text = judge_prompt.format(content=item)
-                judge_response = await qa_model.ainvoke(judge_text)
+        # 各列表项相互独立，并发调用大模型，信号量限制同时进行的请求数
+        semaphore = asyncio.Semaphore(int(os.getenv("PODICA_QA_CONCURRENCY", "8")))
+
+        async def invoke(prompt_text: str):
+            async with semaphore:
+                return await qa_model.ainvoke(prompt_text)
+
+        async def process_item(item):
+            if not isinstance(item, str):
+                return item
+
+            # 判断是否需要摘要处理
+            if len(item.strip()) > 5000:
+                logger.info(f"列表项长度为{len(item.strip())}，需要进行摘要处理")
                 
-                if "需要" in judge_response.content:
-                    logger.info("大模型判断列表项需要问答处理")
-                    
-                    # 构建问答提示词
-                    qa_prompt = """
-                    你是一个专业的问答助手。请对以下内容进行回答和补充：
-                    
-                    {content}
-                    
-                    请提供详细、准确、全面的回答。如果内容包含多个问题，请逐一回答。
-                    如果内容是关于某个话题的讨论要求，请提供该话题的背景信息、关键点和讨论方向。
-                    如果内容涉及近期事件或人物状态，请提供最新相关信息。
-                    """
-                    
-                    prompt_text = qa_prompt.format(content=item)
-                    logger.info(f"调用大模型进行问答处理，提示词：{prompt_text}")
-                    qa_response = await qa_model.ainvoke(prompt_text)
-                    processed_items.append(qa_response)
-                else:
-                    logger.info("大模型判断列表项不需要问答处理")
-                    processed_items.append(item)
+                # 构建摘要提示词
+                prompt_text = _SUMMARY_PROMPT.format(briefing=briefing, content=item)
+                logger.info("调用大模型进行摘要处理")
+                summary_response = await invoke(prompt_text)
+                logger.info(f"摘要处理完成，摘要长度：{len(summary_response.content)}")
+                return summary_response
+            
+            # 判断是否需要问答处理
+            if len(item.strip()) >= 500:
+                print(f"内容长度为{len(item.strip())}，不需要问答处理")
+                return item
+
+            needs_qa = _rule_needs_qa(item)
+            if needs_qa is None:
+                async with semaphore:
+                    judgement = await _judge_and_answer(judge_qa_model, _JUDGE_QA_PROMPT.format(content=item))
+                if judgement.needs and judgement.answer:
+                    logger.info("大模型判断列表项需要问答处理，已随判断一并回答")
+                    return judgement.answer
+                needs_qa = judgement.needs
             else:
-                processed_items.append(item)
+                logger.info(f"根据问句特征直接判断列表项，跳过大模型判断：{'需要' if needs_qa else '不需要'}")
+            
+            if needs_qa:
+                logger.info("判断列表项需要问答处理")
+                
+                prompt_text = _QA_PROMPT.format(content=item)
+                logger.info(f"调用大模型进行问答处理，提示词：{prompt_text}")
+                return await invoke(prompt_text)
+
+            logger.info("判断列表项不需要问答处理")
+            return item
+
+        # gather 按输入顺序返回结果
+        processed_items = list(await asyncio.gather(*(process_item(item) for item in content)))
         processed_content = processed_items
     
     return {"content": processed_content}
@@ -200,18 +293,15 @@ async def generate_outline_node(state: PodcastState, config: RunnableConfig) ->
     )
     # print(f"outline_prompt_text:=========\n {outline_prompt_text}\n=================")
     # 重试三次，直到无异常返回
-    for attempt in range(3):
-        try:
-            outline_preview = await outline_model.ainvoke(outline_prompt_text)
-            outline_preview.content = clean_thinking_content(outline_preview.content)
-            outline_result = outline_parser.invoke(outline_preview.content)
-            break  # 成功则跳出循环
-        except Exception as e:
-            logger.warning(f"Outline 解析失败（第 {attempt + 1} 次）：{e}")
-            if attempt == 2:  # 最后一次仍失败，则抛出异常
-                raise RuntimeError(f"Outline 解析三次均失败 {e}") from e
-            # 短暂等待后重试
-            await asyncio.sleep(1)
+    async def attempt_outline():
+        outline_preview = await outline_model.ainvoke(outline_prompt_text)
+        outline_preview.content = clean_thinking_content(outline_preview.content)
+        return outline_parser.invoke(outline_preview.content)
+
+    try:
+        outline_result = await _retry(attempt_outline, 3, "Outline generation")
+    except Exception as e:
+        raise RuntimeError(f"Outline 解析三次均失败 {e}") from e
 
     logger.info(f"Generated outline with {len(outline_result.segments)} segments")
     # exit()
@@ -282,8 +372,14 @@ async def generate_transcript_node(state: PodcastState, config: RunnableConfig)
     except Exception as e:
         logger.warning(f"Failed to import TTS factory: {e}")
 
-    transcript = []
-    for i, segment in enumerate(outline.segments):
+    # Get dialect from state
+    dialect = state.get("dialect")
+    transcript_prompt = get_transcript_prompter()
+
+    # 各段之间不传递上下文，并发生成；信号量限制同时进行的请求数以遵守服务商限流
+    semaphore = asyncio.Semaphore(int(os.getenv("TRANSCRIPT_CONCURRENCY", "4")))
+
+    async def generate_segment(i: int, segment) -> List:
         logger.info(
             f"Generating transcript for segment {i + 1}/{len(outline.segments)}: {segment.name}"
         )
@@ -293,9 +389,6 @@ async def generate_transcript_node(state: PodcastState, config: RunnableConfig)
         is_middle = not is_first and not is_final
         turns = 2 if segment.size == "short" else 5 if segment.size == "medium" else 8
 
-        # Get dialect from state
-        dialect = state.get("dialect")
-        
         data = {
             "briefing": state["briefing"],
             "outline": outline,
@@ -319,24 +412,27 @@ async def generate_transcript_node(state: PodcastState, config: RunnableConfig)
             # "transcript": transcript,
         }
 
-        transcript_prompt = get_transcript_prompter()
         transcript_prompt_rendered = transcript_prompt.render(data)
         # print(f"transcript_prompt_rendered:=========\n {transcript_prompt_rendered}\n=================")
         # 重试三次，直到无异常返回
-        for attempt in range(3):
-            try:
+        async def attempt_segment():
+            async with semaphore:
                 transcript_preview = await transcript_model.ainvoke(transcript_prompt_rendered)
-                transcript_preview.content = clean_thinking_content(transcript_preview.content)
-                result = validated_transcript_parser.invoke(transcript_preview.content)
-                logger.info(f"Generated {len(result.transcript)} dialogue segments, {result.transcript}")
-                transcript.extend(result.transcript)
-                break  # 成功则跳出循环
-            except Exception as e:
-                logger.warning(f"Transcript 解析失败（第 {attempt + 1} 次）：{e}")
-                if attempt == 2:  # 最后一次仍失败，则抛出异常
-                    raise RuntimeError("Transcript 解析三次均失败") from e
-                # 短暂等待后重试
-                await asyncio.sleep(1)
+            transcript_preview.content = clean_thinking_content(transcript_preview.content)
+            return validated_transcript_parser.invoke(transcript_preview.content)
+
+        try:
+            result = await _retry(attempt_segment, 3, f"Transcript generation for segment {i + 1}")
+        except Exception as e:
+            raise RuntimeError("Transcript 解析三次均失败") from e
+        logger.info(f"Generated {len(result.transcript)} dialogue segments, {result.transcript}")
+        return result.transcript
+
+    # gather 按段落顺序返回结果
+    segment_transcripts = await asyncio.gather(
+        *(generate_segment(i, segment) for i, segment in enumerate(outline.segments))
+    )
+    transcript = [dialogue for segment_transcript in segment_transcripts for dialogue in segment_transcript]
 
     logger.info(f"Generated transcript with {len(transcript)} dialogue segments")
     return {"transcript": transcript}
@@ -355,17 +451,27 @@ def route_audio_generation(state: PodcastState, config: RunnableConfig) -> str:
     return "generate_all_audio"
 
 async def generate_all_audio_node(state: PodcastState, config: RunnableConfig) -> Dict:
-    """Generate all audio clips using sequential batches to respect API limits"""
+    """Generate all audio clips concurrently, bounded by TTS_BATCH_SIZE in-flight requests and TTS_RPM"""
     transcript = state["transcript"]
     output_dir = state["output_dir"]
     total_segments = len(transcript)
     emotions_config = state["emotions_config"]
     speed_config = state["speed_config"]
     
-    # Get batch size from environment variable, default to 5
+    # Get batch size (max in-flight TTS requests) from environment variable, default to 5
     batch_size = int(os.getenv("TTS_BATCH_SIZE", "5"))
     logger.info(f"Using TTS batch size: {batch_size}")
 
+    # 按服务商每分钟请求数限流（令牌桶），未设置时不限速
+    tts_rpm = int(os.getenv("TTS_RPM", "0"))
+    rate_limiter = None
+    if tts_rpm > 0:
+        if SUPPORT_AIOLIMITER:
+            rate_limiter = AsyncLimiter(tts_rpm, 60)
+            logger.info(f"Limiting TTS requests to {tts_rpm} per minute")
+        else:
+            logger.warning("TTS_RPM is set but aiolimiter is not installed, TTS requests are not rate limited")
+
     assert state.get("speaker_profile") is not None, "speaker_profile must be provided"
 
     # Get TTS configuration from speaker profile
@@ -380,50 +486,79 @@ async def generate_all_audio_node(state: PodcastState, config: RunnableConfig) -
     dialect = state.get("dialect")
 
     logger.info(
-        f"Generating {total_segments} audio clips in sequential batches of {batch_size}"
+        f"Generating {total_segments} audio clips with up to {batch_size} requests in flight"
     )
 
-    all_clip_paths = []
+    # 自定义音色文件只读取并编码一次，所有片段共用
+    custom_voices_b64 = {}
+    for speaker_name, custom_voice_path in custom_voices.items():
+        if isinstance(custom_voice_path, str) and os.path.isfile(custom_voice_path):
+            custom_voices_b64[speaker_name] = base64.b64encode(Path(custom_voice_path).read_bytes()).decode("utf-8")
+            logger.debug(f"Loaded and encoded custom voice file as base64: {custom_voice_path}")
+
+    # 所有片段共用一个 TTS 实例，复用其 HTTP 客户端和连接池
+    tts_model_instance = AIFactory.create_text_to_speech(tts_provider, tts_model)
+
+    # 同一次运行内，内容相同的片段按缓存键加锁，只生成一次
+    tts_cache_locks = defaultdict(asyncio.Lock)
+
+    # 片段完成一个就补上一个，不再按批次等待，吞吐由并发上限和限流器决定
+    semaphore = asyncio.Semaphore(batch_size)
+
+    async def generate_clip(i: int) -> Path:
+        dialogue_info = {
+            "dialogue": transcript[i],
+            "index": i,
+            "output_dir": output_dir,
+            "tts_provider": tts_provider,
+            "tts_model": tts_model,
+            "tts_model_instance": tts_model_instance,
+            "voices": voices,
+            "custom_voices": custom_voices,
+            "custom_voices_b64": custom_voices_b64,
+            "speaker_profile": speaker_profile,
+            "dialect": dialect,  # Pass dialect to audio generation
+            "rate_limiter": rate_limiter,
+            "tts_cache_locks": tts_cache_locks,
+        }
+        async with semaphore:
+            return await generate_single_audio_clip(dialogue_info, emotions_config, speed_config)
 
-    # Process in sequential batches
-    for batch_start in range(0, total_segments, batch_size):
-        batch_end = min(batch_start + batch_size, total_segments)
-        batch_number = batch_start // batch_size + 1
-        total_batches = (total_segments + batch_size - 1) // batch_size
+    clip_tasks = [asyncio.create_task(generate_clip(i)) for i in range(total_segments)]
 
-        logger.info(
-            f"Processing batch {batch_number}/{total_batches} (clips {batch_start}-{batch_end - 1})"
+    # 边生成边合并：片段按顺序一就绪就送入 ffmpeg，合并耗时隐藏在 TTS 的尾部等待中
+    combine_task = None
+    if int(os.getenv("STREAM_AUDIO_COMBINE", "0")):
+        async def clips_in_order():
+            # 依次等待每个任务，乱序完成的片段在任务结果中暂存，直到其前面的片段都已就绪
+            for task in clip_tasks:
+                yield await task
+
+        combine_task = asyncio.create_task(
+            combine_audio_stream(clips_in_order(), f"{state['episode_name']}.mp3", output_dir / "audio")
         )
 
-        # Create tasks for this batch
-        batch_tasks = []
-        for i in range(batch_start, batch_end):
-            dialogue_info = {
-                "dialogue": transcript[i],
-                "index": i,
-                "output_dir": output_dir,
-                "tts_provider": tts_provider,
-                "tts_model": tts_model,
-                "voices": voices,
-                "custom_voices": custom_voices,
-                "speaker_profile": speaker_profile,
-                "dialect": dialect,  # Pass dialect to audio generation
-            }
-            task = generate_single_audio_clip(dialogue_info, emotions_config, speed_config)
-            batch_tasks.append(task)
-
-        # Process this batch concurrently (but wait before next batch)
-        batch_clip_paths = await asyncio.gather(*batch_tasks)
-        all_clip_paths.extend(batch_clip_paths)
-
-        logger.info(f"Completed batch {batch_number}/{total_batches}")
-
-        # Small delay between batches to be extra safe with API limits
-        if batch_end < total_segments:
-            await asyncio.sleep(1)
+    try:
+        # gather 按片段顺序返回结果
+        all_clip_paths = list(await asyncio.gather(*clip_tasks))
+    except BaseException:
+        for task in clip_tasks:
+            task.cancel()
+        if combine_task is not None:
+            combine_task.cancel()
+            await asyncio.gather(combine_task, return_exceptions=True)
+        raise
 
     logger.info(f"Generated all {len(all_clip_paths)} audio clips")
 
+    if combine_task is not None:
+        result = await combine_task
+        if not result["combined_audio_path"].startswith("ERROR"):
+            final_path = Path(result["combined_audio_path"])
+            logger.info(f"Combined audio saved to: {final_path}")
+            return {"audio_clips": all_clip_paths, "final_output_file_path": final_path}
+        logger.warning(f"Streaming audio combination failed, combining after generation: {result['combined_audio_path']}")
+
     return {"audio_clips": all_clip_paths}
 
 
@@ -436,6 +571,7 @@ async def generate_single_audio_clip(dialogue_info: Dict, emotions_config: Emoti
     tts_model_name = dialogue_info["tts_model"]
     voices = dialogue_info["voices"]
     custom_voices = dialogue_info.get("custom_voices", {})
+    custom_voices_b64 = dialogue_info.get("custom_voices_b64", {})
     speaker_profile = dialogue_info.get("speaker_profile")
 
     logger.info(f"Generating audio clip {index:04d} for {dialogue.speaker}")
@@ -448,8 +584,10 @@ async def generate_single_audio_clip(dialogue_info: Dict, emotions_config: Emoti
     filename = f"{index:04d}.mp3"
     clip_path = clips_dir / filename
 
-    # Create TTS model
-    tts_model = AIFactory.create_text_to_speech(tts_provider, tts_model_name)
+    # Reuse the TTS model created by the caller, or create one
+    tts_model = dialogue_info.get("tts_model_instance")
+    if tts_model is None:
+        tts_model = AIFactory.create_text_to_speech(tts_provider, tts_model_name)
     
     # Prepare TTS parameters
     tts_kwargs = {}
@@ -465,11 +603,12 @@ async def generate_single_audio_clip(dialogue_info: Dict, emotions_config: Emoti
     if speaker_name in custom_voices and custom_voices[speaker_name]:
         custom_voice_path = custom_voices[speaker_name]
         # Check if it's a file path
-        if isinstance(custom_voice_path, str):
+        if speaker_name in custom_voices_b64:
+            tts_kwargs["reference_audio"] = custom_voices_b64[speaker_name]
+        elif isinstance(custom_voice_path, str):
             voice_path = Path(custom_voice_path)
             if voice_path.exists():
                 # Read file and convert to base64
-                import base64
                 with open(voice_path, "rb") as f:
                     b64_data = base64.b64encode(f.read()).decode("utf-8")
                 tts_kwargs["reference_audio"] = b64_data
@@ -498,30 +637,59 @@ async def generate_single_audio_clip(dialogue_info: Dict, emotions_config: Emoti
         logger.debug(f"Using dialect: {dialect} for audio generation")
     
     # print(f"tts_kwargs: {tts_kwargs}")
-    # Generate audio with retry logic (5 attempts)
-    for attempt in range(5):
+    rate_limiter = dialogue_info.get("rate_limiter")
+
+    async def attempt_clip():
+        if rate_limiter is not None:
+            # 每次请求（包括重试）都占用一个令牌
+            await rate_limiter.acquire()
+        await tts_model.agenerate_speech(
+            text=dialogue.dialogue,
+            voice=voice_id,
+            output_file=clip_path,
+            **tts_kwargs
+        )
+
+    # 相同 (服务商, 模型, 音色, 方言, 情绪, 参考音频, 文本) 的片段直接复用已生成的音频
+    reference_audio = tts_kwargs.get("reference_audio") or ""
+    reference_digest = hashlib.sha256(str(reference_audio).encode("utf-8")).hexdigest() if reference_audio else ""
+    cache_key = hashlib.sha256(
+        f"{tts_provider}|{tts_model_name}|{voice_id}|{dialect or ''}|{tts_kwargs.get('instructions') or ''}|"
+        f"{reference_digest}|{dialogue.dialogue}".encode("utf-8")
+    ).hexdigest()
+    cache_dir = output_dir / "tts_cache"
+    cache_dir.mkdir(exist_ok=True, parents=True)
+    cached_path = cache_dir / f"{cache_key}.mp3"
+
+    tts_cache_locks = dialogue_info.get("tts_cache_locks")
+    async with tts_cache_locks[cache_key] if tts_cache_locks is not None else asyncio.Lock():
+        if cached_path.exists():
+            _link_or_copy(cached_path, clip_path)
+            logger.info(f"Reused cached audio for clip {index:04d}: {clip_path}")
+            return clip_path
+
+        # 旧片段可能与缓存文件共享 inode，先删除再写入，避免覆盖缓存内容
+        clip_path.unlink(missing_ok=True)
+
+        # Generate audio with retry logic (5 attempts)
         try:
-            await tts_model.agenerate_speech(
-                text=dialogue.dialogue,
-                voice=voice_id,
-                output_file=clip_path,
-                **tts_kwargs
-            )
-            logger.info(f"Generated audio clip: {clip_path}")
-            break  # 成功则跳出循环
+            await _retry(attempt_clip, 5, f"Audio generation for clip {index:04d}", base=1.0)
         except Exception as e:
-            logger.warning(f"Audio generation failed for clip {index:04d} (attempt {attempt + 1}/5): {e}")
-            if attempt == 4:  # 最后一次仍失败，则抛出异常
-                logger.error(f"Audio generation failed after 5 attempts for clip {index:04d}")
-                raise RuntimeError(f"Audio generation failed after 5 attempts for clip {index:04d}: {e}") from e
-            # 短暂等待后重试
-            await asyncio.sleep(3)
+            logger.error(f"Audio generation failed after 5 attempts for clip {index:04d}")
+            raise RuntimeError(f"Audio generation failed after 5 attempts for clip {index:04d}: {e}") from e
+        _link_or_copy(clip_path, cached_path)
+    logger.info(f"Generated audio clip: {clip_path}")
 
     return clip_path
 
 
 async def combine_audio_node(state: PodcastState, config: RunnableConfig) -> Dict:
     """Combine all audio clips into final podcast episode"""
+    if state.get("final_output_file_path"):
+        # 已在生成音频时流式合并完成
+        logger.info(f"Audio already combined while generating clips: {state['final_output_file_path']}")
+        return {"final_output_file_path": state["final_output_file_path"]}
+
     logger.info("Starting audio combination")
 
     clips_dir = state["output_dir"] / "clips"
@@ -11,6 +11,26 @@ import streamlit as st
 from concurrent.futures import ThreadPoolExecutor
 import time
 
+try:
+    from content_core.processors.url import close_session as close_http_session
+except ImportError:
+    close_http_session = None
+
+
+async def _run_and_close_session(async_func: Callable[..., Coroutine], *args, **kwargs) -> Any:
+    """
+    Await async_func and then close content-core's shared HTTP session.
+
+    Used for calls that run under a fresh ``asyncio.run`` loop: the session is
+    bound to that loop, so it must be closed before the loop exits or its
+    connector leaks.
+    """
+    try:
+        return await async_func(*args, **kwargs)
+    finally:
+        if close_http_session is not None:
+            await close_http_session()
+
 
 def run_async_in_streamlit(async_func: Callable[..., Coroutine], *args, **kwargs) -> Any:
     """
@@ -30,14 +50,14 @@ def run_async_in_streamlit(async_func: Callable[..., Coroutine], *args, **kwargs
         if loop.is_running():
             # If we're already in an event loop, we need to run in a new thread
             with ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, async_func(*args, **kwargs))
+                future = executor.submit(asyncio.run, _run_and_close_session(async_func, *args, **kwargs))
                 return future.result()
         else:
             # If no event loop is running, we can run directly
             return loop.run_until_complete(async_func(*args, **kwargs))
     except RuntimeError:
         # No event loop exists, create a new one
-        return asyncio.run(async_func(*args, **kwargs))
+        return asyncio.run(_run_and_close_session(async_func, *args, **kwargs))
 
 
 class AsyncTaskManager:
@@ -62,7 +82,7 @@ class AsyncTaskManager:
         def run_in_thread():
             try:
                 self.progress[task_id] = {"status": "running", "progress": 0}
-                result = asyncio.run(async_func(*args, **kwargs))
+                result = asyncio.run(_run_and_close_session(async_func, *args, **kwargs))
                 self.results[task_id] = result
                 self.progress[task_id] = {"status": "completed", "progress": 100}
             except Exception as e: